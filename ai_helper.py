@@ -16,14 +16,32 @@ Các chức năng chính:
 """
 
 import os
+import re
 import time
 import json
+import random
+import string
+import atexit
+import hashlib
+import datetime
+import email.utils
+import asyncio
 import logging
-import traceback
-import requests
-from dataclasses import dataclass
-from typing import Dict, List, Any, Optional, Union, Tuple, Callable, TypeVar, cast
-from functools import wraps
+import threading
+import concurrent.futures
+import orjson
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Union, Tuple, Callable, Iterator, Mapping, TypeVar, cast
+from functools import wraps, lru_cache
+
+# requests và aiohttp chỉ được import khi thật sự gọi API (mất vài trăm ms
+# lúc khởi động), để import ai_helper nhanh với các tool/test không gọi mạng
+if TYPE_CHECKING:
+    import aiohttp
+    import requests
 
 # Thiết lập logging
 logger = logging.getLogger("windsurf_ai")
@@ -40,8 +58,10 @@ class AIConfig:
     timeout: int = 60       # Giới hạn thời gian chờ (giây)
     retries: int = 2        # Số lần thử lại
     backoff_factor: int = 2  # Hệ số tăng thời gian chờ giữa các lần thử
+    retry_max_wait: int = 30  # Thời gian chờ tối đa giữa hai lần thử (giây)
     cache_enabled: bool = True  # Bật/tắt cache
     cache_ttl: int = 3600    # Thời gian sống của cache (giây)
+    cache_max_entries: int = 10_000  # Số mục tối đa trong cache (LRU)
     
     # Cấu hình OpenAI
     openai_api_key: str = ""  # API key cho OpenAI
@@ -64,15 +84,85 @@ class AIConfig:
     temperature: float = 0.7  # Độ sáng tạo mặc định
     max_tokens: int = 1000    # Số token tối đa trong kết quả
     streaming: bool = False   # Có sử dụng streaming response hay không
+    max_concurrency: int = 8  # Số request AI chạy song song tối đa khi gọi theo lô
 
 # Cấu hình mặc định
 config = AIConfig()
 
+
+class RequestCategory(Enum):
+    """Loại request AI, quyết định kết quả có được cache hay không"""
+    INFORMATIONAL = "informational"  # Phân tích/giải thích: cùng code cho cùng kết quả, nên cache
+    COMMAND = "command"              # Sinh/sửa code, review diff mới: không cache
+
+
+class ResponseCache:
+    """
+    Cache kết quả API có giới hạn số mục (LRU) và thời gian sống (TTL).
+    
+    Khi vượt quá maxsize, mục ít được dùng gần đây nhất sẽ bị loại bỏ ngay
+    lúc thêm mới, nên bộ nhớ không tăng mãi theo số prompt khác nhau. TTL
+    được truyền vào lúc đọc để thay đổi config.cache_ttl có hiệu lực ngay.
+    Được bảo vệ bằng RLock vì cache được dùng chung giữa các thread gọi
+    đồng bộ và event loop nền.
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def get(self, key: str, ttl: float) -> Optional[Tuple[str, float]]:
+        """
+        Lấy một mục trong cache.
+        
+        Args:
+            key: Khóa cache
+            ttl: Thời gian sống tối đa (giây)
+            
+        Returns:
+            Optional[Tuple[str, float]]: (kết quả, tuổi của mục) hoặc None nếu không có/hết hạn
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            
+            response, timestamp = entry
+            age = time.monotonic() - timestamp
+            if age > ttl:
+                # Xóa cache hết hạn
+                del self._data[key]
+                return None
+            
+            self._data.move_to_end(key)
+            return response, age
+    
+    def set(self, key: str, response: str) -> None:
+        """Thêm một mục vào cache, loại bỏ mục cũ nhất nếu vượt quá maxsize."""
+        with self._lock:
+            self._data[key] = (response, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Xóa toàn bộ cache."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+
 # Cache cho các kết quả API
-response_cache = {}
+response_cache = ResponseCache(maxsize=config.cache_max_entries)
 
 
-def get_cache_key(prompt: str, model: str, temperature: float) -> str:
+def get_cache_key(prompt: str, model: str, temperature: float, system_prompt: str = "") -> str:
     """
     Tạo khóa cache dựa trên prompt, model và temperature.
     
@@ -80,16 +170,19 @@ def get_cache_key(prompt: str, model: str, temperature: float) -> str:
         prompt: Nội dung prompt
         model: Tên model sử dụng
         temperature: Độ sáng tạo
+        system_prompt: Phần hướng dẫn cố định đi kèm prompt (nếu có)
         
     Returns:
         str: Khóa cache (hash)
     """
-    # Tạo chuỗi đầu vào cho hash
-    input_str = f"{prompt}|{model}|{temperature}"
-    
-    # Tạo hash MD5
-    import hashlib
-    return hashlib.md5(input_str.encode()).hexdigest()
+    # Dùng BLAKE2b (nhanh hơn MD5 trên CPU 64-bit) và nạp prompt qua update()
+    # để không phải ghép thêm một bản sao của prompt dài
+    hasher = hashlib.blake2b(f"{model}|{temperature}|".encode(), digest_size=16)
+    if system_prompt:
+        hasher.update(system_prompt.encode())
+        hasher.update(b"|")
+    hasher.update(prompt.encode())
+    return hasher.hexdigest()
 
 
 def cache_response(key: str, response: str) -> None:
@@ -103,10 +196,7 @@ def cache_response(key: str, response: str) -> None:
     if not config.cache_enabled:
         return
     
-    response_cache[key] = {
-        'response': response,
-        'timestamp': time.time()
-    }
+    response_cache.set(key, response)
 
 
 def get_cached_response(key: str) -> Optional[str]:
@@ -119,20 +209,16 @@ def get_cached_response(key: str) -> Optional[str]:
     Returns:
         Optional[str]: Kết quả từ cache hoặc None nếu không có/hết hạn
     """
-    if not config.cache_enabled or key not in response_cache:
+    if not config.cache_enabled:
         return None
     
-    cache_entry = response_cache[key]
-    cache_age = time.time() - cache_entry['timestamp']
-    
-    # Kiểm tra thời gian sống của cache
-    if cache_age > config.cache_ttl:
-        # Xóa cache hết hạn
-        del response_cache[key]
+    cache_entry = response_cache.get(key, config.cache_ttl)
+    if cache_entry is None:
         return None
     
+    response, cache_age = cache_entry
     logger.info(f"Sử dụng kết quả từ cache (tuổi: {cache_age:.1f}s)")
-    return cache_entry['response']
+    return response
 
 
 def clear_cache() -> None:
@@ -143,15 +229,95 @@ Xóa tất cả các mục trong cache.
     logger.info("Cache đã được xóa")
 
 
+@lru_cache(maxsize=None)
+def _retryable_exceptions() -> Tuple[type, ...]:
+    """Các exception được coi là lỗi tạm thời (mạng, timeout) và đáng để thử lại."""
+    import aiohttp
+    import requests
+    return (requests.RequestException, aiohttp.ClientError, ConnectionError, TimeoutError)
+
+
+def __getattr__(name: str) -> Any:
+    """Giữ RETRYABLE_EXCEPTIONS cho code cũ mà không import requests/aiohttp sớm."""
+    if name == "RETRYABLE_EXCEPTIONS":
+        return _retryable_exceptions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _is_transient_status(error: BaseException) -> bool:
+    """
+    Kiểm tra lỗi HTTP có đáng thử lại không: chỉ 429 và 5xx.
+    
+    Lỗi 4xx khác (sai API key, request sai định dạng...) thử lại cũng không
+    thành công mà chỉ làm UI chờ thêm và tốn quota. Lỗi không kèm mã HTTP
+    (mất kết nối, timeout) luôn được thử lại.
+    """
+    # aiohttp lưu mã lỗi ở .status, requests ở .response.status_code
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if not isinstance(status, int):
+        return True
+    return status == 429 or status >= 500
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Đọc header Retry-After (dạng số giây hoặc HTTP-date) từ lỗi HTTP nếu có.
+    
+    Hỗ trợ cả requests.HTTPError (e.response.headers) và
+    aiohttp.ClientResponseError (e.headers).
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def _retry_wait_time(retries: int, backoff_factor: float, error: BaseException) -> float:
+    """
+    Tính thời gian chờ trước lần thử lại thứ `retries`.
+    
+    Ưu tiên header Retry-After của server; nếu không có thì dùng exponential
+    backoff có jitter (x0.5-1.5) để các client không cùng thử lại một lúc
+    khi provider vừa hoạt động trở lại. Luôn bị chặn bởi config.retry_max_wait.
+    """
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        return min(config.retry_max_wait, retry_after)
+    
+    wait_time = min(config.retry_max_wait, backoff_factor * 2 ** (retries - 1))
+    return wait_time * random.uniform(0.5, 1.5)
+
+
 def retry_on_error(max_retries: Optional[int] = None, backoff_factor: Optional[int] = None,
-                  allowed_exceptions: Tuple[type, ...] = (requests.RequestException, ConnectionError, TimeoutError)):
+                  allowed_exceptions: Optional[Tuple[type, ...]] = None):
     """
     Decorator để thử lại hàm khi gặp lỗi.
     
     Args:
         max_retries: Số lần thử lại tối đa. Nếu None, sẽ dùng giá trị từ config.
         backoff_factor: Hệ số tăng thời gian chờ giữa các lần thử. Nếu None, sẽ dùng giá trị từ config.
-        allowed_exceptions: Tuple các loại exception sẽ được thử lại.
+        allowed_exceptions: Tuple các loại exception sẽ được thử lại. Nếu None,
+            dùng các lỗi mạng/timeout của requests và aiohttp. Lỗi HTTP chỉ
+            được thử lại khi mã là 429 hoặc 5xx.
         
     Returns:
         Decorator function
@@ -162,6 +328,7 @@ def retry_on_error(max_retries: Optional[int] = None, backoff_factor: Optional[i
             # Sử dụng giá trị từ config nếu không được chỉ định
             _max_retries = max_retries if max_retries is not None else config.retries
             _backoff_factor = backoff_factor if backoff_factor is not None else config.backoff_factor
+            _allowed_exceptions = allowed_exceptions if allowed_exceptions is not None else _retryable_exceptions()
             
             retries = 0
             last_exception = None
@@ -169,15 +336,18 @@ def retry_on_error(max_retries: Optional[int] = None, backoff_factor: Optional[i
             while retries <= _max_retries:
                 try:
                     return func(*args, **kwargs)
-                except allowed_exceptions as e:
+                except _allowed_exceptions as e:
+                    if not _is_transient_status(e):
+                        logger.error(f"Gặp lỗi không thử lại được: {str(e)}")
+                        raise
                     last_exception = e
                     retries += 1
                     if retries > _max_retries:
                         logger.error(f"Hết số lần thử lại ({_max_retries}). Lỗi cuối cùng: {str(e)}")
                         break
                     
-                    wait_time = _backoff_factor ** retries
-                    logger.warning(f"Gặp lỗi: {str(e)}. Thử lại sau {wait_time} giây (lần {retries}/{_max_retries})")
+                    wait_time = _retry_wait_time(retries, _backoff_factor, e)
+                    logger.warning(f"Gặp lỗi: {str(e)}. Thử lại sau {wait_time:.1f} giây (lần {retries}/{_max_retries})")
                     time.sleep(wait_time)
                 except Exception as e:
                     # Các exception khác không nằm trong allowed_exceptions sẽ được raise ngay lập tức
@@ -195,12 +365,360 @@ def retry_on_error(max_retries: Optional[int] = None, backoff_factor: Optional[i
     return decorator
 
 
+def retry_on_error_async(max_retries: Optional[int] = None, backoff_factor: Optional[int] = None,
+                         allowed_exceptions: Optional[Tuple[type, ...]] = None):
+    """
+    Bản bất đồng bộ của retry_on_error, dùng cho coroutine.
+    
+    Thời gian chờ giữa các lần thử dùng asyncio.sleep nên không chặn event loop.
+    
+    Args:
+        max_retries: Số lần thử lại tối đa. Nếu None, sẽ dùng giá trị từ config.
+        backoff_factor: Hệ số tăng thời gian chờ giữa các lần thử. Nếu None, sẽ dùng giá trị từ config.
+        allowed_exceptions: Tuple các loại exception sẽ được thử lại. Nếu None,
+            dùng các lỗi mạng/timeout của requests và aiohttp. Lỗi HTTP chỉ
+            được thử lại khi mã là 429 hoặc 5xx.
+        
+    Returns:
+        Decorator function
+    """
+    def decorator(func: F) -> F:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # Sử dụng giá trị từ config nếu không được chỉ định
+            _max_retries = max_retries if max_retries is not None else config.retries
+            _backoff_factor = backoff_factor if backoff_factor is not None else config.backoff_factor
+            _allowed_exceptions = allowed_exceptions if allowed_exceptions is not None else _retryable_exceptions()
+            
+            retries = 0
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except _allowed_exceptions as e:
+                    if not _is_transient_status(e):
+                        logger.error(f"Gặp lỗi không thử lại được: {str(e)}")
+                        raise
+                    retries += 1
+                    if retries > _max_retries:
+                        logger.error(f"Hết số lần thử lại ({_max_retries}). Lỗi cuối cùng: {str(e)}")
+                        raise
+                    
+                    wait_time = _retry_wait_time(retries, _backoff_factor, e)
+                    logger.warning(f"Gặp lỗi: {str(e)}. Thử lại sau {wait_time:.1f} giây (lần {retries}/{_max_retries})")
+                    await asyncio.sleep(wait_time)
+                except Exception as e:
+                    # Các exception khác không nằm trong allowed_exceptions sẽ được raise ngay lập tức
+                    logger.error(f"Gặp lỗi không xử lý được: {str(e)}")
+                    raise
+            
+        return cast(F, wrapper)
+    return decorator
+
+
+# Các lời gọi đang chạy, dùng để gộp các lời gọi giống hệt nhau (single-flight)
+_in_flight_async: Dict[Tuple[Any, ...], "asyncio.Future[Any]"] = {}
+_in_flight_sync: Dict[Tuple[Any, ...], "concurrent.futures.Future[Any]"] = {}
+_in_flight_lock = threading.Lock()
+
+
+class _LeaderCancelled(Exception):
+    """Lời gọi dẫn đầu của single_flight bị hủy; các lời gọi đang chờ sẽ tự gọi lại."""
+
+
+def _flight_key(func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Tạo khóa nhận diện một lời gọi dựa trên tên hàm và toàn bộ tham số."""
+    return (func.__qualname__, args, tuple(sorted(kwargs.items())))
+
+
+def single_flight(func: F) -> F:
+    """
+    Decorator gộp các lời gọi giống hệt nhau đang chạy đồng thời.
+    
+    Tương tự singleflight.Group của Go: chỉ lời gọi đầu tiên thực sự gửi
+    request, các lời gọi trùng tham số đến trong lúc đó sẽ chờ và nhận cùng
+    kết quả. Khi N người dùng cùng bấm phân tích một file, chỉ tốn 1 lần
+    inference thay vì N. Hỗ trợ cả hàm đồng bộ lẫn coroutine.
+    
+    Returns:
+        Hàm đã được bọc
+    """
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = _flight_key(func, args, kwargs)
+            loop = asyncio.get_running_loop()
+            
+            future = _in_flight_async.get(key)
+            while future is not None and future.get_loop() is loop:
+                try:
+                    return await asyncio.shield(future)
+                except _LeaderCancelled:
+                    # Chỉ lời gọi dẫn đầu bị hủy (vd. người gọi đó hết thời gian chờ):
+                    # gọi lại, lời gọi chờ đầu tiên đến đây sẽ thành lời gọi dẫn đầu mới
+                    future = _in_flight_async.get(key)
+            
+            future = loop.create_future()
+            _in_flight_async[key] = future
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                # Không hủy future: các lời gọi đang chờ không bị hủy nên không nhận CancelledError
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # Đánh dấu đã xử lý để asyncio không cảnh báo khi không có ai chờ
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                if _in_flight_async.get(key) is future:
+                    del _in_flight_async[key]
+        
+        return cast(F, async_wrapper)
+    
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = _flight_key(func, args, kwargs)
+        with _in_flight_lock:
+            future = _in_flight_sync.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = concurrent.futures.Future()
+                _in_flight_sync[key] = future
+        
+        if not is_leader:
+            return future.result()
+        
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with _in_flight_lock:
+                _in_flight_sync.pop(key, None)
+    
+    return cast(F, wrapper)
+
+
+# Event loop nền và aiohttp session dùng chung cho các API cloud.
+# Session chỉ được tạo và dùng trên loop nền nên các kết nối TCP/TLS
+# được giữ lại (keep-alive) giữa các lần gọi từ nhiều thread khác nhau.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_session: Optional["aiohttp.ClientSession"] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Trả về event loop nền dùng chung, khởi tạo thread chạy loop nếu chưa có."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="windsurf-ai-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro: Any) -> Any:
+    """
+    Chạy coroutine trên event loop nền và chờ kết quả.
+    
+    Dùng cho code đồng bộ (QThread, script) cần gọi các hàm *_async.
+    
+    Args:
+        coro: Coroutine cần chạy
+        
+    Returns:
+        Kết quả của coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def _client_timeout(total: float) -> "aiohttp.ClientTimeout":
+    """Tạo aiohttp.ClientTimeout cho một request."""
+    import aiohttp
+    return aiohttp.ClientTimeout(total=total)
+
+
+async def _get_session() -> "aiohttp.ClientSession":
+    """Trả về aiohttp session dùng chung cho event loop hiện tại."""
+    import aiohttp
+    
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=32, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=75
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+    return _session
+
+
+def _shutdown_loop() -> None:
+    """Đóng session và dừng event loop nền khi thoát chương trình."""
+    if _loop is None or _loop.is_closed():
+        return
+    if _session is not None and not _session.closed and _session_loop is _loop:
+        try:
+            asyncio.run_coroutine_threadsafe(_session.close(), _loop).result(timeout=5)
+        except Exception:
+            pass
+    _loop.call_soon_threadsafe(_loop.stop)
+
+
+atexit.register(_shutdown_loop)
+
+
+# requests.Session dùng chung cho các lời gọi đồng bộ (mô hình local).
+# Connection pool giữ kết nối tới server giữa các lần gọi, tránh phải
+# bắt tay TCP/TLS lại ở mỗi request. Retry do retry_on_error đảm nhận.
+_http_session: Optional["requests.Session"] = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session() -> "requests.Session":
+    """Trả về requests.Session dùng chung, tạo ở lần gọi đầu tiên."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            atexit.register(session.close)
+            _http_session = session
+        return _http_session
+
+
+def _build_chat_messages(prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Tạo danh sách messages theo định dạng chat completions (OpenAI, LMStudio, Ollama).
+    
+    Phần hướng dẫn cố định được đặt ở role system, đứng trước nội dung thay đổi,
+    để cơ chế prefix caching của server khớp được phần đầu prompt giữa các lần gọi.
+    """
+    if system_prompt:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+    return [{"role": "user", "content": prompt}]
+
+
+@lru_cache(maxsize=None)
+def _error_map() -> List[Tuple[Tuple[type, ...], str]]:
+    """
+    Bảng phân loại lỗi khi gọi API: (các kiểu exception, mẫu thông báo).
+    
+    Duyệt theo thứ tự, mục đầu tiên khớp được dùng; lỗi không khớp mục nào
+    được coi là lỗi không xác định và ghi kèm traceback.
+    """
+    import aiohttp
+    import requests
+    return [
+        ((asyncio.TimeoutError, requests.exceptions.Timeout),
+         "Yêu cầu bị timeout sau {timeout} giây"),
+        ((aiohttp.ClientConnectionError, requests.exceptions.ConnectionError),
+         "Không thể kết nối đến {target}. Kiểm tra kết nối mạng hoặc server có đang chạy không."),
+        ((aiohttp.ClientResponseError, requests.exceptions.HTTPError),
+         "Lỗi HTTP {status}: {error}"),
+        ((ValueError,), "Lỗi khi xử lý JSON response: {error}"),
+        ((KeyError,), "Thiếu trường dữ liệu trong kết quả: {error}"),
+    ]
+
+
+def _api_error_result(error: Exception, target: str, timeout: Any) -> str:
+    """
+    Phân loại lỗi khi gọi API, ghi log và trả về thông báo lỗi cho người gọi.
+    
+    Args:
+        error: Exception bắt được
+        target: Tên API hoặc endpoint được gọi (dùng trong thông báo)
+        timeout: Thời gian chờ đã dùng (giây)
+        
+    Returns:
+        Chuỗi thông báo lỗi bắt đầu bằng "[Lỗi]"
+    """
+    for exc_types, template in _error_map():
+        if isinstance(error, exc_types):
+            # aiohttp lưu mã lỗi ở .status, requests ở .response.status_code
+            status = getattr(error, "status", None) or getattr(
+                getattr(error, "response", None), "status_code", "unknown"
+            )
+            error_msg = template.format(target=target, timeout=timeout, status=status, error=error)
+            logger.error(error_msg)
+            return f"[Lỗi] {error_msg}"
+    
+    error_msg = f"Lỗi không xác định khi gọi {target}: {error}"
+    # exc_info để handler tự định dạng traceback, chỉ khi bản ghi thực sự được xuất
+    logger.error(error_msg, exc_info=True)
+    return f"[Lỗi] {error_msg}"
+
+
+# Header cố định cho các request JSON, dùng chung (chỉ đọc) giữa các lần gọi
+_JSON_HEADERS: Mapping[str, str] = MappingProxyType({"Content-Type": "application/json"})
+
+
+@lru_cache(maxsize=4)
+def _openai_headers(api_key: str) -> Mapping[str, str]:
+    """Trả về header (chỉ đọc) cho OpenAI API, tạo một lần cho mỗi API key."""
+    return MappingProxyType({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+
+
+@lru_cache(maxsize=4)
+def _claude_headers(api_key: str) -> Mapping[str, str]:
+    """Trả về header (chỉ đọc) cho Anthropic API, tạo một lần cho mỗi API key."""
+    return MappingProxyType({
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json"
+    })
+
+
+# Retry chỉ bọc phần gửi request: lỗi mạng/HTTP được raise cho decorator thử lại,
+# hàm call_* bên ngoài mới đổi lỗi cuối cùng thành chuỗi "[Lỗi] ..." cho người gọi.
 @retry_on_error()
-def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None, 
-              temperature: Optional[float] = None, max_tokens: Optional[int] = None, 
-              timeout: Optional[int] = None) -> str:
+def _post_json(url: str, payload: Dict[str, Any], headers: Mapping[str, str], timeout: float) -> Any:
+    """Gửi POST JSON qua requests session dùng chung và trả về response đã parse."""
+    resp = _get_http_session().post(url, data=orjson.dumps(payload), headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    # orjson đọc trực tiếp bytes, bỏ qua bước decode text của requests
+    return orjson.loads(resp.content)
+
+
+@retry_on_error_async()
+async def _post_json_async(url: str, payload: Dict[str, Any], headers: Mapping[str, str],
+                           timeout: float) -> Any:
+    """Gửi POST JSON qua aiohttp session dùng chung và trả về response đã parse."""
+    session = await _get_session()
+    async with session.post(
+        url,
+        headers=headers,
+        data=orjson.dumps(payload),
+        timeout=_client_timeout(timeout)
+    ) as resp:
+        resp.raise_for_status()
+        return orjson.loads(await resp.read())
+
+
+@single_flight
+async def call_openai_async(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                            temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                            timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                            cacheable: bool = True) -> str:
     """
-    Gọi OpenAI API và trả về kết quả.
+    Gọi OpenAI API (bất đồng bộ) và trả về kết quả.
     
     Args:
         prompt: Nội dung cần gửi đến mô hình
@@ -209,6 +727,8 @@ def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
         max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
         timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
         
     Returns:
         Kết quả từ mô hình hoặc thông báo lỗi
@@ -220,6 +740,13 @@ def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str]
     _max_tokens = max_tokens if max_tokens is not None else config.max_tokens
     _timeout = timeout if timeout is not None else config.timeout
     
+    # Kiểm tra cache trước khi kiểm tra API key để vẫn trả được kết quả đã cache
+    cache_key = get_cache_key(prompt, _model, _temperature, system_prompt or "")
+    if cacheable:
+        cached_response = get_cached_response(cache_key)
+        if cached_response:
+            return cached_response
+    
     if not _api_key:
         error_msg = "Thiếu OpenAI API key"
         logger.error(error_msg)
@@ -230,28 +757,20 @@ def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         logger.error(error_msg)
         return f"[Lỗi] {error_msg}"
         
-    headers = {"Authorization": f"Bearer {_api_key}"}
+    headers = _openai_headers(_api_key)
     data = {
         "model": _model, 
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": _build_chat_messages(prompt, system_prompt),
         "temperature": _temperature,
         "max_tokens": _max_tokens
     }
     
     try:
         logger.info(f"Gọi OpenAI API với model {_model}")
-        start_time = time.time()
-        
-        resp = requests.post(
-            "https://api.openai.com/v1/chat/completions", 
-            headers=headers, 
-            json=data,
-            timeout=_timeout
-        )
-        resp.raise_for_status()
+        start_time = time.monotonic()
         
-        result = resp.json()
-        duration = time.time() - start_time
+        result = await _post_json_async(f"{config.openai_api_base}/chat/completions", data, headers, _timeout)
+        duration = time.monotonic() - start_time
         
         if "choices" not in result or len(result["choices"]) == 0:
             error_msg = "Không có kết quả từ OpenAI API"
@@ -260,39 +779,226 @@ def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str]
             
         content = result["choices"][0]["message"]["content"]
         logger.info(f"Nhận được kết quả từ OpenAI ({len(content)} ký tự) trong {duration:.2f}s")
+        
+        # Lưu vào cache
+        if cacheable:
+            cache_response(cache_key, content)
+        
         return content
         
-    except requests.exceptions.ConnectionError:
-        error_msg = "Không thể kết nối đến OpenAI API. Kiểm tra kết nối mạng."
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+    except Exception as e:
+        return _api_error_result(e, "OpenAI API", _timeout)
+
+
+def call_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None, 
+              temperature: Optional[float] = None, max_tokens: Optional[int] = None, 
+              timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+              cacheable: bool = True) -> str:
+    """
+    Gọi OpenAI API và trả về kết quả (bản đồng bộ của call_openai_async).
+    
+    Args:
+        prompt: Nội dung cần gửi đến mô hình
+        api_key: API key cho OpenAI. Nếu None, sẽ dùng giá trị từ config
+        model: Tên mô hình cần sử dụng. Nếu None, sẽ dùng giá trị từ config
+        temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
+        max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
+        timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
         
-    except requests.exceptions.Timeout:
-        error_msg = f"Yêu cầu bị timeout sau {_timeout} giây"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+    Returns:
+        Kết quả từ mô hình hoặc thông báo lỗi
+    """
+    return run_sync(call_openai_async(prompt, api_key, model, temperature, max_tokens, timeout,
+                                      system_prompt, cacheable))
+
+
+def _iter_stream_chunks(endpoint: str, payload: Dict[str, Any], timeout: float,
+                       max_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    Gửi request stream (server-sent events) và trả về từng đoạn nội dung.
+    
+    Chỉ đọc trường choices[0].delta.content của mỗi dòng "data: ...", dừng ở
+    sentinel [DONE] hoặc khi đã nhận đủ max_chars ký tự. Dừng vòng lặp sớm
+    sẽ đóng kết nối nên server không phải sinh tiếp phần còn lại.
+    """
+    with _get_http_session().post(
+        endpoint,
+        data=orjson.dumps(payload),
+        headers=_JSON_HEADERS,
+        timeout=timeout,
+        stream=True
+    ) as resp:
+        resp.raise_for_status()
         
-    except requests.exceptions.HTTPError as e:
-        error_msg = f"Lỗi HTTP: {e}"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+        received = 0
+        for line in resp.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            
+            choices = orjson.loads(data).get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if not delta:
+                continue
+            
+            if max_chars is not None and received + len(delta) >= max_chars:
+                yield delta[:max_chars - received]
+                break
+            received += len(delta)
+            yield delta
+
+
+def call_local_model_stream(prompt: str, endpoint: Optional[str] = None, model: Optional[str] = None,
+                            temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                            timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                            max_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    Gửi prompt tới LMStudio (hoặc Ollama, LMDeploy...) và trả về kết quả dạng stream.
+    
+    Mỗi phần tử là một đoạn nội dung mới, có ngay khi server sinh ra nên UI
+    không phải chờ toàn bộ kết quả. Lỗi kết nối/HTTP được raise cho nơi gọi.
+    Kết quả stream không được lưu vào cache.
+    
+    Args:
+        prompt: Nội dung cần gửi đến mô hình
+        endpoint: Địa chỉ API endpoint. Nếu None, sẽ dùng giá trị từ config
+        model: Tên mô hình cần sử dụng. Nếu None, sẽ dùng giá trị từ config
+        temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
+        max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
+        timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        max_chars: Số ký tự tối đa cần nhận; dừng stream khi đạt giới hạn
+        
+    Returns:
+        Iterator[str]: Các đoạn nội dung theo thứ tự nhận được
+    """
+    payload = {
+        "model": model if model is not None else config.local_model,
+        "messages": _build_chat_messages(prompt, system_prompt),
+        "temperature": temperature if temperature is not None else config.temperature,
+        "max_tokens": max_tokens if max_tokens is not None else config.max_tokens,
+        "stream": True
+    }
+    yield from _iter_stream_chunks(
+        endpoint if endpoint is not None else config.local_endpoint,
+        payload,
+        timeout if timeout is not None else config.timeout,
+        max_chars
+    )
+
+
+@single_flight
+def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optional[str] = None,
+                   temperature: Optional[float] = None, max_tokens: Optional[int] = None, 
+                   timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                   cacheable: bool = True, callback: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Gửi prompt tới LMStudio (hoặc Ollama, LMDeploy...) và trả về kết quả.
+    
+    Nếu có callback, kết quả được nhận dạng stream và từng đoạn được đẩy
+    ngay cho callback (ví dụ để UI hiển thị dần), giá trị trả về vẫn là
+    toàn bộ nội dung như khi không stream.
+    
+    Args:
+        prompt: Nội dung cần gửi đến mô hình
+        endpoint: Địa chỉ API endpoint. Nếu None, sẽ dùng giá trị từ config
+        model: Tên mô hình cần sử dụng. Nếu None, sẽ dùng giá trị từ config
+        temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
+        max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
+        timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
+        callback: Hàm nhận từng đoạn nội dung khi stream. Nếu None, không dùng stream
         
-    except ValueError as e:
-        error_msg = f"Lỗi khi xử lý JSON response: {e}"
+    Returns:
+        Kết quả từ mô hình hoặc thông báo lỗi
+    """
+    # Sử dụng giá trị từ config nếu không được chỉ định
+    _endpoint = endpoint if endpoint is not None else config.local_endpoint
+    _model = model if model is not None else config.local_model
+    _temperature = temperature if temperature is not None else config.temperature
+    _max_tokens = max_tokens if max_tokens is not None else config.max_tokens
+    _timeout = timeout if timeout is not None else config.timeout
+    
+    # Kiểm tra cache
+    cache_key = get_cache_key(prompt, _model, _temperature, system_prompt or "")
+    if cacheable:
+        cached_response = get_cached_response(cache_key)
+        if cached_response:
+            return cached_response
+    
+    if not validate_prompt(prompt):
+        error_msg = "Prompt không hợp lệ (rỗng hoặc chỉ có khoảng trắng)"
         logger.error(error_msg)
         return f"[Lỗi] {error_msg}"
+    
+    payload = {
+        "model": _model,
+        "messages": _build_chat_messages(prompt, system_prompt),
+        "temperature": _temperature,
+        "max_tokens": _max_tokens,
+        "stream": callback is not None
+    }
+    
+    try:
+        logger.info(f"Gọi LLM API ({_model}) tại {_endpoint}")
+        start_time = time.monotonic()
+        
+        if callback is not None:
+            # Nhận kết quả dạng stream, đẩy từng đoạn cho callback ngay khi có.
+            # Không thử lại: callback có thể đã nhận một phần nội dung
+            chunks = []
+            for chunk in _iter_stream_chunks(_endpoint, payload, _timeout):
+                chunks.append(chunk)
+                callback(chunk)
+            content = "".join(chunks)
+        else:
+            data = _post_json(_endpoint, payload, _JSON_HEADERS, _timeout)
+            
+            # Kiểm tra kết quả hợp lệ
+            if "choices" not in data or len(data["choices"]) == 0:
+                error_msg = "Không có kết quả từ LLM server"
+                logger.error(error_msg)
+                return f"[Lỗi] {error_msg}"
+                
+            if "message" not in data["choices"][0] or "content" not in data["choices"][0]["message"]:
+                error_msg = "Kết quả từ LLM server không đúng định dạng"
+                logger.error(error_msg)
+                return f"[Lỗi] {error_msg}"
+            
+            # Lấy kết quả từ response
+            content = data["choices"][0]["message"]["content"]
+        
+        duration = time.monotonic() - start_time
+        logger.info(f"Nhận được kết quả từ LLM ({len(content)} ký tự) trong {duration:.2f}s")
+        
+        # Lưu vào cache
+        if cacheable:
+            cache_response(cache_key, content)
+        
+        return content
         
     except Exception as e:
-        error_msg = f"Lỗi không xác định khi gọi OpenAI API: {e}"
-        logger.error(f"{error_msg}\n{traceback.format_exc()}")
-        return f"[Lỗi] {error_msg}"
+        return _api_error_result(e, _endpoint, _timeout)
 
-@retry_on_error()
-def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optional[str] = None,
-                   temperature: Optional[float] = None, max_tokens: Optional[int] = None, 
-                   timeout: Optional[int] = None) -> str:
+
+@single_flight
+async def call_local_model_async(prompt: str, endpoint: Optional[str] = None, model: Optional[str] = None,
+                                 temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                                 timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                                 cacheable: bool = True) -> str:
     """
-    Gửi prompt tới LMStudio (hoặc Ollama, LMDeploy...) và trả về kết quả.
+    Gửi prompt tới LMStudio (hoặc Ollama, LMDeploy...) bất đồng bộ và trả về kết quả.
+    
+    Dùng chung aiohttp session (và connection pool) với các API cloud trên event
+    loop nền, nên nhiều prompt có thể được gửi song song qua batch_call(provider="local").
+    Cache được dùng chung với call_local_model.
     
     Args:
         prompt: Nội dung cần gửi đến mô hình
@@ -301,6 +1007,8 @@ def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optiona
         temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
         max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
         timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
         
     Returns:
         Kết quả từ mô hình hoặc thông báo lỗi
@@ -312,6 +1020,13 @@ def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optiona
     _max_tokens = max_tokens if max_tokens is not None else config.max_tokens
     _timeout = timeout if timeout is not None else config.timeout
     
+    # Kiểm tra cache
+    cache_key = get_cache_key(prompt, _model, _temperature, system_prompt or "")
+    if cacheable:
+        cached_response = get_cached_response(cache_key)
+        if cached_response:
+            return cached_response
+    
     if not validate_prompt(prompt):
         error_msg = "Prompt không hợp lệ (rỗng hoặc chỉ có khoảng trắng)"
         logger.error(error_msg)
@@ -319,7 +1034,7 @@ def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optiona
     
     payload = {
         "model": _model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": _build_chat_messages(prompt, system_prompt),
         "temperature": _temperature,
         "max_tokens": _max_tokens,
         "stream": False
@@ -327,66 +1042,226 @@ def call_local_model(prompt: str, endpoint: Optional[str] = None, model: Optiona
     
     try:
         logger.info(f"Gọi LLM API ({_model}) tại {_endpoint}")
-        start_time = time.time()
+        start_time = time.monotonic()
         
-        resp = requests.post(_endpoint, json=payload, timeout=_timeout)
-        resp.raise_for_status()
-        
-        data = resp.json()
-        duration = time.time() - start_time
+        data = await _post_json_async(_endpoint, payload, _JSON_HEADERS, _timeout)
+        duration = time.monotonic() - start_time
         
         # Kiểm tra kết quả hợp lệ
-        if "choices" not in data or len(data["choices"]) == 0:
+        if not data.get("choices"):
             error_msg = "Không có kết quả từ LLM server"
             logger.error(error_msg)
             return f"[Lỗi] {error_msg}"
-            
-        if "message" not in data["choices"][0] or "content" not in data["choices"][0]["message"]:
-            error_msg = "Kết quả từ LLM server không đúng định dạng"
-            logger.error(error_msg)
-            return f"[Lỗi] {error_msg}"
         
-        # Lấy kết quả từ response
         content = data["choices"][0]["message"]["content"]
         logger.info(f"Nhận được kết quả từ LLM ({len(content)} ký tự) trong {duration:.2f}s")
-        return content
-        
-    except requests.exceptions.ConnectionError:
-        error_msg = f"Không thể kết nối đến {_endpoint}. Kiểm tra xem LLM server có đang chạy không."
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
         
-    except requests.exceptions.Timeout:
-        error_msg = f"Yêu cầu bị timeout sau {_timeout} giây"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+        # Lưu vào cache
+        if cacheable:
+            cache_response(cache_key, content)
         
-    except requests.exceptions.HTTPError as e:
-        status_code = e.response.status_code if hasattr(e, 'response') else 'unknown'
-        error_msg = f"Lỗi HTTP {status_code}: {str(e)}"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+        return content
         
-    except ValueError as e:
-        error_msg = f"Lỗi khi xử lý JSON response: {str(e)}"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+    except Exception as e:
+        return _api_error_result(e, _endpoint, _timeout)
+
+
+# Template đã tách sẵn: (phần trước, tên chỗ trống hoặc None, phần sau)
+_TemplateParts = Tuple[str, Optional[str], str]
+
+
+def _compile_template(template: str) -> Optional[_TemplateParts]:
+    """
+    Tách template có tối đa một chỗ trống thành (phần trước, tên chỗ trống, phần sau).
+    
+    Returns:
+        Các phần của template (tên chỗ trống là None nếu template không có chỗ trống),
+        hoặc None nếu template phức tạp hơn (nhiều chỗ trống, format spec/conversion);
+        khi đó render dùng lại str.format_map
+    """
+    prefix, suffix = "", ""
+    name = None
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+        if name is None:
+            prefix += literal
+        else:
+            suffix += literal
         
-    except KeyError as e:
-        error_msg = f"Thiếu trường dữ liệu trong kết quả: {str(e)}"
-        logger.error(error_msg)
-        return f"[Lỗi] {error_msg}"
+        if field_name is not None:
+            if name is not None or not field_name or format_spec or conversion:
+                return None
+            name = field_name
+    return prefix, name, suffix
+
+
+def _render_template(template: str, parts: Optional[_TemplateParts], values: Dict[str, Any]) -> str:
+    """Điền giá trị vào template đã tách sẵn, chỉ cần nối chuỗi thay vì phân tích lại template."""
+    if parts is None:
+        return template.format_map(values)
+    
+    prefix, name, suffix = parts
+    if name is None:
+        return prefix
+    return "".join((prefix, str(values[name]), suffix))
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    Template prompt được dựng sẵn một lần khi import module.
+    
+    system_prompt là phần hướng dẫn cố định đặt trước, prompt chứa phần
+    thay đổi theo từng lần gọi (các chỗ trống như {code}). Phần system_prompt
+    phải giữ nguyên giữa các lần gọi để provider cache được theo prefix.
+    Template được tách sẵn lúc tạo nên mỗi lần render chỉ còn nối chuỗi,
+    không phải phân tích lại cú pháp format.
+    """
+    system_prompt: str
+    prompt: str
+    category: RequestCategory = RequestCategory.INFORMATIONAL
+    _system_parts: Optional[_TemplateParts] = field(init=False, repr=False, compare=False)
+    _prompt_parts: Optional[_TemplateParts] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_system_parts", _compile_template(self.system_prompt))
+        object.__setattr__(self, "_prompt_parts", _compile_template(self.prompt))
+    
+    def render(self, **values: Any) -> Tuple[str, str]:
+        """Điền giá trị vào template, trả về (system_prompt, prompt)."""
+        return (
+            _render_template(self.system_prompt, self._system_parts, values),
+            _render_template(self.prompt, self._prompt_parts, values)
+        )
+
+
+# Các template prompt, khóa theo tên phương thức/hàm sử dụng
+PROMPT_TEMPLATES: Dict[str, PromptTemplate] = {
+    "analyze_code_quality": PromptTemplate(
+        "Đánh giá chất lượng đoạn code sau, chỉ ra điểm mạnh/yếu, code smell nếu có.\n"
+        "Hãy phân tích theo các tiêu chí: tính bảo trì, hiệu suất, tính rò rỉ, và các best practice.",
+        "```python\n{code}\n```\n\nKết quả đánh giá:"
+    ),
+    "find_code_issues": PromptTemplate(
+        "Tìm lỗi, bug, hoặc vấn đề bảo mật trong đoạn code sau.\n"
+        "Hãy phân tích kỹ lưỡng và liệt kê các vấn đề theo mức độ nghiêm trọng (Critical, High, Medium, Low).",
+        "```python\n{code}\n```\n\nCác vấn đề phát hiện:\n"
+    ),
+    "generate_docstring": PromptTemplate(
+        "Viết docstring chi tiết cho đoạn code sau theo chuẩn Google style.\n"
+        "Bao gồm mô tả chức năng, các tham số (với kiểu dữ liệu), giá trị trả về, và các exception nếu có.",
+        "```python\n{code}\n```\n\nDocstring:\n"
+    ),
+    "suggest_refactor": PromptTemplate(
+        "Đề xuất cách tối ưu hóa hoặc refactor đoạn code sau.\n"
+        "Hãy giải thích lý do cần refactor và cung cấp mã nguồn đã được cải tiến.",
+        "```python\n{code}\n```\n\nĐề xuất refactor:\n",
+        RequestCategory.COMMAND
+    ),
+    "semantic_analysis": PromptTemplate(
+        "Phân tích mục đích, ý nghĩa của đoạn code sau (không chỉ mô tả cú pháp).\n"
+        "Hãy giải thích thuật toán, logic, và cách tiếp cận được sử dụng.",
+        "```python\n{code}\n```\n\nPhân tích:\n"
+    ),
+    "explain_code": PromptTemplate(
+        "Giải thích đoạn code sau theo cách dễ hiểu cho người mới học lập trình.\n"
+        "Hãy giải thích từng dòng và khái niệm quan trọng.",
+        "```python\n{code}\n```\n\nGiải thích:\n"
+    ),
+    "generate_unit_test": PromptTemplate(
+        "Viết unit test cho đoạn code sau sử dụng pytest.\n"
+        "Bao gồm các test case cho các tình huống biên thử và các trường hợp hợp lệ.",
+        "```python\n{code}\n```\n\nUnit test:\n",
+        RequestCategory.COMMAND
+    ),
+    "translate_code": PromptTemplate(
+        "Dịch đoạn code Python sau sang {target_language}.\n"
+        "Giữ nguyên chức năng và logic, đồng thời tận dụng các tính năng đặc trưng của {target_language}.",
+        "```python\n{code}\n```\n\nMã {target_language}:\n",
+        RequestCategory.COMMAND
+    ),
+    "improve_error_handling": PromptTemplate(
+        "Cải thiện xử lý lỗi trong đoạn code sau.\n"
+        "Thêm try-except blocks cho các thao tác có thể gây lỗi, xử lý các trường hợp đặc biệt, và đảm bảo code không bị crash.",
+        "```python\n{code}\n```\n\nCode với xử lý lỗi cải thiện:\n",
+        RequestCategory.COMMAND
+    ),
+    "summarize_code": PromptTemplate(
+        "Tóm tắt mã nguồn sau thành một mô tả ngắn gọn, không quá {max_length} ký tự.\n"
+        "Tập trung vào mục đích, chức năng chính và cấu trúc của code.",
+        "```\n{code}\n```\n"
+    ),
+    "review_code_changes": PromptTemplate(
+        "Review các thay đổi code sau đây. Đánh giá chất lượng của các thay đổi,\n"
+        "chỉ ra các vấn đề tiềm ẩn và đề xuất cải tiến nếu có.",
+        "```diff\n{diff}\n```\n",
+        RequestCategory.COMMAND
+    ),
+    "analyze_all": PromptTemplate(
+        "Phân tích đoạn code sau và thực hiện đồng thời 4 nhiệm vụ:\n"
+        "1. quality: Đánh giá chất lượng code, chỉ ra điểm mạnh/yếu, code smell nếu có.\n"
+        "2. issues: Tìm lỗi, bug, hoặc vấn đề bảo mật, liệt kê theo mức độ nghiêm trọng (Critical, High, Medium, Low).\n"
+        "3. docstring: Viết docstring chi tiết theo chuẩn Google style.\n"
+        "4. semantics: Phân tích mục đích, ý nghĩa, thuật toán và logic của code.\n"
+        "Trả lời bằng JSON với các khóa: quality, issues, docstring, semantics. "
+        "Giá trị của mỗi khóa là một chuỗi.",
+        "```python\n{code}\n```\n\nJSON:"
+    ),
+    "generate_commit_message": PromptTemplate(
+        "Tạo một commit message có ý nghĩa cho các thay đổi code sau đây.\n"
+        "Commit message nên ngắn gọn, rõ ràng và mô tả được mục đích của các thay đổi.\n"
+        "Sử dụng định dạng sau: tiêu đề ngắn gọn trên dòng đầu tiên, sau đó là một dòng trống,\n"
+        "tiếp theo là mô tả chi tiết hơn (nếu cần).",
+        "```diff\n{diff}\n```\n",
+        RequestCategory.COMMAND
+    )
+}
+
+# Các khóa trong kết quả của AIHelper.analyze_all và phương thức phân tích riêng lẻ tương ứng
+ANALYZE_ALL_TASKS: Dict[str, str] = {
+    "quality": "analyze_code_quality",
+    "issues": "find_code_issues",
+    "docstring": "generate_docstring",
+    "semantics": "semantic_analysis",
+}
+
+
+def _parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Đọc một object JSON từ câu trả lời của mô hình.
+    
+    Mô hình thường bọc JSON trong ```json ... ``` hoặc thêm lời dẫn, nên nếu
+    không đọc trực tiếp được thì lấy đoạn từ dấu { đầu tiên đến dấu } cuối cùng.
+    
+    Args:
+        text: Câu trả lời của mô hình
         
-    except Exception as e:
-        error_msg = f"Lỗi không xác định khi gọi LLM: {str(e)}"
-        logger.error(f"{error_msg}\n{traceback.format_exc()}")
-        return f"[Lỗi] {error_msg}"
+    Returns:
+        Optional[Dict[str, Any]]: Object JSON hoặc None nếu không đọc được
+    """
+    candidates = [text.strip()]
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        candidates.append(match.group(0))
+    
+    for candidate in candidates:
+        try:
+            data = orjson.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
 
 
 class AIHelper:
     """
     Lớp quản lý các chức năng AI trong ứng dụng.
     Cung cấp các phương thức để phân tích và tối ưu code sử dụng mô hình AI.
+    
+    Mỗi prompt được tách thành hai phần: phần hướng dẫn cố định (system_prompt)
+    và phần code thay đổi theo từng lần gọi. Provider cache theo prefix nên phần
+    hướng dẫn phải giống hệt nhau giữa các lần gọi: không đưa timestamp, id
+    hay dữ liệu riêng của từng request vào phần này.
     """
     
     def __init__(self, custom_config: Optional[AIConfig] = None):
@@ -398,6 +1273,39 @@ class AIHelper:
         """
         self.config = custom_config if custom_config else config
     
+    def _call_ai(self, prompt: str, temperature: float = 0.3, system_prompt: Optional[str] = None,
+                 category: RequestCategory = RequestCategory.INFORMATIONAL) -> str:
+        """
+        Gửi prompt đến mô hình AI mặc định.
+        
+        Args:
+            prompt: Phần nội dung thay đổi theo từng lần gọi (thường là code)
+            temperature: Độ sáng tạo của mô hình (0.0-1.0)
+            system_prompt: Phần hướng dẫn cố định đặt trước prompt
+            category: Loại request; chỉ request INFORMATIONAL được cache
+            
+        Returns:
+            Kết quả từ mô hình hoặc thông báo lỗi
+        """
+        return call_local_model(prompt, temperature=temperature, system_prompt=system_prompt,
+                                cacheable=category is RequestCategory.INFORMATIONAL)
+    
+    def _run_prompt(self, name: str, temperature: float = 0.3, **values: Any) -> str:
+        """
+        Dựng prompt từ PROMPT_TEMPLATES và gửi đến mô hình AI.
+        
+        Args:
+            name: Tên template trong PROMPT_TEMPLATES
+            temperature: Độ sáng tạo của mô hình (0.0-1.0)
+            **values: Giá trị điền vào template (code, target_language, ...)
+            
+        Returns:
+            Kết quả từ mô hình hoặc thông báo lỗi
+        """
+        template = PROMPT_TEMPLATES[name]
+        system_prompt, prompt = template.render(**values)
+        return self._call_ai(prompt, temperature, system_prompt, template.category)
+    
     def analyze_code_quality(self, code: str, temperature: float = 0.3) -> str:
         """
         Đánh giá chất lượng code bằng LLM.
@@ -409,15 +1317,7 @@ class AIHelper:
         Returns:
             Kết quả phân tích chất lượng code
         """
-        prompt = f"""Đánh giá chất lượng đoạn code sau, chỉ ra điểm mạnh/yếu, code smell nếu có.
-Hãy phân tích theo các tiêu chí: tính bảo trì, hiệu suất, tính rò rỉ, và các best practice.
-
-```python
-{code}
-```
-
-Kết quả đánh giá:"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("analyze_code_quality", temperature, code=code)
     
     def find_code_issues(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -430,16 +1330,7 @@ Kết quả đánh giá:"""
         Returns:
             Danh sách các vấn đề được phát hiện
         """
-        prompt = f"""Tìm lỗi, bug, hoặc vấn đề bảo mật trong đoạn code sau.
-Hãy phân tích kỹ lưỡng và liệt kê các vấn đề theo mức độ nghiêm trọng (Critical, High, Medium, Low).
-
-```python
-{code}
-```
-
-Các vấn đề phát hiện:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("find_code_issues", temperature, code=code)
     
     def generate_docstring(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -452,16 +1343,7 @@ Các vấn đề phát hiện:
         Returns:
             Docstring được tạo ra
         """
-        prompt = f"""Viết docstring chi tiết cho đoạn code sau theo chuẩn Google style.
-Bao gồm mô tả chức năng, các tham số (với kiểu dữ liệu), giá trị trả về, và các exception nếu có.
-
-```python
-{code}
-```
-
-Docstring:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("generate_docstring", temperature, code=code)
     
     def suggest_refactor(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -474,16 +1356,7 @@ Docstring:
         Returns:
             Đề xuất refactor và mã nguồn đã được cải tiến
         """
-        prompt = f"""Đề xuất cách tối ưu hóa hoặc refactor đoạn code sau.
-Hãy giải thích lý do cần refactor và cung cấp mã nguồn đã được cải tiến.
-
-```python
-{code}
-```
-
-Đề xuất refactor:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("suggest_refactor", temperature, code=code)
     
     def semantic_analysis(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -496,16 +1369,7 @@ Hãy giải thích lý do cần refactor và cung cấp mã nguồn đã đượ
         Returns:
             Phân tích ý nghĩa và mục đích của code
         """
-        prompt = f"""Phân tích mục đích, ý nghĩa của đoạn code sau (không chỉ mô tả cú pháp).
-Hãy giải thích thuật toán, logic, và cách tiếp cận được sử dụng.
-
-```python
-{code}
-```
-
-Phân tích:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("semantic_analysis", temperature, code=code)
     
     def explain_code(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -518,16 +1382,7 @@ Phân tích:
         Returns:
             Giải thích code theo cách dễ hiểu
         """
-        prompt = f"""Giải thích đoạn code sau theo cách dễ hiểu cho người mới học lập trình.
-Hãy giải thích từng dòng và khái niệm quan trọng.
-
-```python
-{code}
-```
-
-Giải thích:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("explain_code", temperature, code=code)
     
     def generate_unit_test(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -540,16 +1395,7 @@ Giải thích:
         Returns:
             Unit test được tạo ra
         """
-        prompt = f"""Viết unit test cho đoạn code sau sử dụng pytest.
-Bao gồm các test case cho các tình huống biên thử và các trường hợp hợp lệ.
-
-```python
-{code}
-```
-
-Unit test:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("generate_unit_test", temperature, code=code)
     
     def translate_code(self, code: str, target_language: str, temperature: float = 0.3) -> str:
         """
@@ -563,16 +1409,40 @@ Unit test:
         Returns:
             Mã nguồn đã được dịch sang ngôn ngữ đích
         """
-        prompt = f"""Dịch đoạn code Python sau sang {target_language}.
-Giữ nguyên chức năng và logic, đồng thời tận dụng các tính năng đặc trưng của {target_language}.
-
-```python
-{code}
-```
-
-Mã {target_language}:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("translate_code", temperature, code=code, target_language=target_language)
+    
+    def analyze_all(self, code: str, temperature: float = 0.3) -> Dict[str, str]:
+        """
+        Chạy cùng lúc đánh giá chất lượng, tìm lỗi, sinh docstring và phân tích
+        ý nghĩa trong một lần gọi LLM duy nhất.
+        
+        Code chỉ được gửi (và prefill) một lần thay vì bốn lần. Nếu câu trả lời
+        không phải JSON hợp lệ, sẽ quay về gọi từng phương thức riêng lẻ.
+        
+        Args:
+            code: Mã nguồn cần phân tích
+            temperature: Độ sáng tạo của mô hình (0.0-1.0)
+            
+        Returns:
+            Dict[str, str]: Kết quả theo các khóa quality, issues, docstring, semantics
+        """
+        response = self._run_prompt("analyze_all", temperature, code=code)
+        if response.startswith("[Lỗi]"):
+            return {key: response for key in ANALYZE_ALL_TASKS}
+        
+        data = _parse_json_object(response)
+        if data is None:
+            logger.warning("Kết quả phân tích gộp không phải JSON hợp lệ, chuyển sang gọi từng phần")
+            return {
+                key: getattr(self, method)(code, temperature)
+                for key, method in ANALYZE_ALL_TASKS.items()
+            }
+        
+        results = {}
+        for key in ANALYZE_ALL_TASKS:
+            value = data.get(key, "")
+            results[key] = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=2)
+        return results
     
     def improve_error_handling(self, code: str, temperature: float = 0.3) -> str:
         """
@@ -585,30 +1455,23 @@ Mã {target_language}:
         Returns:
             Mã nguồn với xử lý lỗi được cải thiện
         """
-        prompt = f"""Cải thiện xử lý lỗi trong đoạn code sau.
-Thêm try-except blocks cho các thao tác có thể gây lỗi, xử lý các trường hợp đặc biệt, và đảm bảo code không bị crash.
-
-```python
-{code}
-```
-
-Code với xử lý lỗi cải thiện:
-"""
-        return call_local_model(prompt, temperature=temperature)
+        return self._run_prompt("improve_error_handling", temperature, code=code)
 
 
 # Các hàm tiện ích
 def validate_prompt(prompt: str) -> bool:
     """Kiểm tra xem prompt có hợp lệ không (không rỗng và không chỉ có khoảng trắng)"""
-    return len(prompt.strip()) > 0
+    # isspace() dừng ngay ở ký tự khác khoảng trắng đầu tiên và không tạo chuỗi mới như strip()
+    return bool(prompt) and not prompt.isspace()
 
 
-@retry_on_error()
-def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
-               temperature: Optional[float] = None, max_tokens: Optional[int] = None,
-               timeout: Optional[int] = None) -> str:
+@single_flight
+async def call_claude_async(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                            temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                            timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                            cacheable: bool = True) -> str:
     """
-    Gọi Anthropic Claude API và trả về kết quả.
+    Gọi Anthropic Claude API (bất đồng bộ) và trả về kết quả.
     
     Args:
         prompt: Nội dung cần gửi đến mô hình
@@ -617,6 +1480,8 @@ def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
         max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
         timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
         
     Returns:
         Kết quả từ mô hình hoặc thông báo lỗi
@@ -629,10 +1494,11 @@ def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str]
     _timeout = timeout if timeout is not None else config.timeout
     
     # Kiểm tra cache
-    cache_key = get_cache_key(prompt, _model, _temperature)
-    cached_response = get_cached_response(cache_key)
-    if cached_response:
-        return cached_response
+    cache_key = get_cache_key(prompt, _model, _temperature, system_prompt or "")
+    if cacheable:
+        cached_response = get_cached_response(cache_key)
+        if cached_response:
+            return cached_response
     
     if not _api_key:
         error_msg = "Thiếu Claude API key"
@@ -644,33 +1510,31 @@ def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         logger.error(error_msg)
         return f"[Lỗi] {error_msg}"
     
-    headers = {
-        "x-api-key": _api_key,
-        "anthropic-version": "2023-06-01",
-        "content-type": "application/json"
-    }
+    headers = _claude_headers(_api_key)
+    
+    # Phần hướng dẫn cố định được đánh dấu cache_control để Anthropic
+    # tái sử dụng KV cache của prefix giữa các lần gọi
+    if system_prompt:
+        user_content: Union[str, List[Dict[str, Any]]] = [
+            {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt}
+        ]
+    else:
+        user_content = prompt
     
     data = {
         "model": _model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": [{"role": "user", "content": user_content}],
         "temperature": _temperature,
         "max_tokens": _max_tokens
     }
     
     try:
         logger.info(f"Gọi Claude API với model {_model}")
-        start_time = time.time()
-        
-        resp = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers=headers,
-            json=data,
-            timeout=_timeout
-        )
-        resp.raise_for_status()
+        start_time = time.monotonic()
         
-        result = resp.json()
-        duration = time.time() - start_time
+        result = await _post_json_async("https://api.anthropic.com/v1/messages", data, headers, _timeout)
+        duration = time.monotonic() - start_time
         
         content = result.get("content", [])
         if not content or not isinstance(content, list):
@@ -687,22 +1551,46 @@ def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         logger.info(f"Nhận được kết quả từ Claude ({len(text_content)} ký tự) trong {duration:.2f}s")
         
         # Lưu vào cache
-        cache_response(cache_key, text_content)
+        if cacheable:
+            cache_response(cache_key, text_content)
         
         return text_content
         
     except Exception as e:
-        error_msg = f"Lỗi khi gọi Claude API: {str(e)}"
-        logger.error(f"{error_msg}\n{traceback.format_exc()}")
-        return f"[Lỗi] {error_msg}"
+        return _api_error_result(e, "Claude API", _timeout)
 
 
-@retry_on_error()
-def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
+def call_claude(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
                temperature: Optional[float] = None, max_tokens: Optional[int] = None,
-               timeout: Optional[int] = None) -> str:
+               timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+               cacheable: bool = True) -> str:
+    """
+    Gọi Anthropic Claude API và trả về kết quả (bản đồng bộ của call_claude_async).
+    
+    Args:
+        prompt: Nội dung cần gửi đến mô hình
+        api_key: API key cho Claude. Nếu None, sẽ dùng giá trị từ config
+        model: Tên mô hình cần sử dụng. Nếu None, sẽ dùng giá trị từ config
+        temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
+        max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
+        timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
+        
+    Returns:
+        Kết quả từ mô hình hoặc thông báo lỗi
+    """
+    return run_sync(call_claude_async(prompt, api_key, model, temperature, max_tokens, timeout,
+                                      system_prompt, cacheable))
+
+
+@single_flight
+async def call_gemini_async(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                            temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                            timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+                            cacheable: bool = True) -> str:
     """
-    Gọi Google Gemini API và trả về kết quả.
+    Gọi Google Gemini API (bất đồng bộ) và trả về kết quả.
     
     Args:
         prompt: Nội dung cần gửi đến mô hình
@@ -711,6 +1599,8 @@ def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
         max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
         timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
         
     Returns:
         Kết quả từ mô hình hoặc thông báo lỗi
@@ -723,10 +1613,11 @@ def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str]
     _timeout = timeout if timeout is not None else config.timeout
     
     # Kiểm tra cache
-    cache_key = get_cache_key(prompt, _model, _temperature)
-    cached_response = get_cached_response(cache_key)
-    if cached_response:
-        return cached_response
+    cache_key = get_cache_key(prompt, _model, _temperature, system_prompt or "")
+    if cacheable:
+        cached_response = get_cached_response(cache_key)
+        if cached_response:
+            return cached_response
     
     if not _api_key:
         error_msg = "Thiếu Gemini API key"
@@ -740,12 +1631,17 @@ def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str]
     
     try:
         logger.info(f"Gọi Gemini API với model {_model}")
-        start_time = time.time()
+        start_time = time.monotonic()
         
         url = f"https://generativelanguage.googleapis.com/v1/models/{_model}:generateContent?key={_api_key}"
         
+        # Phần hướng dẫn cố định luôn đứng trước nội dung thay đổi
+        parts = [{"text": prompt}]
+        if system_prompt:
+            parts.insert(0, {"text": system_prompt})
+        
         data = {
-            "contents": [{"parts": [{"text": prompt}]}],
+            "contents": [{"parts": parts}],
             "generationConfig": {
                 "temperature": _temperature,
                 "maxOutputTokens": _max_tokens,
@@ -754,15 +1650,8 @@ def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str]
             }
         }
         
-        resp = requests.post(
-            url,
-            json=data,
-            timeout=_timeout
-        )
-        resp.raise_for_status()
-        
-        result = resp.json()
-        duration = time.time() - start_time
+        result = await _post_json_async(url, data, _JSON_HEADERS, _timeout)
+        duration = time.monotonic() - start_time
         
         # Xử lý kết quả
         if not result.get("candidates"):
@@ -774,26 +1663,126 @@ def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str]
         logger.info(f"Nhận được kết quả từ Gemini ({len(content)} ký tự) trong {duration:.2f}s")
         
         # Lưu vào cache
-        cache_response(cache_key, content)
+        if cacheable:
+            cache_response(cache_key, content)
         
         return content
         
     except Exception as e:
-        error_msg = f"Lỗi khi gọi Gemini API: {str(e)}"
-        logger.error(f"{error_msg}\n{traceback.format_exc()}")
-        return f"[Lỗi] {error_msg}"
+        return _api_error_result(e, "Gemini API", _timeout)
+
+
+def call_gemini(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None,
+               temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+               timeout: Optional[int] = None, system_prompt: Optional[str] = None,
+               cacheable: bool = True) -> str:
+    """
+    Gọi Google Gemini API và trả về kết quả (bản đồng bộ của call_gemini_async).
+    
+    Args:
+        prompt: Nội dung cần gửi đến mô hình
+        api_key: API key cho Gemini. Nếu None, sẽ dùng giá trị từ config
+        model: Tên mô hình cần sử dụng. Nếu None, sẽ dùng giá trị từ config
+        temperature: Độ sáng tạo (0.0-1.0). Nếu None, sẽ dùng giá trị từ config
+        max_tokens: Số token tối đa trong kết quả. Nếu None, sẽ dùng giá trị từ config
+        timeout: Thời gian chờ tối đa (giây). Nếu None, sẽ dùng giá trị từ config
+        system_prompt: Phần hướng dẫn cố định đặt trước prompt để provider cache theo prefix
+        cacheable: Có dùng cache kết quả hay không (False cho request dạng COMMAND)
+        
+    Returns:
+        Kết quả từ mô hình hoặc thông báo lỗi
+    """
+    return run_sync(call_gemini_async(prompt, api_key, model, temperature, max_tokens, timeout,
+                                      system_prompt, cacheable))
+
+
+# Bảng ánh xạ provider -> hàm gọi bất đồng bộ, dùng cho gọi theo lô
+_ASYNC_PROVIDERS: Dict[str, Callable[..., Any]] = {
+    "local": call_local_model_async,
+    "openai": call_openai_async,
+    "claude": call_claude_async,
+    "gemini": call_gemini_async,
+}
+
+
+async def batch_call_async(prompts: List[str], provider: str = "openai", **kwargs: Any) -> List[str]:
+    """
+    Gửi nhiều prompt song song đến cùng một provider.
+    
+    Số request chạy đồng thời được giới hạn bởi config.max_concurrency.
+    
+    Args:
+        prompts: Danh sách prompt cần gửi
+        provider: Tên provider ("local", "openai", "claude" hoặc "gemini")
+        **kwargs: Tham số bổ sung truyền cho hàm gọi API
+        
+    Returns:
+        List[str]: Kết quả theo đúng thứ tự của prompts
+    """
+    call = _ASYNC_PROVIDERS[provider]
+    semaphore = asyncio.Semaphore(max(1, config.max_concurrency))
+    
+    async def _call_one(prompt: str) -> str:
+        async with semaphore:
+            return await call(prompt, **kwargs)
+    
+    return await asyncio.gather(*(_call_one(prompt) for prompt in prompts))
+
+
+def batch_call(prompts: List[str], provider: str = "openai", **kwargs: Any) -> List[str]:
+    """Bản đồng bộ của batch_call_async, dùng được từ QThread hoặc script."""
+    return run_sync(batch_call_async(prompts, provider, **kwargs))
 
 
-def estimate_token_count(text: str) -> int:
+# Cache encoding của tiktoken theo tên model (None nếu model không hỗ trợ hoặc không tải được)
+_token_encodings: Dict[str, Any] = {}
+_token_encodings_lock = threading.Lock()
+
+
+def _get_token_encoding(model: str) -> Any:
+    """
+    Lấy encoding tiktoken cho model, khởi tạo lần đầu rồi dùng lại.
+    
+    Returns:
+        Encoding của tiktoken, hoặc None nếu không có tiktoken, model không phải
+        của OpenAI hoặc không tải được file BPE
+    """
+    encoding = _token_encodings.get(model, _token_encodings)
+    if encoding is not _token_encodings:
+        return encoding
+    
+    with _token_encodings_lock:
+        if model not in _token_encodings:
+            try:
+                import tiktoken
+                _token_encodings[model] = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                # Ghi nhớ cả lỗi để không phải thử tải lại ở mỗi lần gọi
+                logger.debug(f"Không dùng được tiktoken cho model {model}: {e}")
+                _token_encodings[model] = None
+        return _token_encodings[model]
+
+
+def estimate_token_count(text: str, model: Optional[str] = None) -> int:
     """
     Ước tính số token trong văn bản.
     
+    Với model của OpenAI, đếm chính xác bằng tiktoken. Với model khác, khi
+    không chỉ định model hoặc khi tiktoken không dùng được, dùng ước tính
+    1 token ~ 4 ký tự.
+    
     Args:
         text: Văn bản cần ước tính
+        model: Tên model dùng để chọn tokenizer (ví dụ config.openai_model)
         
     Returns:
         int: Ước tính số token
     """
+    if model:
+        encoding = _get_token_encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    
     # Phương pháp ước tính đơn giản: 1 token ~ 4 ký tự
     return len(text) // 4
 
@@ -857,28 +1846,37 @@ def summarize_code(code: str, max_length: int = 500, temperature: float = 0.3) -
     Returns:
         str: Bản tóm tắt mã nguồn
     """
-    prompt = f"""Tóm tắt mã nguồn sau thành một mô tả ngắn gọn, không quá {max_length} ký tự. 
-    Tập trung vào mục đích, chức năng chính và cấu trúc của code.
+    return ai_helper._run_prompt("summarize_code", temperature, code=code, max_length=max_length)
 
-    ```
-    {code}
-    ```
-    """
-    return ai_helper._call_ai(prompt, temperature)
 
+# Cache kết quả diff theo (hash nội dung cũ, hash nội dung mới), giới hạn số mục (LRU).
+# Xem trước cùng một thay đổi nhiều lần không phải chạy lại difflib.
+_DIFF_CACHE_MAX_ENTRIES = 64
+_diff_cache: "OrderedDict[Tuple[bytes, bytes], str]" = OrderedDict()
+_diff_cache_lock = threading.Lock()
 
-def review_code_changes(old_code: str, new_code: str, temperature: float = 0.3) -> str:
+
+def _unified_diff(old_code: str, new_code: str) -> str:
     """
-    Review các thay đổi code giữa phiên bản cũ và mới.
+    Tạo unified diff giữa hai phiên bản code, dùng lại kết quả đã tính nếu có.
     
     Args:
         old_code: Mã nguồn cũ
         new_code: Mã nguồn mới
-        temperature: Độ sáng tạo của mô hình (0.0-1.0)
         
     Returns:
-        str: Báo cáo review các thay đổi
+        str: Nội dung diff
     """
+    key = (
+        hashlib.blake2b(old_code.encode(), digest_size=16).digest(),
+        hashlib.blake2b(new_code.encode(), digest_size=16).digest()
+    )
+    with _diff_cache_lock:
+        diff = _diff_cache.get(key)
+        if diff is not None:
+            _diff_cache.move_to_end(key)
+            return diff
+    
     import difflib
     diff = '\n'.join(difflib.unified_diff(
         old_code.splitlines(),
@@ -888,14 +1886,27 @@ def review_code_changes(old_code: str, new_code: str, temperature: float = 0.3)
         lineterm=''
     ))
     
-    prompt = f"""Review các thay đổi code sau đây. Đánh giá chất lượng của các thay đổi, 
-    chỉ ra các vấn đề tiềm ẩn và đề xuất cải tiến nếu có.
+    with _diff_cache_lock:
+        _diff_cache[key] = diff
+        while len(_diff_cache) > _DIFF_CACHE_MAX_ENTRIES:
+            _diff_cache.popitem(last=False)
+    return diff
+
 
-    ```diff
-    {diff}
-    ```
+def review_code_changes(old_code: str, new_code: str, temperature: float = 0.3) -> str:
     """
-    return ai_helper._call_ai(prompt, temperature)
+    Review các thay đổi code giữa phiên bản cũ và mới.
+    
+    Args:
+        old_code: Mã nguồn cũ
+        new_code: Mã nguồn mới
+        temperature: Độ sáng tạo của mô hình (0.0-1.0)
+        
+    Returns:
+        str: Báo cáo review các thay đổi
+    """
+    diff = _unified_diff(old_code, new_code)
+    return ai_helper._run_prompt("review_code_changes", temperature, diff=diff)
 
 
 def generate_commit_message(diff: str, temperature: float = 0.3) -> str:
@@ -909,13 +1920,4 @@ def generate_commit_message(diff: str, temperature: float = 0.3) -> str:
     Returns:
         str: Commit message được tạo ra
     """
-    prompt = f"""Tạo một commit message có ý nghĩa cho các thay đổi code sau đây. 
-    Commit message nên ngắn gọn, rõ ràng và mô tả được mục đích của các thay đổi.
-    Sử dụng định dạng sau: tiêu đề ngắn gọn trên dòng đầu tiên, sau đó là một dòng trống, 
-    tiếp theo là mô tả chi tiết hơn (nếu cần).
-
-    ```diff
-    {diff}
-    ```
-    """
-    return ai_helper._call_ai(prompt, temperature)
+    return ai_helper._run_prompt("generate_commit_message", temperature, diff=diff)
@@ -1,28 +1,50 @@
 from PyQt6.QtWidgets import QPushButton, QDialog, QVBoxLayout, QTextEdit, QPushButton as QBtn, QProgressBar, QLabel
 from PyQt6.QtGui import QKeySequence, QAction
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QObject
+from PyQt6.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, QObject
+from collections import namedtuple
+import logging
 import ai_helper
-import traceback
 
-class AIWorker(QObject):
-    """Worker để chạy các phân tích AI trong luồng riêng"""
+logger = logging.getLogger("windsurf_ai_ui")
+
+class AITaskSignals(QObject):
+    """Tín hiệu của AITask (QRunnable không phải QObject nên không tự có signal)"""
     finished = pyqtSignal()
     result_ready = pyqtSignal(str)
     error = pyqtSignal(str)
+
+class AITask(QRunnable):
+    """Tác vụ chạy một phân tích AI trên thread pool dùng chung"""
     
     def __init__(self, func, code):
         super().__init__()
         self.func = func
         self.code = code
+        self.signals = AITaskSignals()
     
     def run(self):
         try:
             result = self.func(self.code)
-            self.result_ready.emit(result)
+            self.signals.result_ready.emit(result)
         except Exception as e:
-            self.error.emit(str(e) + "\n" + traceback.format_exc())
+            # Traceback chỉ được định dạng bởi handler của logging (nếu bản ghi được xuất),
+            # qua signal chỉ gửi mô tả ngắn để hiển thị cho người dùng
+            logger.exception("Lỗi khi chạy tác vụ AI")
+            self.signals.error.emit(repr(e))
         finally:
-            self.finished.emit()
+            self.signals.finished.emit()
+
+# Thread pool riêng cho các tác vụ AI, tạo một lần và dùng lại cho mọi lần gọi.
+# Giới hạn 2 thread để nhiều thao tác liên tiếp không gửi dồn request tới LLM.
+_ai_pool = None
+
+def get_ai_pool():
+    """Trả về thread pool dùng chung cho các tác vụ AI"""
+    global _ai_pool
+    if _ai_pool is None:
+        _ai_pool = QThreadPool()
+        _ai_pool.setMaxThreadCount(2)
+    return _ai_pool
 
 def show_ai_result_dialog(parent, title, content):
     """Hiển thị dialog kết quả phân tích AI"""
@@ -60,207 +82,89 @@ def show_ai_progress_dialog(parent, title):
     return dlg
 
 # --- Hàm AI tích hợp vào MainWindow ---
+
+# Mô tả một thao tác AI: slot trên MainWindow, hàm trong ai_helper, nút/phím tắt và các tiêu đề
+AIAction = namedtuple("AIAction", [
+    "slot", "func_name", "label", "color", "shortcut", "shortcut_attr",
+    "title", "progress_title", "empty_message", "error_action"
+])
+
+AI_ACTIONS = [
+    AIAction("ai_analyze_code_quality", "analyze_code_quality", "AI Analyze", "#00ff00",
+             "Ctrl+Alt+Q", "ai_shortcut_analyze", "AI Code Quality", "Đang phân tích...",
+             "Không có mã để phân tích", "phân tích"),
+    AIAction("ai_find_code_issues", "find_code_issues", "AI Find Issues", "#FFD700",
+             "Ctrl+Alt+B", "ai_shortcut_bug", "AI Find Issues", "Đang tìm lỗi...",
+             "Không có mã để phân tích", "tìm lỗi"),
+    AIAction("ai_generate_docstring", "generate_docstring", "AI Docstring", "#61AFEF",
+             "Ctrl+Alt+D", "ai_shortcut_doc", "AI Docstring", "Đang tạo docstring...",
+             "Không có mã để tạo docstring", "tạo docstring"),
+    AIAction("ai_suggest_refactor", "suggest_refactor", "AI Refactor", "#00FFFF",
+             "Ctrl+Alt+R", "ai_shortcut_refactor", "AI Refactor", "Đang phân tích cải tiến...",
+             "Không có mã để đề xuất cải tiến", "đề xuất cải tiến"),
+    AIAction("ai_semantic_analysis", "semantic_analysis", "AI Semantic", "#FF69B4",
+             "Ctrl+Alt+S", "ai_shortcut_semantic", "AI Semantic Analysis", "Đang phân tích ngữ nghĩa...",
+             "Không có mã để phân tích ngữ nghĩa", "phân tích ngữ nghĩa"),
+]
+
+_AI_ACTIONS_BY_SLOT = {action.slot: action for action in AI_ACTIONS}
+
 def get_code_from_editor(self):
     return self.code_editor.toPlainText()
 
-def ai_analyze_code_quality(self):
-    """Phân tích chất lượng mã trong luồng riêng"""
+def run_ai_action(self, slot):
+    """Chạy thao tác AI có tên slot (xem AI_ACTIONS) trong thread pool và hiển thị kết quả"""
+    action = _AI_ACTIONS_BY_SLOT[slot]
     code = self.get_code_from_editor()
     if not code.strip():
-        show_ai_result_dialog(self, "AI Code Quality", "Không có mã để phân tích")
+        show_ai_result_dialog(self, action.title, action.empty_message)
         return
     
     # Tạo dialog tiến trình
-    progress_dlg = show_ai_progress_dialog(self, "Đang phân tích...")
+    progress_dlg = show_ai_progress_dialog(self, action.progress_title)
     
-    # Tạo thread và worker
-    self.thread = QThread()
-    self.worker = AIWorker(ai_helper.analyze_code_quality, code)
-    self.worker.moveToThread(self.thread)
+    # Tạo tác vụ và kết nối tín hiệu
+    task = AITask(getattr(ai_helper, action.func_name), code)
+    task.signals.finished.connect(progress_dlg.accept)
+    task.signals.result_ready.connect(lambda result: show_ai_result_dialog(self, action.title, result))
+    task.signals.error.connect(lambda error: show_ai_result_dialog(
+        self, "Lỗi", f"Đã xảy ra lỗi khi {action.error_action}: {error}"))
     
-    # Kết nối tín hiệu
-    self.thread.started.connect(self.worker.run)
-    self.worker.finished.connect(self.thread.quit)
-    self.worker.finished.connect(self.worker.deleteLater)
-    self.thread.finished.connect(self.thread.deleteLater)
-    self.thread.finished.connect(progress_dlg.accept)
-    
-    # Xử lý kết quả
-    self.worker.result_ready.connect(lambda result: show_ai_result_dialog(self, "AI Code Quality", result))
-    self.worker.error.connect(lambda error: show_ai_result_dialog(self, "Lỗi", f"Đã xảy ra lỗi khi phân tích: {error}"))
-    
-    # Bắt đầu thread và hiển thị dialog
-    self.thread.start()
+    # Đưa tác vụ vào thread pool và hiển thị dialog
+    get_ai_pool().start(task)
     progress_dlg.exec()
 
+def ai_analyze_code_quality(self):
+    """Phân tích chất lượng mã trong luồng riêng"""
+    run_ai_action(self, "ai_analyze_code_quality")
+
 def ai_find_code_issues(self):
     """Tìm lỗi trong mã trong luồng riêng"""
-    code = self.get_code_from_editor()
-    if not code.strip():
-        show_ai_result_dialog(self, "AI Find Issues", "Không có mã để phân tích")
-        return
-    
-    # Tạo dialog tiến trình
-    progress_dlg = show_ai_progress_dialog(self, "Đang tìm lỗi...")
-    
-    # Tạo thread và worker
-    self.thread = QThread()
-    self.worker = AIWorker(ai_helper.find_code_issues, code)
-    self.worker.moveToThread(self.thread)
-    
-    # Kết nối tín hiệu
-    self.thread.started.connect(self.worker.run)
-    self.worker.finished.connect(self.thread.quit)
-    self.worker.finished.connect(self.worker.deleteLater)
-    self.thread.finished.connect(self.thread.deleteLater)
-    self.thread.finished.connect(progress_dlg.accept)
-    
-    # Xử lý kết quả
-    self.worker.result_ready.connect(lambda result: show_ai_result_dialog(self, "AI Find Issues", result))
-    self.worker.error.connect(lambda error: show_ai_result_dialog(self, "Lỗi", f"Đã xảy ra lỗi khi tìm lỗi: {error}"))
-    
-    # Bắt đầu thread và hiển thị dialog
-    self.thread.start()
-    progress_dlg.exec()
+    run_ai_action(self, "ai_find_code_issues")
 
 def ai_generate_docstring(self):
     """Tạo docstring trong luồng riêng"""
-    code = self.get_code_from_editor()
-    if not code.strip():
-        show_ai_result_dialog(self, "AI Docstring", "Không có mã để tạo docstring")
-        return
-    
-    # Tạo dialog tiến trình
-    progress_dlg = show_ai_progress_dialog(self, "Đang tạo docstring...")
-    
-    # Tạo thread và worker
-    self.thread = QThread()
-    self.worker = AIWorker(ai_helper.generate_docstring, code)
-    self.worker.moveToThread(self.thread)
-    
-    # Kết nối tín hiệu
-    self.thread.started.connect(self.worker.run)
-    self.worker.finished.connect(self.thread.quit)
-    self.worker.finished.connect(self.worker.deleteLater)
-    self.thread.finished.connect(self.thread.deleteLater)
-    self.thread.finished.connect(progress_dlg.accept)
-    
-    # Xử lý kết quả
-    self.worker.result_ready.connect(lambda result: show_ai_result_dialog(self, "AI Docstring", result))
-    self.worker.error.connect(lambda error: show_ai_result_dialog(self, "Lỗi", f"Đã xảy ra lỗi khi tạo docstring: {error}"))
-    
-    # Bắt đầu thread và hiển thị dialog
-    self.thread.start()
-    progress_dlg.exec()
+    run_ai_action(self, "ai_generate_docstring")
 
 def ai_suggest_refactor(self):
     """Đề xuất cải tiến mã trong luồng riêng"""
-    code = self.get_code_from_editor()
-    if not code.strip():
-        show_ai_result_dialog(self, "AI Refactor", "Không có mã để đề xuất cải tiến")
-        return
-    
-    # Tạo dialog tiến trình
-    progress_dlg = show_ai_progress_dialog(self, "Đang phân tích cải tiến...")
-    
-    # Tạo thread và worker
-    self.thread = QThread()
-    self.worker = AIWorker(ai_helper.suggest_refactor, code)
-    self.worker.moveToThread(self.thread)
-    
-    # Kết nối tín hiệu
-    self.thread.started.connect(self.worker.run)
-    self.worker.finished.connect(self.thread.quit)
-    self.worker.finished.connect(self.worker.deleteLater)
-    self.thread.finished.connect(self.thread.deleteLater)
-    self.thread.finished.connect(progress_dlg.accept)
-    
-    # Xử lý kết quả
-    self.worker.result_ready.connect(lambda result: show_ai_result_dialog(self, "AI Refactor", result))
-    self.worker.error.connect(lambda error: show_ai_result_dialog(self, "Lỗi", f"Đã xảy ra lỗi khi đề xuất cải tiến: {error}"))
-    
-    # Bắt đầu thread và hiển thị dialog
-    self.thread.start()
-    progress_dlg.exec()
+    run_ai_action(self, "ai_suggest_refactor")
 
 def ai_semantic_analysis(self):
     """Phân tích ngữ nghĩa mã trong luồng riêng"""
-    code = self.get_code_from_editor()
-    if not code.strip():
-        show_ai_result_dialog(self, "AI Semantic Analysis", "Không có mã để phân tích ngữ nghĩa")
-        return
-    
-    # Tạo dialog tiến trình
-    progress_dlg = show_ai_progress_dialog(self, "Đang phân tích ngữ nghĩa...")
-    
-    # Tạo thread và worker
-    self.thread = QThread()
-    self.worker = AIWorker(ai_helper.semantic_analysis, code)
-    self.worker.moveToThread(self.thread)
-    
-    # Kết nối tín hiệu
-    self.thread.started.connect(self.worker.run)
-    self.worker.finished.connect(self.thread.quit)
-    self.worker.finished.connect(self.worker.deleteLater)
-    self.thread.finished.connect(self.thread.deleteLater)
-    self.thread.finished.connect(progress_dlg.accept)
-    
-    # Xử lý kết quả
-    self.worker.result_ready.connect(lambda result: show_ai_result_dialog(self, "AI Semantic Analysis", result))
-    self.worker.error.connect(lambda error: show_ai_result_dialog(self, "Lỗi", f"Đã xảy ra lỗi khi phân tích ngữ nghĩa: {error}"))
-    
-    # Bắt đầu thread và hiển thị dialog
-    self.thread.start()
-    progress_dlg.exec()
+    run_ai_action(self, "ai_semantic_analysis")
 
 def add_ai_buttons_to_toolbar(self, toolbar):
-    ai_analyze_btn = QPushButton("AI Analyze")
-    ai_analyze_btn.setStyleSheet("color: #00ff00; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
-    ai_analyze_btn.clicked.connect(self.ai_analyze_code_quality)
-    toolbar.addWidget(ai_analyze_btn)
-
-    ai_bug_btn = QPushButton("AI Find Issues")
-    ai_bug_btn.setStyleSheet("color: #FFD700; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
-    ai_bug_btn.clicked.connect(self.ai_find_code_issues)
-    toolbar.addWidget(ai_bug_btn)
-
-    ai_doc_btn = QPushButton("AI Docstring")
-    ai_doc_btn.setStyleSheet("color: #61AFEF; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
-    ai_doc_btn.clicked.connect(self.ai_generate_docstring)
-    toolbar.addWidget(ai_doc_btn)
-
-    ai_refactor_btn = QPushButton("AI Refactor")
-    ai_refactor_btn.setStyleSheet("color: #00FFFF; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
-    ai_refactor_btn.clicked.connect(self.ai_suggest_refactor)
-    toolbar.addWidget(ai_refactor_btn)
-
-    ai_semantic_btn = QPushButton("AI Semantic")
-    ai_semantic_btn.setStyleSheet("color: #FF69B4; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
-    ai_semantic_btn.clicked.connect(self.ai_semantic_analysis)
-    toolbar.addWidget(ai_semantic_btn)
+    for action in AI_ACTIONS:
+        btn = QPushButton(action.label)
+        btn.setStyleSheet(f"color: {action.color}; font-weight: bold; background: #15151f; border-radius: 5px; padding: 5px 12px;")
+        btn.clicked.connect(getattr(self, action.slot))
+        toolbar.addWidget(btn)
 
 def add_ai_shortcuts_to_editor(self):
-    self.ai_shortcut_analyze = QAction("AI Analyze", self)
-    self.ai_shortcut_analyze.setShortcut(QKeySequence("Ctrl+Alt+Q"))
-    self.ai_shortcut_analyze.triggered.connect(self.ai_analyze_code_quality)
-    self.code_editor.addAction(self.ai_shortcut_analyze)
-
-    self.ai_shortcut_bug = QAction("AI Find Issues", self)
-    self.ai_shortcut_bug.setShortcut(QKeySequence("Ctrl+Alt+B"))
-    self.ai_shortcut_bug.triggered.connect(self.ai_find_code_issues)
-    self.code_editor.addAction(self.ai_shortcut_bug)
-
-    self.ai_shortcut_doc = QAction("AI Docstring", self)
-    self.ai_shortcut_doc.setShortcut(QKeySequence("Ctrl+Alt+D"))
-    self.ai_shortcut_doc.triggered.connect(self.ai_generate_docstring)
-    self.code_editor.addAction(self.ai_shortcut_doc)
-
-    self.ai_shortcut_refactor = QAction("AI Refactor", self)
-    self.ai_shortcut_refactor.setShortcut(QKeySequence("Ctrl+Alt+R"))
-    self.ai_shortcut_refactor.triggered.connect(self.ai_suggest_refactor)
-    self.code_editor.addAction(self.ai_shortcut_refactor)
-
-    self.ai_shortcut_semantic = QAction("AI Semantic", self)
-    self.ai_shortcut_semantic.setShortcut(QKeySequence("Ctrl+Alt+S"))
-    self.ai_shortcut_semantic.triggered.connect(self.ai_semantic_analysis)
-    self.code_editor.addAction(self.ai_shortcut_semantic)
+    for action in AI_ACTIONS:
+        shortcut = QAction(action.label, self)
+        shortcut.setShortcut(QKeySequence(action.shortcut))
+        shortcut.triggered.connect(getattr(self, action.slot))
+        self.code_editor.addAction(shortcut)
+        setattr(self, action.shortcut_attr, shortcut)
@@ -11,15 +11,21 @@ Vì chưa có API thực của WindSurf, module này sẽ cung cấp:
 """
 
 import os
+import re
+import mmap
 import time
+import signal
+import fnmatch
 import threading
 import logging
 import json
 import hashlib
 import datetime
-from typing import Dict, List, Callable, Any, Optional, Tuple
-from pathlib import Path
+import itertools
+from collections import OrderedDict
+from typing import Dict, List, Callable, Any, Optional, Tuple, Union, Literal, Iterator
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 
 # Thiết lập logging
@@ -28,9 +34,108 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger("windsurf_api")
 
 # Định nghĩa các kiểu callback
-FileChangedCallback = Callable[[str, str], None]  # (file_path, content) -> None
-FileSavedCallback = Callable[[str, str], None]    # (file_path, content) -> None
+FileChangedCallback = Callable[[str, Union[str, bytes]], None]  # (file_path, content) -> None
+FileSavedCallback = Callable[[str, Union[str, bytes]], None]    # (file_path, content) -> None
 EditorEventCallback = Callable[[Dict[str, Any]], None]  # (event_data) -> None
+FileBatchChangedCallback = Callable[[List[Tuple[str, bytes]]], None]  # ([(file_path, data), ...]) -> None
+
+# Thời điểm sự kiện được lưu dạng số nguyên nano giây (time.time_ns), không
+# định dạng ISO ngay trên đường xử lý sự kiện; dùng format_timestamp khi cần hiển thị
+_now_ns = time.time_ns
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    """
+    Chuyển timestamp_ns của sự kiện sang chuỗi ISO 8601 (giờ địa phương).
+    
+    Args:
+        timestamp_ns: Thời điểm tính bằng nano giây kể từ epoch
+        
+    Returns:
+        str: Thời điểm dạng ISO 8601
+    """
+    return datetime.datetime.fromtimestamp(timestamp_ns / 1e9).isoformat()
+
+
+# File từ ngưỡng này trở lên được đọc qua mmap thay vì read() thông thường
+_MMAP_THRESHOLD = 64 * 1024
+_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
+
+
+def _read_file(file_path: str) -> bytes:
+    """
+    Đọc toàn bộ file dạng bytes với ít bước trung gian nhất.
+    
+    Dùng trực tiếp file descriptor (không qua BufferedReader/TextIOWrapper);
+    file lớn được map vào bộ nhớ và sao chép một lần.
+    
+    Args:
+        file_path: Đường dẫn đến file
+        
+    Returns:
+        bytes: Nội dung file
+    """
+    fd = os.open(file_path, _OPEN_FLAGS)
+    try:
+        return _read_fd(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+def _read_file_if_newer(file_path: str, last_mtime_ns: int) -> Tuple[int, Optional[bytes]]:
+    """
+    Đọc file chỉ khi mtime mới hơn lần trước, lấy mtime qua fstat của chính fd vừa mở.
+    
+    Thay cho getmtime() rồi mới open(): không stat đường dẫn lần thứ hai.
+    
+    Args:
+        file_path: Đường dẫn đến file
+        last_mtime_ns: mtime (nano giây) đã xử lý lần trước
+        
+    Returns:
+        Tuple[int, Optional[bytes]]: (mtime hiện tại, nội dung hoặc None nếu file chưa đổi)
+    """
+    fd = os.open(file_path, _OPEN_FLAGS)
+    try:
+        st = os.fstat(fd)
+        if st.st_mtime_ns <= last_mtime_ns:
+            return st.st_mtime_ns, None
+        return st.st_mtime_ns, _read_fd(fd, st.st_size)
+    finally:
+        os.close(fd)
+
+
+def _read_fd(fd: int, size: int) -> bytes:
+    """Đọc toàn bộ nội dung từ fd đã mở, size lấy từ fstat"""
+    if size >= _MMAP_THRESHOLD:
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+    
+    # File nhỏ (hoặc file đặc biệt báo size 0): đọc đến hết, phòng khi file vừa được ghi thêm
+    chunks = []
+    while True:
+        chunk = os.read(fd, max(size, 8192))
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def _decode_text(data: bytes) -> str:
+    """
+    Decode nội dung file UTF-8 và chuẩn hóa xuống dòng về "\\n".
+    
+    Cho kết quả giống open(..., 'r', encoding='utf-8') (universal newlines).
+    """
+    text = data.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+# Dạng nội dung file truyền cho callback: 'text' (str UTF-8) hoặc 'bytes' (dữ liệu gốc).
+# Callback chỉ cần hash/kích thước nên dùng 'bytes' để khỏi phải decode cả file.
+ReadMode = Literal['bytes', 'text']
 
 
 class WindSurfAPIClient:
@@ -43,21 +148,29 @@ class WindSurfAPIClient:
     - Kiểm tra trạng thái kết nối
     """
     
-    def __init__(self, use_mock: bool = True):
+    def __init__(self, use_mock: bool = True, batch_window: float = 0.01):
         """
         Khởi tạo API client.
         
         Args:
             use_mock: Sử dụng API giả lập (True) hoặc kết nối API thật (False)
+            batch_window: Khoảng thời gian (giây) gom các thay đổi file cho callback file_batch_changed
         """
         self.use_mock = use_mock
         self.mock_api = None
         self.connected = False
-        self._callbacks = {
-            'file_changed': [],
-            'file_saved': [],
-            'editor_event': [],
-        }
+        # Mỗi loại callback là một tuple riêng, tạo lại khi đăng ký (hiếm) để
+        # việc gọi callback (mỗi sự kiện file) chỉ là duyệt tuple, không tra dict
+        self._cb_file_changed: Tuple[Tuple[FileChangedCallback, ReadMode], ...] = ()
+        self._cb_file_saved: Tuple[Tuple[FileSavedCallback, ReadMode], ...] = ()
+        self._cb_editor_event: Tuple[EditorEventCallback, ...] = ()
+        self._cb_file_batch_changed: Tuple[FileBatchChangedCallback, ...] = ()
+        
+        # Các thay đổi file đang chờ gửi cho callback file_batch_changed
+        self.batch_window = batch_window
+        self._batch: List[Tuple[str, bytes]] = []
+        self._batch_timer: Optional[threading.Timer] = None
+        self._batch_lock = threading.Lock()
         
         if use_mock:
             self.mock_api = MockWindSurfAPI(self)
@@ -88,6 +201,9 @@ class WindSurfAPIClient:
         if self.use_mock and self.mock_api:
             self.mock_api.stop()
         
+        # Gửi nốt các thay đổi đang chờ gom thay vì bỏ mất
+        self._flush_file_batch()
+        
         self.connected = False
         logger.info("Đã ngắt kết nối với WindSurf API")
     
@@ -100,23 +216,25 @@ class WindSurfAPIClient:
         """
         return self.connected
     
-    def on_file_changed(self, callback: FileChangedCallback) -> None:
+    def on_file_changed(self, callback: FileChangedCallback, read_mode: ReadMode = 'text') -> None:
         """
         Đăng ký callback để nhận thông báo khi file thay đổi.
         
         Args:
             callback: Hàm sẽ được gọi khi file thay đổi
+            read_mode: 'text' để nhận nội dung dạng str, 'bytes' để nhận dữ liệu gốc
         """
-        self._callbacks['file_changed'].append(callback)
+        self._cb_file_changed = self._cb_file_changed + ((callback, read_mode),)
     
-    def on_file_saved(self, callback: FileSavedCallback) -> None:
+    def on_file_saved(self, callback: FileSavedCallback, read_mode: ReadMode = 'text') -> None:
         """
         Đăng ký callback để nhận thông báo khi file được lưu.
         
         Args:
             callback: Hàm sẽ được gọi khi file được lưu
+            read_mode: 'text' để nhận nội dung dạng str, 'bytes' để nhận dữ liệu gốc
         """
-        self._callbacks['file_saved'].append(callback)
+        self._cb_file_saved = self._cb_file_saved + ((callback, read_mode),)
     
     def on_editor_event(self, callback: EditorEventCallback) -> None:
         """
@@ -125,7 +243,21 @@ class WindSurfAPIClient:
         Args:
             callback: Hàm sẽ được gọi khi có sự kiện
         """
-        self._callbacks['editor_event'].append(callback)
+        self._cb_editor_event = self._cb_editor_event + (callback,)
+    
+    def on_file_batch_changed(self, callback: FileBatchChangedCallback) -> None:
+        """
+        Đăng ký callback nhận các file thay đổi gần nhau theo từng đợt.
+        
+        Các thay đổi xảy ra trong khoảng batch_window được gom thành một danh sách
+        [(file_path, data), ...] (data dạng bytes), ví dụ khi đổi tên một symbol
+        làm hàng chục file thay đổi cùng lúc. Callback file_changed vẫn được gọi
+        cho từng file như bình thường.
+        
+        Args:
+            callback: Hàm sẽ được gọi với danh sách các file thay đổi
+        """
+        self._cb_file_batch_changed = self._cb_file_batch_changed + (callback,)
     
     def get_file_content(self, file_path: str) -> Optional[str]:
         """
@@ -185,29 +317,95 @@ class WindSurfAPIClient:
         return None
     
     # Phương thức nội bộ để gọi callbacks
-    def _notify_file_changed(self, file_path: str, content: str) -> None:
+    def _notify_file_changed(self, file_path: str, content: Union[str, bytes]) -> None:
         """Thông báo cho các callbacks khi file thay đổi"""
-        for callback in self._callbacks['file_changed']:
+        if self._cb_file_changed:
+            self._notify_content(self._cb_file_changed, 'file_changed', file_path, content)
+        
+        if self._cb_file_batch_changed:
+            data = content if isinstance(content, bytes) else content.encode('utf-8')
+            with self._batch_lock:
+                self._batch.append((file_path, data))
+                if self._batch_timer is None:
+                    self._batch_timer = threading.Timer(self.batch_window, self._flush_file_batch)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+    
+    def _flush_file_batch(self) -> None:
+        """Gửi các thay đổi đã gom cho callback file_batch_changed"""
+        with self._batch_lock:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+                self._batch_timer = None
+            batch, self._batch = self._batch, []
+        
+        if not batch:
+            return
+        
+        for callback in self._cb_file_batch_changed:
             try:
-                callback(file_path, content)
-            except Exception as e:
-                logger.error(f"Lỗi trong callback file_changed: {e}")
+                callback(batch)
+            except Exception:
+                logger.exception("Lỗi trong callback file_batch_changed")
     
-    def _notify_file_saved(self, file_path: str, content: str) -> None:
+    def _notify_file_saved(self, file_path: str, content: Union[str, bytes]) -> None:
         """Thông báo cho các callbacks khi file được lưu"""
-        for callback in self._callbacks['file_saved']:
+        if self._cb_file_saved:
+            self._notify_content(self._cb_file_saved, 'file_saved', file_path, content)
+    
+    def _notify_content(self, callbacks: Tuple[Tuple[Callable, ReadMode], ...], event_name: str,
+                        file_path: str, content: Union[str, bytes]) -> None:
+        """
+        Gọi các callback nhận nội dung file, chuyển nội dung sang dạng mỗi callback cần.
+        
+        Việc decode (hoặc encode) chỉ thực hiện một lần, và chỉ khi có callback
+        đăng ký dạng đó.
+        """
+        if len(callbacks) == 1:
+            # Trường hợp phổ biến: chỉ một listener, chuyển dạng trực tiếp không cần vòng lặp
+            callback, read_mode = callbacks[0]
             try:
-                callback(file_path, content)
-            except Exception as e:
-                logger.error(f"Lỗi trong callback file_saved: {e}")
+                if read_mode == 'bytes':
+                    callback(file_path, content if isinstance(content, bytes) else content.encode('utf-8'))
+                else:
+                    callback(file_path, content if isinstance(content, str) else _decode_text(content))
+            except Exception:
+                logger.exception("Lỗi trong callback %s", event_name)
+            return
+        
+        data = content if isinstance(content, bytes) else None
+        text = content if isinstance(content, str) else None
+        
+        for callback, read_mode in callbacks:
+            try:
+                if read_mode == 'bytes':
+                    if data is None:
+                        data = text.encode('utf-8')
+                    callback(file_path, data)
+                else:
+                    if text is None:
+                        text = _decode_text(data)
+                    callback(file_path, text)
+            except Exception:
+                logger.exception("Lỗi trong callback %s", event_name)
     
     def _notify_editor_event(self, event_data: Dict[str, Any]) -> None:
         """Thông báo cho các callbacks khi có sự kiện khác từ editor"""
-        for callback in self._callbacks['editor_event']:
+        callbacks = self._cb_editor_event
+        if not callbacks:
+            return
+        if len(callbacks) == 1:
+            try:
+                callbacks[0](event_data)
+            except Exception:
+                logger.exception("Lỗi trong callback editor_event")
+            return
+        
+        for callback in callbacks:
             try:
                 callback(event_data)
-            except Exception as e:
-                logger.error(f"Lỗi trong callback editor_event: {e}")
+            except Exception:
+                logger.exception("Lỗi trong callback editor_event")
 
 
 class FileWatcher(FileSystemEventHandler):
@@ -216,65 +414,150 @@ class FileWatcher(FileSystemEventHandler):
     Sử dụng watchdog để nhận thông báo khi file thay đổi.
     """
     
+    # Số file tối đa được ghi nhớ mtime/dấu vân tay nội dung; file bị loại (ít dùng
+    # gần đây nhất) chỉ đơn giản được coi như file mới ở lần thay đổi tiếp theo
+    MAX_TRACKED_FILES = 4096
+    
     def __init__(self, api_client: WindSurfAPIClient, watched_path: str, 
-                 file_patterns: List[str] = None):
+                 file_patterns: List[str] = None, debounce_delay: float = 0.05):
         super().__init__()
         self.api_client = api_client
         self.watched_path = os.path.abspath(watched_path)
         self.file_patterns = file_patterns or ['*.py', '*.js', '*.html', '*.css', '*.txt']
-        self.last_modified = {}  # {file_path: last_modified_time}
+        self.last_modified: "OrderedDict[str, int]" = OrderedDict()  # {file_path: st_mtime_ns}
+        # Dấu vân tay nội dung đã thông báo gần nhất: {file_path: (kích thước, blake2b 8 byte)}
+        self._content_fp: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        # Sự kiện có thể đến từ nhiều thread (timer debounce, thread của observer)
+        self._tracked_lock = threading.Lock()
+        self._compile_patterns()
+        
+        # Editor thường phát nhiều sự kiện modified cho một lần lưu (file tạm, rename,
+        # touch). Mỗi file có một timer; sự kiện mới hủy timer cũ nên chỉ sự kiện
+        # cuối cùng trong khoảng debounce_delay (giây) mới đọc file và thông báo.
+        self.debounce_delay = debounce_delay
+        self._pending: Dict[str, threading.Timer] = {}
+        self._pending_lock = threading.Lock()
+    
+    def _compile_patterns(self) -> None:
+        """
+        Biên dịch file_patterns một lần để _is_watched_file không phải dựng lại mỗi sự kiện.
+        
+        Mẫu dạng "*.ext" được đưa vào một tập đuôi file (tra cứu O(1)); các mẫu
+        khác được gộp thành regex, so với tên file (hoặc cả đường dẫn nếu mẫu có "/").
+        """
+        suffixes = set()
+        name_patterns = []
+        path_patterns = []
+        for pattern in self.file_patterns:
+            suffix = pattern[1:]
+            if (pattern.startswith('*.') and suffix.count('.') == 1
+                    and not any(c in suffix for c in '*?[/')):
+                suffixes.add(suffix.lower())
+            elif '/' in pattern:
+                path_patterns.append(fnmatch.translate('*/' + pattern.lower()))
+            else:
+                name_patterns.append(fnmatch.translate(pattern.lower()))
+        
+        self._exact_suffixes = frozenset(suffixes)
+        self._name_re = re.compile('|'.join(name_patterns)) if name_patterns else None
+        self._path_re = re.compile('|'.join(path_patterns)) if path_patterns else None
         
     def on_modified(self, event: FileSystemEvent) -> None:
         """Xử lý sự kiện khi file bị sửa đổi"""
         if not event.is_directory and self._is_watched_file(event.src_path):
+            file_path = event.src_path
+            with self._pending_lock:
+                timer = self._pending.get(file_path)
+                if timer is not None:
+                    timer.cancel()
+                
+                timer = threading.Timer(self.debounce_delay, self._flush, args=(file_path,))
+                timer.daemon = True
+                self._pending[file_path] = timer
+                timer.start()
+    
+    def _flush(self, file_path: str) -> None:
+        """Đọc file và thông báo thay đổi sau khi chuỗi sự kiện modified đã lắng xuống"""
+        with self._pending_lock:
+            # Chỉ xóa nếu timer trong bảng là timer đang chạy (chưa bị thay bằng timer mới)
+            if self._pending.get(file_path) is threading.current_thread():
+                del self._pending[file_path]
+        
+        try:
             # Kiểm tra để tránh các sự kiện trùng lặp
-            current_mtime = os.path.getmtime(event.src_path)
-            last_mtime = self.last_modified.get(event.src_path, 0)
+            with self._tracked_lock:
+                last_mtime = self.last_modified.get(file_path, 0)
             
-            # Chỉ xử lý nếu thời gian sửa đổi khác với lần cuối
-            if current_mtime > last_mtime:
-                self.last_modified[event.src_path] = current_mtime
+            # Chỉ đọc nội dung (dạng bytes) nếu mtime mới hơn lần cuối; mtime lấy từ fstat của fd vừa mở
+            current_mtime, content = _read_file_if_newer(file_path, last_mtime)
+            if content is not None:
+                self._remember(self.last_modified, file_path, current_mtime)
                 
-                # Đọc nội dung file
-                try:
-                    with open(event.src_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Thông báo cho API client
-                    self.api_client._notify_file_changed(event.src_path, content)
-                    logger.debug(f"File thay đổi: {event.src_path}")
-                except Exception as e:
-                    logger.error(f"Lỗi khi đọc file {event.src_path}: {e}")
+                # Bỏ qua nếu chỉ mtime đổi còn nội dung giữ nguyên (touch, autosave không sửa gì)
+                fingerprint = (len(content), hashlib.blake2b(content, digest_size=8).digest())
+                with self._tracked_lock:
+                    unchanged = self._content_fp.get(file_path) == fingerprint
+                if unchanged:
+                    logger.debug(f"Nội dung không đổi, bỏ qua: {file_path}")
+                    return
+                self._remember(self._content_fp, file_path, fingerprint)
+                
+                # Thông báo cho API client
+                self.api_client._notify_file_changed(file_path, content)
+                logger.debug(f"File thay đổi: {file_path}")
+        except Exception as e:
+            logger.error(f"Lỗi khi đọc file {file_path}: {e}")
+    
+    def _remember(self, table: "OrderedDict[str, Any]", file_path: str, value: Any) -> None:
+        """Ghi giá trị cho file vào bảng LRU, loại file ít dùng gần đây nhất khi vượt giới hạn"""
+        with self._tracked_lock:
+            table[file_path] = value
+            table.move_to_end(file_path)
+            while len(table) > self.MAX_TRACKED_FILES:
+                table.popitem(last=False)
+    
+    def cancel_pending(self) -> None:
+        """Hủy các thông báo thay đổi đang chờ debounce"""
+        with self._pending_lock:
+            for timer in self._pending.values():
+                timer.cancel()
+            self._pending.clear()
     
     def on_created(self, event: FileSystemEvent) -> None:
         """Xử lý sự kiện khi file mới được tạo"""
         if not event.is_directory and self._is_watched_file(event.src_path):
-            # Đọc nội dung file
             try:
-                with open(event.src_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
                 # Cập nhật thời gian sửa đổi
-                self.last_modified[event.src_path] = os.path.getmtime(event.src_path)
+                self._remember(self.last_modified, event.src_path, os.stat(event.src_path).st_mtime_ns)
                 
                 # Thông báo cho API client
                 self.api_client._notify_editor_event({
                     'type': 'file_created',
                     'file_path': event.src_path,
-                    'timestamp': datetime.datetime.now().isoformat()
+                    'timestamp_ns': _now_ns()
                 })
                 logger.debug(f"File mới: {event.src_path}")
             except Exception as e:
-                logger.error(f"Lỗi khi đọc file mới {event.src_path}: {e}")
+                logger.error(f"Lỗi khi xử lý file mới {event.src_path}: {e}")
     
     def _is_watched_file(self, file_path: str) -> bool:
         """Kiểm tra xem file có nằm trong danh sách theo dõi không"""
-        if not os.path.isfile(file_path):
+        if not self._matches_patterns(file_path):
             return False
         
-        for pattern in self.file_patterns:
-            if Path(file_path).match(pattern.replace('*', '**/*')):
-                return True
+        # Chỉ stat khi tên file khớp, phần lớn sự kiện bị loại ở bước so tên
+        return os.path.isfile(file_path)
+    
+    def _matches_patterns(self, file_path: str) -> bool:
+        """Kiểm tra tên/đường dẫn file có khớp với file_patterns không (không truy cập đĩa)"""
+        if os.path.splitext(file_path)[1].lower() in self._exact_suffixes:
+            return True
+        
+        if self._name_re is not None and self._name_re.match(os.path.basename(file_path).lower()):
+            return True
+        
+        if self._path_re is not None:
+            return self._path_re.match(file_path.replace(os.sep, '/').lower()) is not None
         
         return False
 
@@ -296,6 +579,8 @@ class MockWindSurfAPI:
         self.watchers = []
         self.mock_project_dir = None
         self.mock_open_files = []
+        # Được set khi stop() để giải phóng ngay các thread đang chờ trong wait()
+        self._stop = threading.Event()
         
     def start_watching(self, project_dir: str) -> None:
         """Bắt đầu theo dõi thư mục dự án"""
@@ -305,11 +590,10 @@ class MockWindSurfAPI:
             logger.error(f"Thư mục dự án không tồn tại: {self.mock_project_dir}")
             return
         
+        self._stop.clear()
         # Thiết lập file watcher
         watcher = FileWatcher(self.api_client, self.mock_project_dir)
-        observer = Observer()
-        observer.schedule(watcher, self.mock_project_dir, recursive=True)
-        observer.start()
+        observer = self._start_observer(watcher, self.mock_project_dir)
         
         self.watched_paths.append(self.mock_project_dir)
         self.observers.append(observer)
@@ -324,17 +608,46 @@ class MockWindSurfAPI:
         self.api_client._notify_editor_event({
             'type': 'project_opened',
             'project_path': self.mock_project_dir,
-            'timestamp': datetime.datetime.now().isoformat()
+            'timestamp_ns': _now_ns()
         })
     
+    def _start_observer(self, watcher: FileWatcher, path: str):
+        """
+        Khởi động observer cho thư mục, ưu tiên backend gốc của hệ điều hành.
+        
+        Observer của watchdog tự chọn backend nhận sự kiện từ kernel (inotify,
+        FSEvents, kqueue, ReadDirectoryChangesW). Chỉ khi backend này không khởi
+        động được (ví dụ hết giới hạn inotify watch, ổ mạng không hỗ trợ) mới
+        chuyển sang PollingObserver, vốn phải quét lại cây thư mục định kỳ.
+        """
+        observer = Observer()
+        try:
+            observer.schedule(watcher, path, recursive=True)
+            observer.start()
+            return observer
+        except OSError as e:
+            logger.warning(f"Không dùng được {type(observer).__name__} cho {path} ({e}), "
+                           f"chuyển sang PollingObserver")
+        
+        observer = PollingObserver()
+        observer.schedule(watcher, path, recursive=True)
+        observer.start()
+        return observer
+    
     def stop(self) -> None:
         """Dừng theo dõi tất cả thư mục"""
+        # Giải phóng các thread đang chờ trước khi join observer (có thể mất thời gian)
+        self._stop.set()
+        
         for observer in self.observers:
             observer.stop()
         
         for observer in self.observers:
             observer.join()
         
+        for watcher in self.watchers:
+            watcher.cancel_pending()
+        
         self.watched_paths = []
         self.observers = []
         self.watchers = []
@@ -343,6 +656,22 @@ class MockWindSurfAPI:
         
         logger.info("Đã dừng theo dõi tất cả thư mục")
     
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Chờ đến khi stop() được gọi hoặc hết thời gian.
+        
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None để chờ vô hạn
+            
+        Returns:
+            bool: True nếu đã dừng, False nếu hết thời gian
+        """
+        return self._stop.wait(timeout)
+    
+    def request_stop(self) -> None:
+        """Đánh thức các thread đang chờ trong wait() mà không dừng observer (an toàn trong signal handler)"""
+        self._stop.set()
+    
     def simulate_file_save(self, file_path: str) -> None:
         """Giả lập việc lưu file"""
         if not os.path.isfile(file_path):
@@ -350,9 +679,7 @@ class MockWindSurfAPI:
             return
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
+            content = _read_file(file_path)
             self.api_client._notify_file_saved(file_path, content)
             logger.info(f"Đã giả lập lưu file: {file_path}")
         except Exception as e:
@@ -365,8 +692,7 @@ class MockWindSurfAPI:
             return None
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return _decode_text(_read_file(file_path))
         except Exception as e:
             logger.error(f"Lỗi khi đọc nội dung file {file_path}: {e}")
             return None
@@ -392,22 +718,31 @@ class MockWindSurfAPI:
         if not self.mock_project_dir:
             return
         
-        self.mock_open_files = []
-        
-        # Tìm tối đa 5 file để giả lập "đang mở"
-        file_count = 0
-        for root, _, files in os.walk(self.mock_project_dir):
-            for file in files:
-                if file.endswith(('.py', '.js', '.html', '.css', '.txt')):
-                    file_path = os.path.join(root, file)
-                    self.mock_open_files.append(file_path)
-                    file_count += 1
-                
-                if file_count >= 5:
-                    break
-            
-            if file_count >= 5:
-                break
+        # Tìm tối đa 5 file để giả lập "đang mở", dừng duyệt ngay khi đủ
+        self.mock_open_files = list(itertools.islice(
+            _iter_source_files(self.mock_project_dir, ('.py', '.js', '.html', '.css', '.txt')), 5
+        ))
+
+
+def _iter_source_files(root: str, extensions: Tuple[str, ...]) -> Iterator[str]:
+    """
+    Duyệt thư mục bằng os.scandir và trả về dần các file có đuôi trong extensions.
+    
+    Là generator nên nơi gọi có thể dừng sớm mà không phải duyệt hết cây thư mục.
+    Thư mục không đọc được sẽ được bỏ qua (giống os.walk).
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(extensions):
+                        yield entry.path
+        except OSError:
+            continue
 
 
 # Hàm tiện ích để khởi tạo và sử dụng API client
@@ -444,15 +779,17 @@ def demo():
         print(f"File thay đổi: {file_path}")
         print(f"Kích thước nội dung: {len(content)} bytes")
     
-    def on_file_saved(file_path, content):
+    def on_file_saved(file_path, data):
         print(f"File được lưu: {file_path}")
-        print(f"Hash nội dung: {hashlib.md5(content.encode()).hexdigest()}")
+        print(f"Hash nội dung: {hashlib.blake2b(data).hexdigest()}")
     
     def on_editor_event(event_data):
+        if 'timestamp_ns' in event_data:
+            event_data = dict(event_data, timestamp=format_timestamp(event_data['timestamp_ns']))
         print(f"Sự kiện editor: {json.dumps(event_data, indent=2)}")
     
-    client.on_file_changed(on_file_changed)
-    client.on_file_saved(on_file_saved)
+    client.on_file_changed(on_file_changed, read_mode='bytes')
+    client.on_file_saved(on_file_saved, read_mode='bytes')
     client.on_editor_event(on_editor_event)
     
     # Hiển thị thông tin
@@ -477,12 +814,13 @@ def demo():
         print("\nGiả lập lưu file đầu tiên...")
         client.mock_api.simulate_file_save(open_files[0])
     
-    # Chạy trong 10 giây
+    # Chạy trong 10 giây, Ctrl-C kết thúc ngay thay vì chờ hết thời gian
     print("\nChờ các sự kiện (10 giây)...")
+    previous_handler = signal.signal(signal.SIGINT, lambda *_: client.mock_api.request_stop())
     try:
-        time.sleep(10)
-    except KeyboardInterrupt:
-        pass
+        client.mock_api.wait(10)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
     
     # Ngắt kết nối
     client.disconnect()
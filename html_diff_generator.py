@@ -9,40 +9,35 @@ Module để tạo HTML diff từ văn bản diff thông thường.
 """
 
 import os
+import re
 import sys
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 
 
-def generate_html_diff(diff_text: str) -> str:
-    """Tạo HTML diff để hiển thị trong trình duyệt.
-    
-    Args:
-        diff_text (str): Văn bản diff cần chuyển thành HTML
-        
-    Returns:
-        str: HTML diff để hiển thị trong trình duyệt
-    """
-    lines = diff_text.split('\n')
-    html_lines = ['<pre class="diff">']  # Thêm class để dễ dàng CSS
-    
-    for line in lines:
-        if line.startswith('+'):
-            # Dòng thêm vào
-            html_lines.append(f'<span class="added">{html_escape(line)}</span>')
-        elif line.startswith('-'):
-            # Dòng bị xóa
-            html_lines.append(f'<span class="removed">{html_escape(line)}</span>')
-        elif line.startswith('@'):
-            # Thông tin dòng
-            html_lines.append(f'<span class="info">{html_escape(line)}</span>')
-        else:
-            # Dòng bình thường
-            html_lines.append(html_escape(line))
-    
-    html_lines.append('</pre>')
-    
-    # Thêm CSS để định dạng
-    css = '''
+# Bảng thay thế cho html_escape: str.translate xử lý trong một lượt duyệt,
+# không tạo chuỗi trung gian như chuỗi các lệnh replace
+_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;',
+})
+
+# Phần lớn dòng diff không chứa ký tự đặc biệt: kiểm tra trước để trả lại nguyên chuỗi
+_SPECIALS_RE = re.compile(r'[&<>"\']')
+
+# Thẻ mở span theo ký tự đầu dòng: thêm vào, bị xóa, thông tin dòng
+_LINE_SPAN_OPEN = {
+    '+': '<span class="added">',
+    '-': '<span class="removed">',
+    '@': '<span class="info">',
+}
+_SPAN_CLOSE = '</span>'
+
+# CSS để định dạng diff
+_CSS = '''
     <style>
     .diff {
         font-family: monospace;
@@ -69,8 +64,140 @@ def generate_html_diff(diff_text: str) -> str:
     }
     </style>
     '''
+
+# Khung bao nội dung diff, có class để dễ dàng CSS
+_PRE_OPEN = '<pre class="diff">\n'
+_PRE_CLOSE = '\n</pre>'
+
+# Kích thước buffer khi ghi file HTML
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Trang HTML đầy đủ bao quanh nội dung diff (dùng trong save_html_diff)
+_HTML_TEMPLATE = '''<!DOCTYPE html>
+<html lang="vi">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Diff Viewer</title>
+</head>
+<body>
+    <h1>Diff Viewer</h1>
+    {body}
+</body>
+</html>'''
+_HTML_HEADER, _, _HTML_FOOTER = _HTML_TEMPLATE.partition('{body}')
+
+# Phần cố định trước và sau nội dung diff trong file HTML, encode sẵn một lần
+_PAGE_OPEN_BYTES = (_HTML_HEADER + _CSS + _PRE_OPEN).encode('utf-8')
+_PAGE_CLOSE_BYTES = (_PRE_CLOSE + _HTML_FOOTER).encode('utf-8')
+
+# Số ký tự diff xử lý mỗi khối khi ghi file theo luồng (cắt tại ranh giới dòng)
+_STREAM_CHUNK_CHARS = 256 * 1024
+
+# Diff lớn hơn ngưỡng này được chia khối và render song song trên nhiều process
+_PARALLEL_THRESHOLD_CHARS = 10 * 1024 * 1024
+_MAX_PARALLEL_WORKERS = 8
+
+
+def generate_html_diff(diff_text: str) -> str:
+    """Tạo HTML diff để hiển thị trong trình duyệt.
+    
+    Args:
+        diff_text (str): Văn bản diff cần chuyển thành HTML
+        
+    Returns:
+        str: HTML diff để hiển thị trong trình duyệt
+    """
+    workers = min(os.cpu_count() or 1, _MAX_PARALLEL_WORKERS)
+    if len(diff_text) > _PARALLEL_THRESHOLD_CHARS and workers > 1:
+        body = _render_lines_parallel(diff_text, workers)
+    else:
+        body = _render_lines(diff_text)
     
-    return css + '\n'.join(html_lines)
+    # Thêm CSS để định dạng
+    return _CSS + _PRE_OPEN + body + _PRE_CLOSE
+
+
+def _render_lines_parallel(diff_text: str, workers: int) -> str:
+    """Render diff rất lớn bằng nhiều process, mỗi process nhận một khối dòng liền nhau.
+    
+    Các dòng độc lập với nhau nên nối kết quả theo thứ tự cho HTML giống hệt bản
+    tuần tự. Nếu không tạo được process pool thì render tuần tự.
+    """
+    blocks = list(_iter_line_blocks(diff_text, len(diff_text) // workers + 1))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return '\n'.join(executor.map(_render_lines, blocks))
+    except (OSError, RuntimeError) as e:
+        print(f"Không thể render song song, chuyển sang tuần tự: {str(e)}", file=sys.stderr)
+        return '\n'.join(map(_render_lines, blocks))
+
+
+def iter_html_diff(diff_text: str) -> Iterator[str]:
+    """Tạo HTML diff theo từng khối, không dựng toàn bộ kết quả trong bộ nhớ.
+    
+    Nối các khối lại cho kết quả giống hệt generate_html_diff.
+    
+    Args:
+        diff_text (str): Văn bản diff cần chuyển thành HTML
+        
+    Returns:
+        Iterator[str]: Các khối HTML liên tiếp
+    """
+    yield _CSS
+    yield _PRE_OPEN
+    yield from _iter_rendered_chunks(diff_text)
+    yield _PRE_CLOSE
+
+
+def _iter_rendered_chunks(diff_text: str) -> Iterator[str]:
+    """Chuyển diff thành HTML theo từng khối dòng (chưa gồm CSS và thẻ <pre>)"""
+    for i, block in enumerate(_iter_line_blocks(diff_text, _STREAM_CHUNK_CHARS)):
+        if i:
+            yield '\n'
+        yield _render_lines(block)
+
+
+def _iter_line_blocks(diff_text: str, block_chars: int) -> Iterator[str]:
+    """Chia diff thành các khối dòng liền nhau, bỏ ký tự xuống dòng giữa hai khối.
+    
+    Nối các khối bằng "\\n" cho lại đúng diff_text.
+    
+    Args:
+        diff_text (str): Văn bản diff
+        block_chars (int): Số ký tự tối thiểu mỗi khối, khối kết thúc ở xuống dòng kế tiếp
+        
+    Returns:
+        Iterator[str]: Các khối dòng
+    """
+    start = 0
+    end_of_text = len(diff_text)
+    while True:
+        end = diff_text.find('\n', start + block_chars)
+        if end < 0:
+            end = end_of_text
+        yield diff_text[start:end]
+        if end >= end_of_text:
+            break
+        start = end + 1
+
+
+def _render_lines(diff_text: str) -> str:
+    """Chuyển các dòng diff thành HTML (chưa gồm CSS và thẻ <pre>)"""
+    # Ghi đè HTML lên chính danh sách dòng thay vì tạo thêm một danh sách song song:
+    # dòng gốc được giải phóng dần nên bộ nhớ đỉnh không phải giữ hai bản của diff
+    html_lines = diff_text.split('\n')
+    
+    for i, line in enumerate(html_lines):
+        # Phân loại (thêm vào/bị xóa/thông tin dòng), escape và bọc span trong một bước
+        span_open = _LINE_SPAN_OPEN.get(line[:1])
+        if span_open is None:
+            # Dòng bình thường
+            html_lines[i] = html_escape(line)
+        else:
+            html_lines[i] = span_open + html_escape(line) + _SPAN_CLOSE
+    
+    return '\n'.join(html_lines)
 
 
 def html_escape(text: str) -> str:
@@ -82,7 +209,9 @@ def html_escape(text: str) -> str:
     Returns:
         str: Văn bản đã được escape
     """
-    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
+    if _SPECIALS_RE.search(text) is None:
+        return text
+    return text.translate(_ESCAPE_TABLE)
 
 
 def save_html_diff(diff_text: str, output_file: str) -> bool:
@@ -96,25 +225,13 @@ def save_html_diff(diff_text: str, output_file: str) -> bool:
         bool: True nếu lưu thành công, False nếu thất bại
     """
     try:
-        html_content = generate_html_diff(diff_text)
-        
-        # Thêm HTML header và footer
-        full_html = f'''<!DOCTYPE html>
-<html lang="vi">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Diff Viewer</title>
-</head>
-<body>
-    <h1>Diff Viewer</h1>
-    {html_content}
-</body>
-</html>'''
-        
-        # Lưu vào file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(full_html)
+        # Ghi lần lượt header, từng khối diff và footer: bộ nhớ không tăng theo kích thước diff.
+        # Ghi ở chế độ nhị phân, mỗi khối encode một lần, không qua lớp text IO
+        with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.write(_PAGE_OPEN_BYTES)
+            for chunk in _iter_rendered_chunks(diff_text):
+                f.write(chunk.encode('utf-8'))
+            f.write(_PAGE_CLOSE_BYTES)
         
         return True
     except Exception as e:
@@ -122,6 +239,34 @@ def save_html_diff(diff_text: str, output_file: str) -> bool:
         return False
 
 
+def _read_diff_file(diff_file: str) -> str:
+    """Đọc file diff bằng một lần os.read theo kích thước file, decode UTF-8 một lần.
+    
+    Args:
+        diff_file (str): Đường dẫn đến file diff
+        
+    Returns:
+        str: Nội dung file, xuống dòng chuẩn hóa về "\\n" như khi mở ở chế độ text
+    """
+    fd = os.open(diff_file, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        while True:
+            # Đọc đến hết phòng khi file lớn hơn một lần read hoặc vừa được ghi thêm
+            chunk = os.read(fd, max(size, 1 << 16))
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    
+    diff_text = b''.join(chunks).decode('utf-8')
+    if '\r' in diff_text:
+        diff_text = diff_text.replace('\r\n', '\n').replace('\r', '\n')
+    return diff_text
+
+
 def main():
     """Hàm main để chạy từ command line."""
     if len(sys.argv) < 2:
@@ -132,8 +277,7 @@ def main():
     output_file = sys.argv[2] if len(sys.argv) > 2 else "diff_output.html"
     
     try:
-        with open(diff_file, 'r', encoding='utf-8') as f:
-            diff_text = f.read()
+        diff_text = _read_diff_file(diff_file)
         
         success = save_html_diff(diff_text, output_file)
         if success:
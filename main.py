@@ -4,43 +4,53 @@
 # ----- Import các thư viện cần thiết -----
 import sys
 import os
+import re
 import logging
+from logging.handlers import MemoryHandler, RotatingFileHandler
 
-# Thiết lập logging chuẩn: log ra cả file app.log và ra terminal
+# Thiết lập logging chuẩn: log ra cả file app.log và ra terminal.
+# Log ghi file được gom trong bộ nhớ và chỉ ghi xuống đĩa khi đủ 1000 bản ghi hoặc
+# gặp lỗi (ERROR), để các log trong sự kiện UI không chặn luồng GUI bằng I/O;
+# logging.shutdown() lúc thoát sẽ ghi nốt phần còn lại. File mở khi ghi lần đầu
+# và xoay vòng khi vượt 10 MB.
+_file_log_handler = RotatingFileHandler("app.log", maxBytes=10_000_000, backupCount=3,
+                                        encoding="utf-8", delay=True)
+_file_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("app.log"),
+        MemoryHandler(1000, flushLevel=logging.ERROR, target=_file_log_handler),
         logging.StreamHandler()
     ]
 )
+logger = logging.getLogger(__name__)
 
 import datetime
 import time
 import json
 import traceback
-import random
 from PyQt6.QtCore import (
     Qt, QSize, QPoint, QTimer, QDateTime, QUrl, QRegularExpression, 
-    pyqtSignal
+    QMimeData, QAbstractListModel, QModelIndex, QRect, pyqtSignal
 )
 from PyQt6.QtGui import (
     QTextCharFormat, QColor, QSyntaxHighlighter, 
-    QTextCursor, QPixmap, QDrag, QIcon, QAction
+    QTextCursor, QPixmap, QDrag, QIcon, QAction, QFont, QFontMetrics, QPainter
 )
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-    QPushButton, QLabel, QLineEdit, QTextEdit, QListWidget, QListWidgetItem,
+    QPushButton, QLabel, QLineEdit, QTextEdit, QListView,
     QTabWidget, QSplitter, QFrame, QScrollArea, QMenu, QDialog, QComboBox,
     QDateTimeEdit, QToolBar, QStatusBar, QFileDialog, QMessageBox,
-    QScrollArea, QToolButton, QSizePolicy, QFormLayout, QDialogButtonBox
+    QScrollArea, QToolButton, QSizePolicy, QFormLayout, QDialogButtonBox,
+    QAbstractItemView, QAbstractScrollArea, QStyledItemDelegate
 )
 
 # ----- Import các module tự tạo -----
 from models import Task, Project, Snapshot
 from api_client import WindSurfAPIClient, create_api_client
-from ultis import format_time_ago
+from ultis import format_time_ago, generate_task_id
 from ai_helper import (
     analyze_code_quality, find_code_issues,
     generate_docstring, suggest_refactor,
@@ -64,6 +74,33 @@ from ultis import run_in_thread
 class CodeHighlighter(QSyntaxHighlighter):
     """Syntax highlighter cho code editor"""
     
+    # Từ khóa và pattern giống nhau cho mọi editor nên dựng một lần ở mức lớp
+    KEYWORDS = (
+        "class", "def", "for", "if", "else", "elif", "while", "return",
+        "import", "from", "as", "try", "except", "finally", "with",
+        "in", "is", "not", "and", "or", "True", "False", "None",
+        "self", "super", "lambda", "async", "await", "yield"
+    )
+    
+    # Các pattern theo thứ tự tô: (loại định dạng, biểu thức)
+    PATTERNS = (
+        ("keyword", "\\b(?:" + "|".join(KEYWORDS) + ")\\b"),
+        ("string", "'[^']*'"),
+        ("string", '"[^"]*"'),
+        ("comment", "#[^\n]*"),
+        ("function", "\\b[A-Za-z0-9_]+(?=\\()"),
+        ("number", "\\b\\d+\\b"),
+    )
+    
+    # Gộp các pattern thành một biểu thức, mỗi pattern là một nhóm: chỉ duyệt dòng
+    # một lần, và token bắt đầu trước được ưu tiên (từ khóa hay "#" trong chuỗi
+    # không bị tô đè). Khi cùng vị trí bắt đầu, pattern đứng sau trong danh sách
+    # thắng như khi tô lần lượt từng pattern (vd. "super(" tô như hàm).
+    # Biên dịch một lần, dùng chung cho mọi highlighter
+    _ORDERED_PATTERNS = PATTERNS[::-1]
+    _EXPRESSION = QRegularExpression("|".join(f"({pattern})" for _, pattern in _ORDERED_PATTERNS))
+    _EXPRESSION.optimize()
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -99,57 +136,31 @@ class CodeHighlighter(QSyntaxHighlighter):
         self.formats["function"] = function_format
         self.formats["number"] = number_format
         
-        # Định nghĩa các từ khóa
-        self.keywords = [
-            "class", "def", "for", "if", "else", "elif", "while", "return",
-            "import", "from", "as", "try", "except", "finally", "with",
-            "in", "is", "not", "and", "or", "True", "False", "None",
-            "self", "super", "lambda", "async", "await", "yield"
-        ]
-        
-        # Tạo các pattern
-        self.patterns = []
-        
-        # Pattern cho từ khóa
-        keyword_pattern = "\\b(" + "|".join(self.keywords) + ")\\b"
-        self.patterns.append(("keyword", keyword_pattern))
-        
-        # Pattern cho chuỗi
-        self.patterns.append(("string", "'[^']*'"))
-        self.patterns.append(("string", '"[^"]*"'))
-        
-        # Pattern cho comment
-        self.patterns.append(("comment", "#[^\n]*"))
-        
-        # Pattern cho hàm
-        self.patterns.append(("function", "\\b[A-Za-z0-9_]+(?=\\()"))
-        
-        # Pattern cho số
-        self.patterns.append(("number", "\\b\\d+\\b"))
+        # Định dạng theo số thứ tự nhóm của _EXPRESSION (nhóm 0 là toàn bộ match)
+        self.group_formats = [None] + [self.formats[pattern_type] for pattern_type, _ in self._ORDERED_PATTERNS]
     
     def highlightBlock(self, text):
         """Highlight một block text"""
-        for pattern_type, pattern in self.patterns:
-            format = self.formats[pattern_type]
-            
-            # Tìm tất cả các match
-            expression = QRegularExpression(pattern)
-            matches = expression.globalMatch(text)
-            
-            # Áp dụng định dạng cho mỗi match
-            while matches.hasNext():
-                match = matches.next()
-                self.setFormat(match.capturedStart(), match.capturedLength(), format)
+        # Tìm tất cả các match
+        matches = self._EXPRESSION.globalMatch(text)
+        
+        # Áp dụng định dạng của nhóm đã khớp cho mỗi match
+        while matches.hasNext():
+            match = matches.next()
+            self.setFormat(match.capturedStart(), match.capturedLength(),
+                           self.group_formats[match.lastCapturedIndex()])
 
 # ----- Task Dialog -----
 
 class TaskDialog(QDialog):
     """Dialog để tạo hoặc chỉnh sửa task"""
     
-    def __init__(self, parent=None, task=None):
+    def __init__(self, parent=None, task=None, next_id=None):
         super().__init__(parent)
         
         self.task = task
+        # Hàm cấp ID cho task mới (thường là MainWindow.next_task_id)
+        self.next_id = next_id or generate_task_id
         self.setup_ui()
         
         if task:
@@ -170,8 +181,7 @@ class TaskDialog(QDialog):
         # Task ID
         self.id_field = QLineEdit()
         if not self.task:
-            task_id = f"TASK-{random.randint(100, 999)}"
-            self.id_field.setText(task_id)
+            self.id_field.setText(self.next_id())
         form_layout.addRow("Task ID:", self.id_field)
         
         # Title
@@ -228,6 +238,7 @@ class TaskDialog(QDialog):
             self.priority_field.setCurrentIndex(priority_index)
         
         # Thiết lập due date
+        # Task mới lưu sẵn QDateTime; chuỗi ISO chỉ còn cho dữ liệu cũ
         due_date = self.task.get("due_date")
         if due_date:
             if isinstance(due_date, str):
@@ -242,10 +253,89 @@ class TaskDialog(QDialog):
             "description": self.description_field.toPlainText(),
             "status": self.status_field.currentText(),
             "priority": self.priority_field.currentText(),
-            "due_date": self.due_date_field.dateTime().toString(Qt.DateFormat.ISODate)
+            "due_date": self.due_date_field.dateTime()
         }
 # ----- Task Card cho bảng Kanban -----
 
+# Style của bảng Kanban, gộp vào stylesheet của MainWindow (_GLOBAL_QSS) để Qt chỉ
+# parse một lần và dùng chung cho mọi thẻ/cột thay vì setStyleSheet trên từng widget.
+# Selector dùng objectName; các quy tắc cho thẻ lồng trong #kanbanContent để đủ độ ưu
+# tiên so với quy tắc nền của vùng nội dung cột.
+KANBAN_STYLE = """
+    QFrame#kanbanHeader, QFrame#kanbanHeader QFrame {
+        background-color: #0a0a12;
+        border: none;
+    }
+    QLabel#kanbanTitle {
+        color: #ffffff;
+        font-weight: bold;
+        font-size: 12px;
+    }
+    QPushButton#kanbanAddButton {
+        background-color: transparent;
+        color: #00ff00;
+        font-weight: bold;
+        font-size: 16px;
+        border: none;
+        max-width: 20px;
+    }
+    QPushButton#kanbanAddButton:hover {
+        color: #ffffff;
+    }
+    QWidget#kanbanContent, QWidget#kanbanContent QWidget {
+        background-color: #121218;
+        border: none;
+    }
+    QWidget#kanbanContent QScrollArea#kanbanScroll {
+        border: none;
+        background-color: transparent;
+    }
+    QScrollArea#kanbanScroll QScrollBar:vertical {
+        border: none;
+        background: #121218;
+        width: 10px;
+        margin: 0px;
+    }
+    QScrollArea#kanbanScroll QScrollBar::handle:vertical {
+        background: #2a2a3a;
+        min-height: 20px;
+        border-radius: 5px;
+    }
+    QScrollArea#kanbanScroll QScrollBar::add-line:vertical, QScrollArea#kanbanScroll QScrollBar::sub-line:vertical {
+        border: none;
+        background: none;
+    }
+    QScrollArea#kanbanScroll QScrollBar::add-page:vertical, QScrollArea#kanbanScroll QScrollBar::sub-page:vertical {
+        background: none;
+    }
+    QWidget#kanbanContent QFrame#taskCard, QWidget#kanbanContent QFrame#taskCard QFrame {
+        background-color: #15151f;
+        padding: 5px;
+        margin: 0px;
+        border: none;
+    }
+    QFrame#taskCard QLabel#taskId {
+        color: #00ff00;
+        font-weight: bold;
+        font-size: 12px;
+    }
+    QFrame#taskCard QLabel#taskTitle {
+        color: #ffffff;
+        font-size: 12px;
+    }
+    QFrame#taskCard QLabel#taskPriority {
+        color: #6b6b8d;
+        font-size: 10px;
+    }
+    QWidget#kanbanContent QFrame#taskCard QFrame#taskIndicator {
+        background-color: #00ff00;
+        border: none;
+    }
+    QWidget#kanbanContent QFrame#taskCard QFrame#taskIndicator[status="in_progress"] {
+        background-color: #FFD700;
+    }
+"""
+
 class TaskCard(QFrame):
     """Widget thẻ công việc Kanban"""
     
@@ -253,6 +343,9 @@ class TaskCard(QFrame):
     taskSelected = pyqtSignal(str)    # id
     taskEditRequested = pyqtSignal(str)  # id
     
+    # QApplication.startDragDistance() không đổi khi chạy, chỉ đọc một lần cho mọi thẻ
+    _start_drag_distance = None
+    
     def __init__(self, task_id: str, title: str, status="todo", priority="High", parent=None):
         super().__init__(parent)
         
@@ -261,16 +354,11 @@ class TaskCard(QFrame):
         self.title = title
         self.priority = priority
         self._drag_start_position = QPoint()
+        # Ảnh của thẻ dùng khi kéo thả, render lần đầu kéo và xóa khi thẻ đổi kích thước
+        self._drag_pixmap = None
         
-        # Thiết lập style
-        self.setStyleSheet("""
-            QFrame {
-                background-color: #15151f;
-                padding: 5px;
-                margin: 0px;
-                border: none;
-            }
-        """)
+        # Style lấy từ KANBAN_STYLE theo objectName
+        self.setObjectName("taskCard")
         
         # Thiết lập sự kiện
         self.setMinimumHeight(70)
@@ -283,31 +371,28 @@ class TaskCard(QFrame):
         
         # Task ID label
         id_label = QLabel(f"[{task_id}]")
-        id_label.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 12px;")
+        id_label.setObjectName("taskId")
         
         # Task title label
         title_label = QLabel(title)
-        title_label.setStyleSheet("color: #ffffff; font-size: 12px;")
+        title_label.setObjectName("taskTitle")
         title_label.setWordWrap(True)
         
         # Task priority label
         priority_label = QLabel(f"Priority: {priority}")
-        priority_label.setStyleSheet("color: #6b6b8d; font-size: 10px;")
+        priority_label.setObjectName("taskPriority")
         
         # Thêm widget vào layout
         layout.addWidget(id_label)
         layout.addWidget(title_label)
         layout.addWidget(priority_label)
         
-        # Thanh trạng thái bên trái
-        indicator_color = "#00ff00"  # Màu mặc định
-        if status == "in_progress":
-            indicator_color = "#FFD700"  # Vàng
-        
+        # Thanh trạng thái bên trái, màu theo thuộc tính status (xanh, vàng khi in_progress)
         indicator = QFrame(self)
+        indicator.setObjectName("taskIndicator")
+        indicator.setProperty("status", status)
         indicator.setFixedWidth(4)
         indicator.setFixedHeight(70)
-        indicator.setStyleSheet(f"background-color: {indicator_color}; border: none;")
         indicator.move(0, 0)
     
     def mousePressEvent(self, event):
@@ -322,6 +407,13 @@ class TaskCard(QFrame):
         
         super().mousePressEvent(event)
     
+    @classmethod
+    def _get_start_drag_distance(cls) -> int:
+        """Lấy khoảng cách tối thiểu để bắt đầu kéo thả (đọc từ Qt một lần)"""
+        if cls._start_drag_distance is None:
+            cls._start_drag_distance = QApplication.startDragDistance()
+        return cls._start_drag_distance
+    
     def mouseDoubleClickEvent(self, event):
         """Xử lý sự kiện double click"""
         if event.button() == Qt.MouseButton.LeftButton:
@@ -333,9 +425,8 @@ class TaskCard(QFrame):
         """Xử lý sự kiện thả chuột"""
         if event.button() == Qt.MouseButton.LeftButton:
             # Nếu không phải đang kéo thả, thì coi đây là click đơn
-            start_drag_distance = QApplication.startDragDistance()
             manhattan_length = (event.pos() - self._drag_start_position).manhattanLength()
-            if manhattan_length < start_drag_distance:
+            if manhattan_length < self._get_start_drag_distance():
                 # Phát tín hiệu taskSelected khi click đơn
                 self.taskSelected.emit(self.task_id)
         
@@ -343,53 +434,64 @@ class TaskCard(QFrame):
     
     def mouseMoveEvent(self, event):
         """Xử lý sự kiện di chuột (để kéo thả)"""
-        if not hasattr(self, '_drag_start_position'):
+        # Trường hợp phổ biến: chỉ di chuột qua thẻ, không giữ nút trái
+        if not (event.buttons() & Qt.MouseButton.LeftButton):
+            super().mouseMoveEvent(event)
+            return
+        
+        # Kiểm tra xem đã di chuyển đủ xa để bắt đầu kéo thả chưa
+        start_drag_distance = self._get_start_drag_distance()
+        manhattan_length = (event.pos() - self._drag_start_position).manhattanLength()
+        logging.debug("Manhattan length: %s, start drag distance: %s", manhattan_length, start_drag_distance)
+        
+        if manhattan_length < start_drag_distance:
             return
-            
-        if event.buttons() & Qt.MouseButton.LeftButton:
-            # Kiểm tra xem đã di chuyển đủ xa để bắt đầu kéo thả chưa
-            start_drag_distance = QApplication.startDragDistance()
-            manhattan_length = (event.pos() - self._drag_start_position).manhattanLength()
-            logging.debug(f"Manhattan length: {manhattan_length}, start drag distance: {start_drag_distance}")
-            
-            if manhattan_length < start_drag_distance:
-                return
-            
-            logging.debug(f"Bắt đầu kéo thả task {self.task_id}")
-                
-            # Tạo mime data để kéo thả
-            mime_data = QMimeData()
-            mime_data.setText(self.task_id)
-            mime_data.setData("application/x-task", self.task_id.encode())
-            
-            logging.debug(f"Đã tạo mime data cho task {self.task_id}")
-            logging.debug(f"MIME formats: {mime_data.formats()}")
-            
-            # Tạo pixmap để hiển thị khi kéo
-            pixmap = QPixmap(self.size())
-            self.render(pixmap)
-            
-            # Tạo drag object
-            drag = QDrag(self)
-            drag.setMimeData(mime_data)
-            drag.setPixmap(pixmap)
-            drag.setHotSpot(event.pos())
-            
-            logging.debug(f"Đã tạo drag object cho task {self.task_id}")
-            
-            # Thực hiện kéo thả
-            logging.debug(f"Thực hiện kéo task {self.task_id}")
-            result = drag.exec(Qt.DropAction.MoveAction)
-            logging.debug(f"Kết quả kéo thả: {result}")
-            
-            # Log kết quả kéo thả
-            if result == Qt.DropAction.MoveAction:
-                logging.info(f"Kéo thả thành công task {self.task_id}")
-            else:
-                logging.info(f"Kéo thả không thành công task {self.task_id}, kết quả: {result}")
+        
+        logging.debug("Bắt đầu kéo thả task %s", self.task_id)
+        
+        # Chỉ tạo mime data/pixmap khi chắc chắn bắt đầu kéo thả
+        mime_data = QMimeData()
+        mime_data.setText(self.task_id)
+        mime_data.setData("application/x-task", self.task_id.encode())
+        
+        logging.debug("Đã tạo mime data cho task %s", self.task_id)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("MIME formats: %s", mime_data.formats())
+        
+        # Tạo drag object
+        drag = QDrag(self)
+        drag.setMimeData(mime_data)
+        drag.setPixmap(self._get_drag_pixmap())
+        drag.setHotSpot(event.pos())
+        
+        logging.debug("Đã tạo drag object cho task %s", self.task_id)
+        
+        # Thực hiện kéo thả
+        logging.debug("Thực hiện kéo task %s", self.task_id)
+        result = drag.exec(Qt.DropAction.MoveAction)
+        logging.debug("Kết quả kéo thả: %s", result)
+        
+        # Log kết quả kéo thả
+        if result == Qt.DropAction.MoveAction:
+            logging.info(f"Kéo thả thành công task {self.task_id}")
+        else:
+            logging.info(f"Kéo thả không thành công task {self.task_id}, kết quả: {result}")
         
         super().mouseMoveEvent(event)
     
+    def _get_drag_pixmap(self) -> QPixmap:
+        """Lấy pixmap hiển thị khi kéo, chỉ render lại khi chưa có hoặc kích thước thẻ đã đổi"""
+        if self._drag_pixmap is None or self._drag_pixmap.size() != self.size():
+            pixmap = QPixmap(self.size())
+            self.render(pixmap)
+            self._drag_pixmap = pixmap
+        return self._drag_pixmap
+    
+    def resizeEvent(self, event):
+        """Xóa pixmap kéo thả đã lưu khi thẻ đổi kích thước"""
+        self._drag_pixmap = None
+        super().resizeEvent(event)
+    
     def showContextMenu(self, pos):
         """Hiển thị menu ngữ cảnh khi click chuột phải"""
         context_menu = QMenu(self)
@@ -428,11 +530,14 @@ class KanbanColumn(QWidget):
     
     taskMoved = pyqtSignal(str, str)  # task_id, new_status
     
-    def __init__(self, title: str, status: str, parent=None):
+    def __init__(self, title: str, status: str, parent=None, main_window=None):
         super().__init__(parent)
         
         self.title = title
         self.status = status
+        # MainWindow giữ dữ liệu task và xử lý chọn/sửa task; truyền vào khi tạo cột
+        # thay vì dò ngược cây widget ở mỗi sự kiện
+        self._main_window = main_window
         
         # Thiết lập kích thước
         self.setMinimumWidth(255)
@@ -444,36 +549,20 @@ class KanbanColumn(QWidget):
         layout.setSpacing(0)
         
         # Tạo tiêu đề
+        # Style của các phần trong cột lấy từ KANBAN_STYLE theo objectName
         header = QFrame()
-        header.setStyleSheet("""
-            QFrame {
-                background-color: #0a0a12;
-                border: none;
-            }
-        """)
+        header.setObjectName("kanbanHeader")
         header.setFixedHeight(30)
         
         # Thêm tiêu đề vào header
         header_layout = QHBoxLayout(header)
         header_layout.setContentsMargins(0, 0, 0, 0)
         title_label = QLabel(title)
-        title_label.setStyleSheet("color: #ffffff; font-weight: bold; font-size: 12px;")
+        title_label.setObjectName("kanbanTitle")
         
         # Thêm nút "+" để tạo task mới
         add_button = QPushButton("+")
-        add_button.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                color: #00ff00;
-                font-weight: bold;
-                font-size: 16px;
-                border: none;
-                max-width: 20px;
-            }
-            QPushButton:hover {
-                color: #ffffff;
-            }
-        """)
+        add_button.setObjectName("kanbanAddButton")
         add_button.clicked.connect(self.add_new_task)
         
         header_layout.addWidget(title_label)
@@ -481,40 +570,15 @@ class KanbanColumn(QWidget):
         
         # Tạo vùng nội dung
         content = QWidget()
-        content.setStyleSheet("""
-            QWidget {
-                background-color: #121218;
-                border: none;
-            }
-        """)
+        content.setObjectName("kanbanContent")
         
         # Tạo vùng cuộn
         scroll = QScrollArea()
+        scroll.setObjectName("kanbanScroll")
         scroll.setWidgetResizable(True)
-        scroll.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: transparent;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #121218;
-                width: 10px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #2a2a3a;
-                min-height: 20px;
-                border-radius: 5px;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                border: none;
-                background: none;
-            }
-            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {
-                background: none;
-            }
-        """)
+        
+        # Thẻ task trong cột theo task_id, để xóa/đếm không phải duyệt layout
+        self._cards = {}
         
         # Tạo container cho task
         task_container = QWidget()
@@ -537,33 +601,59 @@ class KanbanColumn(QWidget):
     
     def add_task(self, task_id: str, title: str, priority: str = "Medium") -> TaskCard:
         """Thêm task vào cột"""
+        # Mỗi task chỉ có một thẻ trong cột, thẻ cũ (nếu có) được thay thế
+        if task_id in self._cards:
+            self.remove_task(task_id)
+        
         task_card = TaskCard(task_id, title, self.status, priority)
         task_card.taskSelected.connect(self.on_task_selected)
         task_card.taskMoved.connect(self.on_task_moved)
         task_card.taskEditRequested.connect(self.on_task_edit_requested)
         
         self.task_layout.insertWidget(self.task_layout.count() - 1, task_card)
+        self._cards[task_id] = task_card
+        if self._main_window is not None:
+            self._main_window.task_index[task_id] = (task_card, self)
         return task_card
     
+    def bulk_add(self, tasks: list) -> None:
+        """Thêm nhiều task cùng lúc, chỉ cập nhật layout và vẽ lại một lần
+        
+        Args:
+            tasks: Danh sách (task_id, title, priority)
+        """
+        self.setUpdatesEnabled(False)
+        try:
+            for task_id, title, priority in tasks:
+                self.add_task(task_id, title, priority)
+        finally:
+            self.setUpdatesEnabled(True)
+            self.updateGeometry()
+    
     def remove_task(self, task_id: str) -> bool:
         """Xóa task khỏi cột"""
-        logging.debug(f"Xóa task {task_id} khỏi cột {self.status}")
-        for i in range(self.task_layout.count()):
-            widget = self.task_layout.itemAt(i).widget()
-            if isinstance(widget, TaskCard) and widget.task_id == task_id:
-                self.task_layout.removeWidget(widget)
-                widget.hide()
-                widget.deleteLater()
-                return True
-        return False
+        logging.debug("Xóa task %s khỏi cột %s", task_id, self.status)
+        widget = self._cards.pop(task_id, None)
+        if widget is None:
+            return False
+        if self._main_window is not None:
+            task_index = self._main_window.task_index
+            # Chỉ xóa nếu mục trong index đúng là thẻ của cột này
+            if task_index.get(task_id, (None,))[0] is widget:
+                del task_index[task_id]
+        self.task_layout.removeWidget(widget)
+        widget.hide()
+        widget.deleteLater()
+        return True
     
     def get_task_count(self) -> int:
         """Lấy số lượng task trong cột"""
-        return self.task_layout.count() - 1  # Trừ 1 cho stretch item
+        return len(self._cards)
     
     def add_new_task(self):
         """Mở dialog để tạo task mới"""
-        dialog = TaskDialog(self)
+        next_id = self._main_window.next_task_id if self._main_window is not None else None
+        dialog = TaskDialog(self, next_id=next_id)
         
         if dialog.exec() == QDialog.DialogCode.Accepted:
             task_data = dialog.get_task_data()
@@ -572,14 +662,9 @@ class KanbanColumn(QWidget):
             task_card = self.add_task(task_data["id"], task_data["title"], task_data["priority"])
             
             # Lưu vào bộ nhớ của MainWindow
-            parent = self.parent()
-            while parent:
-                if hasattr(parent, "tasks"):
-                    # Lưu task vào bộ nhớ của MainWindow
-                    task_data["status"] = self.status  # Gán trạng thái cho task mới
-                    parent.tasks[task_data["id"]] = task_data
-                    break
-                parent = parent.parent()
+            if self._main_window is not None:
+                task_data["status"] = self.status  # Gán trạng thái cho task mới
+                self._main_window.tasks[task_data["id"]] = task_data
             
             # Thông báo task mới được tạo
             logging.info(f"Tạo task mới {task_data['id']} trong cột {self.title} ({self.status})")
@@ -587,49 +672,42 @@ class KanbanColumn(QWidget):
     
     def on_task_selected(self, task_id: str):
         """Xử lý khi task được chọn"""
-        # Truyền sự kiện lên parent widget
-        parent = self.parent()
-        while parent:
-            if hasattr(parent, "on_task_selected"):
-                parent.on_task_selected(task_id)
-                break
-            parent = parent.parent()
+        # Truyền sự kiện lên MainWindow
+        if self._main_window is not None:
+            self._main_window.on_task_selected(task_id)
     
     def on_task_moved(self, task_id: str, new_status: str):
         """Xử lý khi task được di chuyển"""
         # Truyền sự kiện lên parent widget
-        logging.debug(f"KanbanColumn: Phát tín hiệu di chuyển task {task_id} sang {new_status}")
+        logging.debug("KanbanColumn: Phát tín hiệu di chuyển task %s sang %s", task_id, new_status)
         self.taskMoved.emit(task_id, new_status)
     
     def on_task_edit_requested(self, task_id: str):
         """Xử lý khi yêu cầu chỉnh sửa task"""
-        # Truyền sự kiện lên parent widget
-        parent = self.parent()
-        while parent:
-            if hasattr(parent, "on_task_edit_requested"):
-                parent.on_task_edit_requested(task_id)
-                break
-            parent = parent.parent()
+        # Truyền sự kiện lên MainWindow
+        if self._main_window is not None:
+            self._main_window.on_task_edit_requested(task_id)
     
     def dragEnterEvent(self, event):
         """Xử lý sự kiện khi kéo vào vùng"""
-        logging.debug(f"dragEnterEvent cho cột {self.title}")
-        logging.debug(f"MIME formats: {event.mimeData().formats()}")
-        
-        if event.mimeData().hasText():
-            logging.debug(f"MIME text: {event.mimeData().text()}")
+        logging.debug("dragEnterEvent cho cột %s", self.title)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            # formats()/text() tạo list/chuỗi mới, chỉ gọi khi thực sự ghi log debug
+            logging.debug("MIME formats: %s", event.mimeData().formats())
+            if event.mimeData().hasText():
+                logging.debug("MIME text: %s", event.mimeData().text())
             
         if event.mimeData().hasFormat("application/x-task"):
             task_id = event.mimeData().data("application/x-task").data().decode()
-            logging.debug(f"Chấp nhận kéo task {task_id} vào cột {self.title}")
+            logging.debug("Chấp nhận kéo task %s vào cột %s", task_id, self.title)
             event.setDropAction(Qt.DropAction.MoveAction)
             event.accept()
         else:
-            logging.debug(f"Từ chối kéo vào cột {self.title} (không phải task)")
+            logging.debug("Từ chối kéo vào cột %s (không phải task)", self.title)
             # Thử kiểm tra nếu có text
             if event.mimeData().hasText():
                 task_id = event.mimeData().text()
-                logging.debug(f"Nhưng có text: {task_id}, thử chấp nhận")
+                logging.debug("Nhưng có text: %s, thử chấp nhận", task_id)
                 event.setDropAction(Qt.DropAction.MoveAction)
                 event.accept()
             else:
@@ -641,13 +719,14 @@ class KanbanColumn(QWidget):
             event.setDropAction(Qt.DropAction.MoveAction)
             event.accept()
         else:
-            logging.debug(f"Từ chối kéo trong cột {self.title} (không phải task)")
+            logging.debug("Từ chối kéo trong cột %s (không phải task)", self.title)
             event.ignore()
     
     def dropEvent(self, event):
         """Xử lý sự kiện khi thả vào vùng"""
-        logging.debug(f"dropEvent cho cột {self.title}")
-        logging.debug(f"MIME formats: {event.mimeData().formats()}")
+        logging.debug("dropEvent cho cột %s", self.title)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("MIME formats: %s", event.mimeData().formats())
         
         # Kiểm tra xem sự kiện có phải từ nút + hay không
         source_widget = event.source()
@@ -660,27 +739,20 @@ class KanbanColumn(QWidget):
         
         if event.mimeData().hasFormat("application/x-task"):
             task_id = event.mimeData().data("application/x-task").data().decode()
-            logging.debug(f"Nhận được task {task_id} thả vào cột {self.title} từ MIME data")
+            logging.debug("Nhận được task %s thả vào cột %s từ MIME data", task_id, self.title)
         elif event.mimeData().hasText():
             task_id = event.mimeData().text()
-            logging.debug(f"Nhận được task {task_id} thả vào cột {self.title} từ text")
+            logging.debug("Nhận được task %s thả vào cột %s từ text", task_id, self.title)
         
         if task_id:
-            # Tìm task card nguồn
+            # Tìm task card nguồn qua index của MainWindow
             source_card = None
             source_column = None
-            for column in self.parent().findChildren(KanbanColumn):
-                for i in range(column.task_layout.count()):
-                    widget = column.task_layout.itemAt(i).widget()
-                    if isinstance(widget, TaskCard) and widget.task_id == task_id:
-                        source_card = widget
-                        source_column = column
-                        break
-                if source_card:
-                    break
+            if self._main_window is not None:
+                source_card, source_column = self._main_window.task_index.get(task_id, (None, None))
             
             if source_card:
-                logging.debug(f"Tìm thấy source card cho task {task_id} ở cột {source_column.title} ({source_column.status})")
+                logging.debug("Tìm thấy source card cho task %s ở cột %s (%s)", task_id, source_column.title, source_column.status)
                 
                 if source_column.status != self.status:
                     # Di chuyển task sang cột mới
@@ -701,6 +773,69 @@ class KanbanColumn(QWidget):
 
 # ----- Widget Snapshot -----
 
+def format_snapshot_time(timestamp) -> str:
+    """Định dạng thời gian hiển thị của snapshot (HH:MM:SS)
+    
+    Args:
+        timestamp: datetime, chuỗi ISO 8601 hoặc None (dùng thời điểm hiện tại)
+    
+    Returns:
+        str: Chuỗi giờ dạng HH:MM:SS
+    """
+    if timestamp is None:
+        timestamp = datetime.datetime.now()
+    elif isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    return timestamp.strftime("%H:%M:%S")
+
+class SnapshotModel(QAbstractListModel):
+    """Model danh sách snapshot: giữ dict snapshot và chuỗi hiển thị định dạng sẵn"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []      # dict snapshot
+        self._labels = []    # chuỗi hiển thị tương ứng
+    
+    @staticmethod
+    def _label(snapshot_data: dict) -> str:
+        formatted_time = snapshot_data.get("formatted_time")
+        if formatted_time is None:
+            formatted_time = format_snapshot_time(snapshot_data.get("timestamp"))
+        return f"{formatted_time} - Snapshot #{snapshot_data.get('id', 0)}"
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._labels[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return self._rows[index.row()]
+        return None
+    
+    def add_snapshots(self, snapshots: list):
+        """Thêm nhiều snapshot vào cuối danh sách với một lần báo cho view
+        
+        Args:
+            snapshots: Danh sách dict snapshot
+        """
+        if not snapshots:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(snapshots) - 1)
+        self._rows.extend(snapshots)
+        self._labels.extend(self._label(snapshot_data) for snapshot_data in snapshots)
+        self.endInsertRows()
+    
+    def clear(self):
+        """Xóa tất cả snapshot"""
+        self.beginResetModel()
+        self._rows.clear()
+        self._labels.clear()
+        self.endResetModel()
+
 class SnapshotList(QWidget):
     """Widget hiển thị danh sách snapshot"""
     
@@ -716,54 +851,371 @@ class SnapshotList(QWidget):
         title = QLabel("Snapshots")
         title.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 14px;")
         
-        # Danh sách snapshot
-        self.list_widget = QListWidget()
-        self.list_widget.setStyleSheet("""
-            QListWidget {
+        # Danh sách snapshot: view chỉ vẽ các dòng đang hiện, dữ liệu nằm trong model
+        self.model = SnapshotModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setStyleSheet("""
+            QListView {
                 background-color: #15151f;
                 border: none;
                 color: #ffffff;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 5px;
                 border-bottom: 1px solid #2a2a3a;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #2a2a3a;
                 color: #00ff00;
             }
         """)
-        self.list_widget.currentItemChanged.connect(self.on_item_selected)
+        self.list_view.selectionModel().currentChanged.connect(self.on_item_selected)
         
         # Thêm widget vào layout
         layout.addWidget(title)
-        layout.addWidget(self.list_widget)
+        layout.addWidget(self.list_view)
     
     def add_snapshot(self, snapshot_data: dict):
         """Thêm snapshot vào danh sách"""
-        timestamp = snapshot_data.get("timestamp", datetime.datetime.now())
-        formatted_time = timestamp.strftime("%H:%M:%S")
-        
-        item = QListWidgetItem(f"{formatted_time} - Snapshot #{snapshot_data.get('id', 0)}")
-        item.setData(Qt.ItemDataRole.UserRole, snapshot_data)
-        
-        self.list_widget.addItem(item)
+        self.model.add_snapshots([snapshot_data])
+    
+    def add_snapshots(self, snapshots: list):
+        """Thêm nhiều snapshot cùng lúc"""
+        self.model.add_snapshots(snapshots)
     
     def clear_snapshots(self):
         """Xóa tất cả snapshot"""
-        self.list_widget.clear()
+        self.model.clear()
     
     def on_item_selected(self, current, previous):
         """Xử lý khi chọn snapshot"""
-        if current:
+        if current.isValid():
             snapshot_data = current.data(Qt.ItemDataRole.UserRole)
             self.snapshotSelected.emit(snapshot_data)
 
+# ----- Hoạt động gần đây -----
+
+class ActivityModel(QAbstractListModel):
+    """Model hoạt động gần đây: các cặp (nội dung, thời gian), mục mới nhất ở đầu"""
+    
+    TimeRole = Qt.ItemDataRole.UserRole + 1
+    
+    def __init__(self, max_rows: int = 5, parent=None):
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self._rows = []  # [(activity_text, time_text)]
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"• {self._rows[index.row()][0]}"
+        if role == self.TimeRole:
+            return self._rows[index.row()][1]
+        return None
+    
+    def add_activity(self, activity_text: str, time_text: str):
+        """Thêm hoạt động vào đầu danh sách, bỏ mục cũ nhất khi vượt max_rows
+        
+        Args:
+            activity_text: Nội dung hoạt động
+            time_text: Thời gian hiển thị (vd. "just now")
+        """
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._rows.insert(0, (activity_text, time_text))
+        self.endInsertRows()
+        
+        if len(self._rows) > self.max_rows:
+            self.beginRemoveRows(QModelIndex(), self.max_rows, len(self._rows) - 1)
+            del self._rows[self.max_rows:]
+            self.endRemoveRows()
+
+class ActivityDelegate(QStyledItemDelegate):
+    """Vẽ mỗi hoạt động thành hai dòng (nội dung, thời gian) thay cho hai QLabel"""
+    
+    TEXT_COLOR = QColor("#ffffff")
+    TIME_COLOR = QColor("#6b6b8d")
+    PADDING = 10        # Lề quanh mỗi dòng, như padding của các QLabel trước đây
+    LINE_SPACING = 6    # Khoảng cách giữa dòng nội dung và dòng thời gian
+    ROW_SPACING = 16    # Khoảng cách giữa hai hoạt động
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # (font nội dung, font thời gian, chiều cao hai dòng), tạo khi dùng lần đầu
+        self._fonts = None
+    
+    def _get_fonts(self, base_font):
+        if self._fonts is None:
+            text_font = QFont(base_font)
+            text_font.setPixelSize(12)
+            time_font = QFont(base_font)
+            time_font.setPixelSize(10)
+            self._fonts = (text_font, time_font,
+                           QFontMetrics(text_font).height(), QFontMetrics(time_font).height())
+        return self._fonts
+    
+    def sizeHint(self, option, index):
+        text_font, _, text_height, time_height = self._get_fonts(option.font)
+        width = QFontMetrics(text_font).horizontalAdvance(index.data()) + 2 * self.PADDING
+        height = text_height + time_height + 4 * self.PADDING + self.LINE_SPACING + self.ROW_SPACING
+        return QSize(width, height)
+    
+    def paint(self, painter, option, index):
+        text_font, time_font, text_height, time_height = self._get_fonts(option.font)
+        left = option.rect.left() + self.PADDING
+        width = option.rect.width() - 2 * self.PADDING
+        text_top = option.rect.top() + self.PADDING
+        time_top = text_top + text_height + 2 * self.PADDING + self.LINE_SPACING
+        
+        painter.save()
+        painter.setFont(text_font)
+        painter.setPen(self.TEXT_COLOR)
+        text = QFontMetrics(text_font).elidedText(index.data(), Qt.TextElideMode.ElideRight, width)
+        painter.drawText(QRect(left, text_top, width, text_height),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+        painter.setFont(time_font)
+        painter.setPen(self.TIME_COLOR)
+        painter.drawText(QRect(left, time_top, width, time_height),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         index.data(ActivityModel.TimeRole))
+        painter.restore()
+
+class ActivityGraphWidget(QFrame):
+    """Biểu đồ cột hoạt động, vẽ vào pixmap lưu sẵn và chỉ vẽ lại khi dữ liệu/kích thước đổi"""
+    
+    BAR_COLOR = QColor("#00ff00")
+    BAR_GAP = 6
+    PLACEHOLDER_TEXT = "[ Activity Graph Placeholder ]"
+    PLACEHOLDER_MARGIN = 19  # Lề hai bên dòng placeholder (lề layout + padding của QLabel cũ)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._series = []
+        self._cache = None   # QPixmap nội dung biểu đồ (không gồm nền khung)
+        self._dirty = True
+    
+    def set_data(self, series):
+        """Cập nhật dữ liệu biểu đồ
+        
+        Args:
+            series: Danh sách số hoạt động theo ngày (cũ nhất trước)
+        """
+        self._series = list(series)
+        self._dirty = True
+        self.update()
+    
+    def _placeholder_font(self) -> QFont:
+        font = QFont(self.font())
+        font.setPixelSize(14)
+        return font
+    
+    def sizeHint(self) -> QSize:
+        margins = self.contentsMargins()
+        text_width = QFontMetrics(self._placeholder_font()).horizontalAdvance(self.PLACEHOLDER_TEXT)
+        return QSize(text_width + 2 * self.PLACEHOLDER_MARGIN + margins.left() + margins.right(),
+                     self.minimumHeight())
+    
+    def minimumSizeHint(self) -> QSize:
+        # Như QLabel cũ: không co hẹp hơn dòng placeholder
+        return self.sizeHint()
+    
+    def paintEvent(self, event):
+        """Vẽ nền khung theo stylesheet rồi chép pixmap nội dung đã lưu"""
+        super().paintEvent(event)
+        rect = self.contentsRect()
+        if rect.isEmpty():
+            return
+        # Vẽ lại khi dữ liệu đổi hoặc khung đổi kích thước
+        if self._dirty or self._cache is None or self._cache.size() != rect.size():
+            self._cache = self._render(rect.size())
+            self._dirty = False
+        painter = QPainter(self)
+        painter.drawPixmap(rect.topLeft(), self._cache)
+        painter.end()
+    
+    def _render(self, size: QSize) -> QPixmap:
+        """Vẽ các cột (hoặc dòng placeholder khi chưa có dữ liệu) vào pixmap trong suốt"""
+        pixmap = QPixmap(size)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        
+        peak = max(self._series, default=0)
+        if peak <= 0:
+            painter.setFont(self._placeholder_font())
+            painter.setPen(self.BAR_COLOR)
+            painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, self.PLACEHOLDER_TEXT)
+        else:
+            count = len(self._series)
+            bar_width = max(1, (size.width() - self.BAR_GAP * (count - 1)) // count)
+            for i, value in enumerate(self._series):
+                bar_height = round(size.height() * value / peak)
+                painter.fillRect(i * (bar_width + self.BAR_GAP), size.height() - bar_height,
+                                 bar_width, bar_height, self.BAR_COLOR)
+        painter.end()
+        return pixmap
+
 # ----- Tạo cửa sổ chính -----
 
+# Stylesheet chung của cửa sổ chính (theme + bảng Kanban). Dựng và rút gọn khoảng
+# trắng một lần khi import, mọi MainWindow dùng lại cùng một chuỗi
+_GLOBAL_QSS = re.sub(r"\s+", " ", """
+    QMainWindow {
+        background-color: #000000;
+    }
+    QWidget {
+        color: #ffffff;
+        font-family: Arial, sans-serif;
+    }
+    QPushButton {
+        background-color: #121218;
+        border: none;
+        border-radius: 5px;
+        padding: 5px 10px;
+        color: #ffffff;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #1f1f2e;
+    }
+    QPushButton:pressed {
+        background-color: #00ff00;
+        color: #000000;
+    }
+    QLineEdit {
+        background-color: #1c1c27;
+        border: 1px solid #2d2d3d;
+        border-radius: 15px;
+        padding: 5px 10px;
+        color: #ffffff;
+    }
+    QTextEdit {
+        background-color: #000000;
+        border: none;
+        color: #abb2bf;
+        font-family: Consolas, monospace;
+        selection-background-color: #2c3e50;
+        selection-color: #ffffff;
+    }
+    QSplitter::handle {
+        background-color: #000000;
+    }
+    QTabBar::tab {
+        background-color: #121218;
+        color: #6b6b8d;
+        padding: 5px 10px;
+        margin-right: 2px;
+        border: none;
+    }
+    QTabBar::tab:selected {
+        background-color: #00ff00;
+        color: #000000;
+        font-weight: bold;
+    }
+    QTabWidget::pane {
+        border: none;
+    }
+    QDialog {
+        background-color: #0f0f17;
+    }
+    QLabel {
+        color: #ffffff;
+    }
+    QComboBox {
+        background-color: #1c1c27;
+        border: 1px solid #2d2d3d;
+        border-radius: 5px;
+        padding: 5px;
+        color: #ffffff;
+    }
+    QComboBox::drop-down {
+        border: none;
+    }
+    QComboBox::down-arrow {
+        image: none;
+        border-left: 5px solid transparent;
+        border-right: 5px solid transparent;
+        border-top: 5px solid #ffffff;
+        width: 0;
+        height: 0;
+        margin-right: 5px;
+    }
+    QComboBox QAbstractItemView {
+        background-color: #1c1c27;
+        border: 1px solid #2d2d3d;
+        selection-background-color: #2a2a3a;
+        selection-color: #ffffff;
+    }
+    QDateTimeEdit {
+        background-color: #1c1c27;
+        border: 1px solid #2d2d3d;
+        border-radius: 5px;
+        padding: 5px;
+        color: #ffffff;
+    }
+    QPushButton#toolbarBtn {
+        background-color: transparent;
+        border: none;
+        color: #ffffff;
+        font-weight: bold;
+        font-size: 16px;
+    }
+    QPushButton#toolbarBtn:hover {
+        color: #00ff00;
+    }
+    QWidget#rightSidebar, QWidget#rightSidebar QWidget {
+        background-color: #000000;
+    }
+    QWidget#rightSidebar QFrame#totalChanges, QWidget#rightSidebar QFrame#totalChanges QFrame {
+        background-color: #15151f;
+        border-radius: 5px;
+    }
+    QWidget#rightSidebar QFrame#statCard, QWidget#rightSidebar QFrame#statCard QFrame,
+    QWidget#rightSidebar QFrame#recent_activity_widget, QWidget#rightSidebar QFrame#recent_activity_widget QFrame {
+        background-color: #15151f;
+        border-radius: 5px;
+        padding: 10px;
+    }
+    QWidget#rightSidebar QFrame#recent_activity_widget QListView#activityList {
+        background-color: transparent;
+        border: none;
+        padding: 0px;
+    }
+    QLabel#headerGreen {
+        color: #00ff00;
+        font-weight: bold;
+        font-size: 18px;
+    }
+    QLabel#subHeaderGreen {
+        color: #00ff00;
+        font-weight: bold;
+        font-size: 14px;
+    }
+""" + KANBAN_STYLE).strip()
+
+
+def _intern_field(value):
+    """Intern giá trị trạng thái/độ ưu tiên từ sự kiện editor nếu là chuỗi
+    
+    Args:
+        value: Giá trị lấy từ payload sự kiện (có thể None hoặc không phải chuỗi)
+        
+    Returns:
+        Chuỗi đã intern, hoặc chính value nếu không phải chuỗi
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class MainWindow(QMainWindow):
     """Cửa sổ chính của ứng dụng"""
     
+    ready = pyqtSignal()  # Phát khi API client và dữ liệu mẫu đã khởi tạo xong
+    dataLoaded = pyqtSignal(dict)  # Dữ liệu tải từ luồng worker, xử lý bởi _populate_kanban
+    
     # --- Gắn các hàm AI helper vào MainWindow để dùng self.<func> ---
     get_code_from_editor = get_code_from_editor
     ai_analyze_code_quality = ai_analyze_code_quality
@@ -782,6 +1234,8 @@ class MainWindow(QMainWindow):
         self.current_task = None
         self.snapshots = {}  # {file_path: [snapshot1, snapshot2, ...]}
         self.tasks = {}  # {task_id: task_data}
+        self.task_index = {}  # {task_id: (task_card, kanban_column)}, cập nhật bởi KanbanColumn
+        self._next_task_seq = 100  # Số thứ tự cho ID task mới, xem next_task_id
         self.settings = get_settings()
         
         # Thiết lập cửa sổ
@@ -807,6 +1261,10 @@ class MainWindow(QMainWindow):
         # Tạo thanh trạng thái
         self.create_status_bar()
         
+        # Khởi tạo API client và dữ liệu mẫu chạy ngầm, cửa sổ hiện ngay và
+        # được điền dần; phát ready khi cả hai bước đã xong
+        self._pending_init = 2
+        
         # Khởi tạo API client (giả lập)
         self.init_api_client()
         
@@ -814,110 +1272,19 @@ class MainWindow(QMainWindow):
         self.init_database()
         
         # Tạo dữ liệu demo
+        self.dataLoaded.connect(self._populate_kanban)
         self.load_sample_data()
         
-        # Thiết lập timer cập nhật
+        # Thiết lập timer cập nhật: update_ui chỉ vẽ lại khi sang ngày mới,
+        # timer thưa chỉ là dự phòng, còn lại làm mới khi cửa sổ lấy lại focus
         self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self.update_ui)
-        self.update_timer.start(60000)  # Cập nhật mỗi phút
+        self.update_timer.start(5 * 60 * 1000)  # Dự phòng mỗi 5 phút
+        QApplication.instance().focusChanged.connect(self._on_focus_changed)
 
     def apply_theme(self):
         """Áp dụng theme cho ứng dụng"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #000000;
-            }
-            QWidget {
-                color: #ffffff;
-                font-family: Arial, sans-serif;
-            }
-            QPushButton {
-                background-color: #121218;
-                border: none;
-                border-radius: 5px;
-                padding: 5px 10px;
-                color: #ffffff;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #1f1f2e;
-            }
-            QPushButton:pressed {
-                background-color: #00ff00;
-                color: #000000;
-            }
-            QLineEdit {
-                background-color: #1c1c27;
-                border: 1px solid #2d2d3d;
-                border-radius: 15px;
-                padding: 5px 10px;
-                color: #ffffff;
-            }
-            QTextEdit {
-                background-color: #000000;
-                border: none;
-                color: #abb2bf;
-                font-family: Consolas, monospace;
-                selection-background-color: #2c3e50;
-                selection-color: #ffffff;
-            }
-            QSplitter::handle {
-                background-color: #000000;
-            }
-            QTabBar::tab {
-                background-color: #121218;
-                color: #6b6b8d;
-                padding: 5px 10px;
-                margin-right: 2px;
-                border: none;
-            }
-            QTabBar::tab:selected {
-                background-color: #00ff00;
-                color: #000000;
-                font-weight: bold;
-            }
-            QTabWidget::pane {
-                border: none;
-            }
-            QDialog {
-                background-color: #0f0f17;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QComboBox {
-                background-color: #1c1c27;
-                border: 1px solid #2d2d3d;
-                border-radius: 5px;
-                padding: 5px;
-                color: #ffffff;
-            }
-            QComboBox::drop-down {
-                border: none;
-            }
-            QComboBox::down-arrow {
-                image: none;
-                border-left: 5px solid transparent;
-                border-right: 5px solid transparent;
-                border-top: 5px solid #ffffff;
-                width: 0;
-                height: 0;
-                margin-right: 5px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #1c1c27;
-                border: 1px solid #2d2d3d;
-                selection-background-color: #2a2a3a;
-                selection-color: #ffffff;
-            }
-            QDateTimeEdit {
-                background-color: #1c1c27;
-                border: 1px solid #2d2d3d;
-                border-radius: 5px;
-                padding: 5px;
-                color: #ffffff;
-            }
-        """)
+        self.setStyleSheet(_GLOBAL_QSS)
     
     def create_toolbar(self):
         """Tạo thanh công cụ chính"""
@@ -965,65 +1332,21 @@ class MainWindow(QMainWindow):
         app_name = QLabel("WindSurf_Memory")
         app_name.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 20px;")
         
-        # Các nút menu
+        # Các nút menu, style chung theo objectName trong stylesheet của cửa sổ
         projects_btn = QPushButton("Projects")
-        projects_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: none;
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                color: #00ff00;
-            }
-        """)
+        projects_btn.setObjectName("toolbarBtn")
         projects_btn.clicked.connect(self.show_projects)
         
         tasks_btn = QPushButton("Tasks")
-        tasks_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: none;
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                color: #00ff00;
-            }
-        """)
+        tasks_btn.setObjectName("toolbarBtn")
         tasks_btn.clicked.connect(self.show_tasks)
         
         analytics_btn = QPushButton("Analytics")
-        analytics_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: none;
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                color: #00ff00;
-            }
-        """)
+        analytics_btn.setObjectName("toolbarBtn")
         analytics_btn.clicked.connect(self.show_analytics)
         
         terminal_btn = QPushButton("Terminal")
-        terminal_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: none;
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                color: #00ff00;
-            }
-        """)
+        terminal_btn.setObjectName("toolbarBtn")
         terminal_btn.clicked.connect(self.show_terminal)
         
         # --- Thêm các nút AI vào toolbar ---
@@ -1180,9 +1503,14 @@ class MainWindow(QMainWindow):
         kanban_layout.setContentsMargins(0, 0, 0, 0)
         
         # Tạo các cột Kanban
-        self.todo_column = KanbanColumn("TO DO", "todo")
-        self.in_progress_column = KanbanColumn("IN PROGRESS", "in_progress")
-        self.done_column = KanbanColumn("DONE", "done")
+        self.todo_column = KanbanColumn("TO DO", "todo", main_window=self)
+        self.in_progress_column = KanbanColumn("IN PROGRESS", "in_progress", main_window=self)
+        self.done_column = KanbanColumn("DONE", "done", main_window=self)
+        # Tra cột theo trạng thái task
+        self._columns = {
+            column.status: column
+            for column in (self.todo_column, self.in_progress_column, self.done_column)
+        }
         
         # Kết nối tín hiệu
         self.todo_column.taskMoved.connect(self.move_task)
@@ -1199,31 +1527,28 @@ class MainWindow(QMainWindow):
         left_layout.addWidget(kanban_label)
         left_layout.addWidget(kanban_widget, 1)
         
-        # Tạo sidebar phải
+        # Tạo sidebar phải; nền, thẻ thống kê và tiêu đề lấy style theo objectName
+        # trong stylesheet của cửa sổ (apply_theme)
         right_widget = QWidget()
         right_widget.setMaximumWidth(310)
-        right_widget.setStyleSheet("background-color: #000000;")
+        right_widget.setObjectName("rightSidebar")
         right_layout = QVBoxLayout(right_widget)
         right_layout.setContentsMargins(10, 10, 10, 10)
         right_layout.setSpacing(20)
         
         # Ngày
-        self.date_label = QLabel(datetime.datetime.now().strftime("%A, %B %d, %Y"))
+        self._shown_date = datetime.date.today()
+        self.date_label = QLabel(self._shown_date.strftime("%A, %B %d, %Y"))
         self.date_label.setStyleSheet("color: #6b6b8d; font-size: 14px; text-align: right;")
         self.date_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         
         # Tiêu đề Memory Stats
         stats_header = QLabel("MEMORY STATS")
-        stats_header.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 18px;")
+        stats_header.setObjectName("headerGreen")
         
         # Widget tổng số thay đổi
         total_changes = QFrame()
-        total_changes.setStyleSheet("""
-            QFrame {
-                background-color: #15151f;
-                border-radius: 5px;
-            }
-        """)
+        total_changes.setObjectName("totalChanges")
         total_changes_layout = QVBoxLayout(total_changes)
         
         changes_title = QLabel("Total Changes Tracked")
@@ -1239,40 +1564,22 @@ class MainWindow(QMainWindow):
         activity_title = QLabel("Activity Last 7 Days")
         activity_title.setStyleSheet("color: #ffffff; font-size: 14px;")
         
-        activity_graph = QFrame()
-        activity_graph.setStyleSheet("""
-            QFrame {
-                background-color: #15151f;
-                border-radius: 5px;
-                padding: 10px;
-            }
-        """)
-        activity_graph.setMinimumHeight(100)
-        
-        graph_placeholder = QLabel("[ Activity Graph Placeholder ]")
-        graph_placeholder.setStyleSheet("color: #00ff00; font-size: 14px;")
-        graph_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        activity_layout = QVBoxLayout(activity_graph)
-        activity_layout.addWidget(graph_placeholder)
+        # Biểu đồ tự vẽ từ pixmap lưu sẵn; hiện placeholder cho tới khi có set_data()
+        self.activity_graph = ActivityGraphWidget()
+        self.activity_graph.setObjectName("statCard")
+        self.activity_graph.setMinimumHeight(100)
         
         # Tiêu đề AI Insights
         ai_header = QLabel("AI INSIGHTS")
-        ai_header.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 18px;")
+        ai_header.setObjectName("headerGreen")
         
         # Tiêu đề sức khỏe code
         code_health_title = QLabel("Code Health")
-        code_health_title.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 14px;")
+        code_health_title.setObjectName("subHeaderGreen")
         
         # Widget sức khỏe code
         code_health_widget = QFrame()
-        code_health_widget.setStyleSheet("""
-            QFrame {
-                background-color: #15151f;
-                border-radius: 5px;
-                padding: 10px;
-            }
-        """)
+        code_health_widget.setObjectName("statCard")
         
         # Thanh sức khỏe
         health_bar = QFrame()
@@ -1293,66 +1600,44 @@ class MainWindow(QMainWindow):
         
         # Tiêu đề hoạt động gần đây
         recent_activity_title = QLabel("Recent Activity")
-        recent_activity_title.setStyleSheet("color: #00ff00; font-weight: bold; font-size: 14px;")
+        recent_activity_title.setObjectName("subHeaderGreen")
         
         # Widget hoạt động gần đây
         recent_activity_widget = QFrame()
         recent_activity_widget.setObjectName("recent_activity_widget")
-        recent_activity_widget.setStyleSheet("""
-            QFrame {
-                background-color: #15151f;
-                border-radius: 5px;
-                padding: 10px;
-            }
-        """)
         
         # Tạo layout cho hoạt động gần đây
         recent_activity_layout = QVBoxLayout(recent_activity_widget)
         
-        # Thêm các mục hoạt động
-        self.activity_items = []
-        
-        activity1 = QLabel("• Modified MemoryTracker.js")
-        activity1.setStyleSheet("color: #ffffff; font-size: 12px;")
-        
-        time1 = QLabel("5 minutes ago")
-        time1.setStyleSheet("color: #6b6b8d; font-size: 10px;")
-        
-        activity2 = QLabel("• Created KanbanBoard.js")
-        activity2.setStyleSheet("color: #ffffff; font-size: 12px;")
-        
-        time2 = QLabel("47 minutes ago")
-        time2.setStyleSheet("color: #6b6b8d; font-size: 10px;")
-        
-        activity3 = QLabel("• Completed Task-101")
-        activity3.setStyleSheet("color: #ffffff; font-size: 12px;")
-        
-        time3 = QLabel("2 hours ago")
-        time3.setStyleSheet("color: #6b6b8d; font-size: 10px;")
-        
-        # Thêm hoạt động vào layout
-        recent_activity_layout.addWidget(activity1)
-        recent_activity_layout.addWidget(time1)
-        recent_activity_layout.addSpacing(10)
-        recent_activity_layout.addWidget(activity2)
-        recent_activity_layout.addWidget(time2)
-        recent_activity_layout.addSpacing(10)
-        recent_activity_layout.addWidget(activity3)
-        recent_activity_layout.addWidget(time3)
-        
-        # Lưu các mục hoạt động để cập nhật sau
-        self.activity_items = [
-            (activity1, time1),
-            (activity2, time2),
-            (activity3, time3)
-        ]
+        # Danh sách hoạt động: model giữ dữ liệu, delegate vẽ từng mục trong một view
+        # thay vì tạo cặp QLabel cho mỗi hoạt động
+        self.activity_model = ActivityModel(parent=self)
+        for activity_text, time_text in [
+            ("Completed Task-101", "2 hours ago"),
+            ("Created KanbanBoard.js", "47 minutes ago"),
+            ("Modified MemoryTracker.js", "5 minutes ago")
+        ]:
+            self.activity_model.add_activity(activity_text, time_text)
+        
+        self.activity_view = QListView()
+        self.activity_view.setObjectName("activityList")
+        self.activity_view.setModel(self.activity_model)
+        self.activity_view.setItemDelegate(ActivityDelegate(self.activity_view))
+        self.activity_view.setUniformItemSizes(True)
+        self.activity_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.activity_view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.activity_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.activity_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.activity_view.setSizeAdjustPolicy(QAbstractScrollArea.SizeAdjustPolicy.AdjustToContents)
+        self.activity_view.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Minimum)
+        recent_activity_layout.addWidget(self.activity_view)
         
         # Thêm widgets vào sidebar
         right_layout.addWidget(self.date_label)
         right_layout.addWidget(stats_header)
         right_layout.addWidget(total_changes)
         right_layout.addWidget(activity_title)
-        right_layout.addWidget(activity_graph)
+        right_layout.addWidget(self.activity_graph)
         right_layout.addWidget(ai_header)
         right_layout.addWidget(code_health_title)
         right_layout.addWidget(code_health_widget)
@@ -1402,12 +1687,14 @@ class MainWindow(QMainWindow):
             
             # Đăng ký callback xử lý sự kiện từ WindSurf Editor
             self.api_client.on_editor_event(self.handle_editor_event)
+            self._init_step_done()
             
         def on_api_error(error_info):
             logging.error(f"Lỗi khởi tạo API client: {error_info[1]}")
             self.statusBar().showMessage("Không thể kết nối đến API", 5000)
             # Sử dụng API giả lập trong trường hợp lỗi
             self.api_client = create_api_client(use_mock=True)
+            self._init_step_done()
             
         # Hiển thị thông báo đang kết nối
         self.statusBar().showMessage("Đang kết nối đến API...")
@@ -1418,93 +1705,110 @@ class MainWindow(QMainWindow):
             init_api, 
             progress_text="Đang kết nối đến API...",
             on_result=on_api_ready,
-            on_error=on_api_error
+            on_error=on_api_error,
+            show_dialog=False
         )
     
     def handle_editor_event(self, event_data):
         """Xử lý sự kiện từ WindSurf Editor"""
         event_type = event_data.get('type')
-        logging.info(f"[DEBUG] Đã gọi handle_editor_event với event_type: {event_type}")
-        logging.info(f"[DEBUG] event_data đầy đủ: {event_data}")
+        # Chỉ repr event_data khi bật mức DEBUG; đây là đường xử lý mọi sự kiện từ editor
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Đã gọi handle_editor_event type=%s data=%r", event_type, event_data)
         
         if event_type == 'task_created':
-            logging.info(f"[DEBUG] Gọi handle_task_created với event_data: {event_data}")
             self.handle_task_created(event_data)
         elif event_type == 'task_updated':
-            logging.info(f"[DEBUG] Gọi handle_task_updated với event_data: {event_data}")
             self.handle_task_updated(event_data)
         elif event_type == 'file_linked_to_task':
-            logging.info(f"[DEBUG] Gọi handle_file_linked_to_task với event_data: {event_data}")
             self.handle_file_linked_to_task(event_data)
     
     def simulate_editor_events(self):
-        """Giả lập các sự kiện từ editor để kiểm thử"""
+        """Giả lập các sự kiện từ editor để kiểm thử
+        
+        Dữ liệu sự kiện được dựng trong luồng nền; việc phát sự kiện (tạo/di chuyển
+        thẻ Kanban) chạy lại trên luồng GUI qua _apply_simulated.
+        """
         if not self.api_client:
             logging.error("API client chưa được khởi tạo")
             return
 
-        try:
-            logging.info("\n=== Bắt đầu giả lập sự kiện từ editor ===")
-            
-            # Tạo task mới
+        def build_events():
+            # Tạo task mới rồi cập nhật trạng thái task
             task_id = "WIND-DEMO-" + datetime.datetime.now().strftime('%H%M%S')
-            self._simulate_task_created(
-                task_id=task_id,
-                title="[DEMO] Task giả lập",
-                description="Task được tạo tự động để kiểm thử",
-                priority="Medium"
-            )
-            
-            # Cập nhật trạng thái task
-            self._simulate_task_updated(
-                task_id=task_id,
-                new_status="in_progress"
-            )
-            
-            logging.info("=== Hoàn thành giả lập ===")
-        except Exception as e:
-            logging.error(f"Lỗi khi giả lập: {str(e)}")
+            return [
+                self._simulate_task_created(
+                    task_id=task_id,
+                    title="[DEMO] Task giả lập",
+                    description="Task được tạo tự động để kiểm thử",
+                    priority="Medium"
+                ),
+                self._simulate_task_updated(
+                    task_id=task_id,
+                    new_status="in_progress"
+                ),
+            ]
 
-    def _simulate_task_created(self, task_id: str, title: str, description: str, priority: str):
-        event_data = {
+        def on_error(error_info):
+            logging.error(f"Lỗi khi giả lập: {error_info[1]}")
+
+        logging.info("\n=== Bắt đầu giả lập sự kiện từ editor ===")
+        run_in_thread(
+            self,
+            build_events,
+            on_result=self._apply_simulated,
+            on_error=on_error,
+            show_dialog=False
+        )
+
+    def _apply_simulated(self, events):
+        """Phát các sự kiện giả lập tới API client (chạy trên luồng GUI)
+        
+        Args:
+            events: Danh sách dữ liệu sự kiện do simulate_editor_events dựng sẵn
+        """
+        if not self.api_client:
+            return
+        for event_data in events:
+            self.api_client._notify_editor_event(event_data)
+        logging.info("=== Hoàn thành giả lập ===")
+
+    @staticmethod
+    def _simulate_task_created(task_id: str, title: str, description: str, priority: str) -> dict:
+        return {
             'type': 'task_created',
             'task_id': task_id,
             'title': title,
             'description': description,
             'priority': priority,
             'status': 'todo',
-            'timestamp': datetime.datetime.now().isoformat(),
+            'timestamp_ns': time.time_ns(),
             'source': 'windsurf_editor'
         }
-        self.api_client._notify_editor_event(event_data)
-        logging.debug(f"Đã giả lập tạo task: {task_id}")
 
-    def _simulate_task_updated(self, task_id: str, new_status: str):
-        event_data = {
+    @staticmethod
+    def _simulate_task_updated(task_id: str, new_status: str) -> dict:
+        return {
             'type': 'task_updated',
             'task_id': task_id,
             'changes': {'status': new_status},
-            'timestamp': datetime.datetime.now().isoformat(),
+            'timestamp_ns': time.time_ns(),
             'source': 'windsurf_editor'
         }
-        self.api_client._notify_editor_event(event_data)
-        logging.debug(f"Đã giả lập cập nhật task: {task_id} -> {new_status}")
 
     def handle_task_created(self, event_data):
         """Xử lý sự kiện tạo task mới"""
         task_id = event_data.get('task_id')
         title = event_data.get('title')
-        status = event_data.get('status', 'todo')
-        priority = event_data.get('priority', 'Medium')
+        # Trạng thái/độ ưu tiên chỉ có vài giá trị: intern để mọi task dùng chung một chuỗi
+        status = _intern_field(event_data.get('status', 'todo'))
+        priority = _intern_field(event_data.get('priority', 'Medium'))
         description = event_data.get('description', '')
         
         # Thêm task vào cột Kanban tương ứng
-        if status == 'todo':
-            self.todo_column.add_task(task_id, title, priority)
-        elif status == 'in_progress':
-            self.in_progress_column.add_task(task_id, title, priority)
-        elif status == 'done':
-            self.done_column.add_task(task_id, title, priority)
+        column = self._columns.get(status)
+        if column:
+            column.add_task(task_id, title, priority)
         
         # Lưu thông tin task
         self.tasks[task_id] = {
@@ -1513,7 +1817,8 @@ class MainWindow(QMainWindow):
             "description": description,
             "status": status,
             "priority": priority,
-            "created_at": datetime.datetime.now().isoformat()
+            # Giữ dạng nano giây như timestamp_ns của sự kiện; định dạng bằng format_timestamp khi hiển thị
+            "created_at_ns": event_data.get('timestamp_ns') or time.time_ns()
         }
         
         # Thêm vào hoạt động gần đây
@@ -1535,6 +1840,7 @@ class MainWindow(QMainWindow):
         # Cập nhật trạng thái task nếu có
         new_status = changes.get('status')
         if new_status:
+            new_status = _intern_field(new_status)
             old_status = self.tasks[task_id]['status']
             self.move_task(task_id, new_status)
             self.add_recent_activity(f"Task {task_id} chuyển từ {old_status} sang {new_status}")
@@ -1542,7 +1848,7 @@ class MainWindow(QMainWindow):
         # Cập nhật các thông tin khác
         for key, value in changes.items():
             if key != 'status':
-                self.tasks[task_id][key] = value
+                self.tasks[task_id][key] = _intern_field(value) if key == 'priority' else value
         
         # Hiển thị thông báo
         self.statusBar().showMessage(f"Đã cập nhật task {task_id} từ WindSurf Editor", 3000)
@@ -1576,89 +1882,137 @@ class MainWindow(QMainWindow):
         pass
     
     def load_sample_data(self):
-        """Tải dữ liệu mẫu"""
-        # Tạo dữ liệu mẫu trong luồng riêng để tránh đóng băng UI
-        def create_sample_data():
-            # Tạo các task mẫu
-            tasks = {
-                "TASK-101": {
-                    "id": "TASK-101",
-                    "title": "Implement memory tracking",
-                    "description": "Create core functionality for tracking code changes",
-                    "status": "done",
-                    "priority": "High",
-                    "due_date": QDateTime.currentDateTime().toString(Qt.DateFormat.ISODate)
-                },
-                "TASK-102": {
-                    "id": "TASK-102",
-                    "title": "Design Kanban board",
-                    "description": "Create UI for task management using Kanban approach",
-                    "status": "in_progress",
-                    "priority": "Medium",
-                    "due_date": QDateTime.currentDateTime().toString(Qt.DateFormat.ISODate)
-                },
-                "TASK-103": {
-                    "id": "TASK-103",
-                    "title": "Integrate AI analysis",
-                    "description": "Add AI-powered code analysis features",
-                    "status": "todo",
-                    "priority": "High",
-                    "due_date": QDateTime.currentDateTime().toString(Qt.DateFormat.ISODate)
-                },
-                "TASK-104": {
-                    "id": "TASK-104",
-                    "title": "Create snapshot system",
-                    "description": "Implement code snapshot and version comparison",
-                    "status": "todo",
-                    "priority": "Medium",
-                    "due_date": QDateTime.currentDateTime().toString(Qt.DateFormat.ISODate)
-                }
-            }
-            
-            # Tạo một số snapshot mẫu
-            snapshots = {
-                "/path/to/sample/file.py": [
-                    {
-                        "id": "snap-001",
-                        "timestamp": datetime.datetime.now().isoformat(),
-                        "content": "def sample_function():\n    return 'Hello World!'",
-                        "related_task": "TASK-101"
-                    }
-                ]
-            }
-            
-            return {"tasks": tasks, "snapshots": snapshots}
-        
-        def on_data_loaded(data):
-            # Cập nhật dữ liệu
-            self.tasks = data["tasks"]
-            self.snapshots = data["snapshots"]
-            
-            # Thêm task vào bảng Kanban
-            for task_id, task_data in self.tasks.items():
-                if task_data["status"] == "todo":
-                    self.todo_column.add_task(task_id, task_data["title"], task_data["priority"])
-                elif task_data["status"] == "in_progress":
-                    self.in_progress_column.add_task(task_id, task_data["title"], task_data["priority"])
-                elif task_data["status"] == "done":
-                    self.done_column.add_task(task_id, task_data["title"], task_data["priority"])
-            
-            # Thông báo đã tải xong dữ liệu
-            logging.info("Đã tải dữ liệu mẫu")
-            self.statusBar().showMessage("Đã tải dữ liệu mẫu", 3000)
-        
-        # Chạy trong luồng riêng
+        """Tải dữ liệu mẫu trong luồng riêng, kết quả đưa về luồng GUI qua dataLoaded"""
         run_in_thread(
             self, 
-            create_sample_data, 
+            self._load_sample_data_blocking, 
             progress_text="Đang tải dữ liệu mẫu...",
-            on_result=on_data_loaded
+            on_result=self.dataLoaded.emit,
+            on_error=lambda error_info: self._init_step_done(),
+            show_dialog=False
         )
     
+    @staticmethod
+    def _load_sample_data_blocking() -> dict:
+        """Tạo dữ liệu mẫu (chạy trong luồng worker, không đụng tới widget)
+        
+        Returns:
+            dict: {"tasks": {...}, "snapshots": {...}}
+        """
+        # Tạo các task mẫu, due_date lưu dạng QDateTime để TaskDialog khỏi parse lại
+        now = QDateTime.currentDateTime()
+        tasks = {
+            "TASK-101": {
+                "id": "TASK-101",
+                "title": "Implement memory tracking",
+                "description": "Create core functionality for tracking code changes",
+                "status": "done",
+                "priority": "High",
+                "due_date": now
+            },
+            "TASK-102": {
+                "id": "TASK-102",
+                "title": "Design Kanban board",
+                "description": "Create UI for task management using Kanban approach",
+                "status": "in_progress",
+                "priority": "Medium",
+                "due_date": now
+            },
+            "TASK-103": {
+                "id": "TASK-103",
+                "title": "Integrate AI analysis",
+                "description": "Add AI-powered code analysis features",
+                "status": "todo",
+                "priority": "High",
+                "due_date": now
+            },
+            "TASK-104": {
+                "id": "TASK-104",
+                "title": "Create snapshot system",
+                "description": "Implement code snapshot and version comparison",
+                "status": "todo",
+                "priority": "Medium",
+                "due_date": now
+            }
+        }
+            
+        # Tạo một số snapshot mẫu
+        snapshot_time = datetime.datetime.now()
+        snapshots = {
+            "/path/to/sample/file.py": [
+                {
+                    "id": "snap-001",
+                    "timestamp": snapshot_time.isoformat(),
+                    "formatted_time": format_snapshot_time(snapshot_time),
+                    "content": "def sample_function():\n    return 'Hello World!'",
+                    "related_task": "TASK-101"
+                }
+            ]
+        }
+            
+        return {"tasks": tasks, "snapshots": snapshots}
+    
+    def _populate_kanban(self, data: dict):
+        """Nạp dữ liệu đã tải vào bộ nhớ và bảng Kanban (chạy trên luồng GUI)
+        
+        Args:
+            data: Dữ liệu dạng {"tasks": {...}, "snapshots": {...}}
+        """
+        # Bỏ qua task trùng ID với task người dùng đã tạo trong lúc chờ tải
+        # (next_task_id có thể đã cấp ID đó) để không ghi đè task và thẻ của họ
+        loaded_tasks = {
+            task_id: task_data for task_id, task_data in data["tasks"].items()
+            if task_id not in self.tasks and task_id not in self.task_index
+        }
+        for task_id in data["tasks"].keys() - loaded_tasks.keys():
+            logging.warning(f"Bỏ qua task mẫu {task_id} vì ID đã được dùng")
+        self.tasks.update(loaded_tasks)
+        self.snapshots.update(data["snapshots"])
+        
+        # Thêm task mới tải vào bảng Kanban, gom theo cột để mỗi cột chỉ vẽ lại một lần
+        column_tasks = {status: [] for status in self._columns}
+        for task_id, task_data in loaded_tasks.items():
+            if task_data["status"] in column_tasks:
+                column_tasks[task_data["status"]].append((task_id, task_data["title"], task_data["priority"]))
+        for status, tasks in column_tasks.items():
+            self._columns[status].bulk_add(tasks)
+        
+        # Thông báo đã tải xong dữ liệu
+        logging.info("Đã tải dữ liệu mẫu")
+        self.statusBar().showMessage("Đã tải dữ liệu mẫu", 3000)
+        self._init_step_done()
+    
+    def next_task_id(self) -> str:
+        """Cấp ID cho task mới theo bộ đếm tăng dần, bỏ qua ID đã tồn tại
+        
+        Returns:
+            str: Task ID dạng TASK-XXX chưa được dùng
+        """
+        while True:
+            task_id = f"TASK-{self._next_task_seq}"
+            self._next_task_seq += 1
+            if task_id not in self.tasks and task_id not in self.task_index:
+                return task_id
+    
+    def _init_step_done(self):
+        """Đánh dấu một bước khởi tạo chạy ngầm đã xong, phát ready khi hết"""
+        self._pending_init -= 1
+        if self._pending_init == 0:
+            self.ready.emit()
+    
     def update_ui(self):
         """Cập nhật giao diện người dùng"""
-        # Cập nhật ngày
-        self.date_label.setText(datetime.datetime.now().strftime("%A, %B %d, %Y"))
+        # Chỉ cập nhật nhãn ngày khi đã sang ngày mới
+        today = datetime.date.today()
+        if today == self._shown_date:
+            return
+        self._shown_date = today
+        self.date_label.setText(today.strftime("%A, %B %d, %Y"))
+    
+    def _on_focus_changed(self, old, new):
+        """Làm mới giao diện khi ứng dụng lấy lại focus"""
+        if old is None and new is not None:
+            self.update_ui()
     
     def show_projects(self):
         """Hiển thị màn hình quản lý dự án"""
@@ -1690,39 +2044,7 @@ class MainWindow(QMainWindow):
             if time_text is None:
                 time_text = "just now"
             
-            # Tạo widget mới
-            activity = QLabel(f"• {activity_text}")
-            activity.setStyleSheet("color: #ffffff; font-size: 12px;")
-            
-            time = QLabel(time_text)
-            time.setStyleSheet("color: #6b6b8d; font-size: 10px;")
-            
-            # Thêm vào đầu danh sách
-            self.activity_items.insert(0, (activity, time))
-            
-            # Giới hạn số lượng hoạt động hiển thị
-            if len(self.activity_items) > 5:
-                # Xóa mục cuối cùng
-                old_activity, old_time = self.activity_items.pop()
-                old_activity.setParent(None)
-                old_time.setParent(None)
-            
-            # Cập nhật giao diện
-            recent_activity_widget = self.findChild(QFrame, "recent_activity_widget")
-            if recent_activity_widget:
-                # Xóa tất cả widget hiện tại
-                layout = recent_activity_widget.layout()
-                while layout.count():
-                    item = layout.takeAt(0)
-                    if item.widget():
-                        item.widget().setParent(None)
-                
-                # Thêm lại các mục hoạt động
-                for i, (act, tim) in enumerate(self.activity_items):
-                    layout.addWidget(act)
-                    layout.addWidget(tim)
-                    if i < len(self.activity_items) - 1:
-                        layout.addSpacing(10)
+            self.activity_model.add_activity(activity_text, time_text)
             
             logging.info(f"Đã thêm hoạt động mới: {activity_text}")
         except Exception as e:
@@ -1740,7 +2062,7 @@ class MainWindow(QMainWindow):
                 "description": "",
                 "status": new_status,
                 "priority": "Medium",
-                "due_date": (datetime.datetime.now() + datetime.timedelta(days=7)).strftime("%Y-%m-%dT%H:%M:%S")
+                "due_date": QDateTime.currentDateTime().addDays(7)
             }
             return
         
@@ -1758,21 +2080,15 @@ class MainWindow(QMainWindow):
         
         # Cập nhật giao diện
         # Xóa task khỏi cột cũ
-        if old_status == "todo":
-            self.todo_column.remove_task(task_id)
-        elif old_status == "in_progress":
-            self.in_progress_column.remove_task(task_id)
-        elif old_status == "done":
-            self.done_column.remove_task(task_id)
+        old_column = self._columns.get(old_status)
+        if old_column:
+            old_column.remove_task(task_id)
         
         # Thêm task vào cột mới
         task_data = self.tasks[task_id]
-        if new_status == "todo":
-            self.todo_column.add_task(task_id, task_data["title"], task_data["priority"])
-        elif new_status == "in_progress":
-            self.in_progress_column.add_task(task_id, task_data["title"], task_data["priority"])
-        elif new_status == "done":
-            self.done_column.add_task(task_id, task_data["title"], task_data["priority"])
+        new_column = self._columns.get(new_status)
+        if new_column:
+            new_column.add_task(task_id, task_data["title"], task_data["priority"])
         
         # Cập nhật trạng thái task trên server
         run_in_thread(
@@ -1854,15 +2170,10 @@ class MainWindow(QMainWindow):
                         self.move_task(task_id, new_status)
                     else:
                         # Cập nhật thông tin hiển thị của task
-                        if old_status == "todo":
-                            self.todo_column.remove_task(task_id)
-                            self.todo_column.add_task(task_id, updated_data["title"], updated_data["priority"])
-                        elif old_status == "in_progress":
-                            self.in_progress_column.remove_task(task_id)
-                            self.in_progress_column.add_task(task_id, updated_data["title"], updated_data["priority"])
-                        elif old_status == "done":
-                            self.done_column.remove_task(task_id)
-                            self.done_column.add_task(task_id, updated_data["title"], updated_data["priority"])
+                        column = self._columns.get(old_status)
+                        if column:
+                            column.remove_task(task_id)
+                            column.add_task(task_id, updated_data["title"], updated_data["priority"])
                     
                     # Cập nhật thông tin chi tiết nếu task đang được chọn
                     if self.current_task == task_id:
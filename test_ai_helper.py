@@ -9,14 +9,20 @@ Chạy test với lệnh: python -m pytest test_ai_helper.py -v
 
 import unittest
 import json
+import asyncio
 import os
+import time
 import tempfile
-from unittest.mock import patch, MagicMock
+import threading
+import difflib
+from unittest.mock import patch, MagicMock, AsyncMock
+import aiohttp
 import requests
 
 from ai_helper import (
-    AIConfig, config, retry_on_error, validate_prompt,
-    call_local_model, call_openai, AIHelper
+    AIConfig, config, retry_on_error, retry_on_error_async, validate_prompt,
+    single_flight, call_local_model, call_local_model_stream, call_local_model_async, call_openai,
+    AIHelper, PROMPT_TEMPLATES, clear_cache, review_code_changes
 )
 
 
@@ -89,6 +95,56 @@ class TestRetryDecorator(unittest.TestCase):
         self.assertEqual(mock_func.call_count, 3)  # 1 lần đầu + 2 lần retry
 
 
+    @patch('ai_helper.time.sleep')
+    def test_retry_honors_retry_after(self, mock_sleep):
+        """Test retry dùng header Retry-After của server thay cho backoff"""
+        response = MagicMock()
+        response.headers = {"Retry-After": "3"}
+        mock_func = MagicMock(side_effect=[
+            requests.exceptions.HTTPError("429 Too Many Requests", response=response),
+            "success"
+        ])
+        decorated_func = retry_on_error(max_retries=1)(mock_func)
+        
+        self.assertEqual(decorated_func(), "success")
+        mock_sleep.assert_called_once_with(3.0)
+        
+    @patch('ai_helper.time.sleep')
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        """Test lỗi HTTP 4xx (trừ 429) không được thử lại"""
+        mock_func = MagicMock(side_effect=requests.exceptions.HTTPError(
+            "401 Unauthorized", response=MagicMock(status_code=401)
+        ))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            retry_on_error(max_retries=2)(mock_func)()
+        self.assertEqual(mock_func.call_count, 1)
+        mock_sleep.assert_not_called()
+        
+        attempts = []
+        
+        async def func():
+            attempts.append(1)
+            raise aiohttp.ClientResponseError(MagicMock(), (), status=403)
+        
+        with self.assertRaises(aiohttp.ClientResponseError):
+            asyncio.run(retry_on_error_async(max_retries=2)(func)())
+        self.assertEqual(len(attempts), 1)
+        
+    def test_retry_async(self):
+        """Test retry bất đồng bộ không chặn event loop"""
+        mock_func = MagicMock(side_effect=[
+            requests.exceptions.ConnectionError("Connection error"),
+            "success"
+        ])
+        
+        async def func():
+            return mock_func()
+        
+        decorated_func = retry_on_error_async(max_retries=1, backoff_factor=0)(func)
+        self.assertEqual(asyncio.run(decorated_func()), "success")
+        self.assertEqual(mock_func.call_count, 2)
+
+
 class TestValidatePrompt(unittest.TestCase):
     """Test cho hàm validate_prompt"""
     
@@ -103,17 +159,26 @@ class TestValidatePrompt(unittest.TestCase):
     def test_whitespace_prompt(self):
         """Test prompt chỉ có khoảng trắng"""
         self.assertFalse(validate_prompt("   "))
+        self.assertFalse(validate_prompt(" \t\n\r "))
+        
+    def test_prompt_with_surrounding_whitespace(self):
+        """Test prompt có khoảng trắng bao quanh nội dung"""
+        self.assertTrue(validate_prompt("\n   x   \n"))
 
 
 class TestCallLocalModel(unittest.TestCase):
     """Test cho hàm call_local_model"""
     
-    @patch('requests.post')
+    def setUp(self):
+        """Xóa cache để mỗi test đều gọi API"""
+        clear_cache()
+        
+    @patch('requests.Session.post')
     def test_successful_call(self, mock_post):
         """Test gọi API thành công"""
         # Tạo mock response
         mock_response = MagicMock()
-        mock_response.json.return_value = {
+        mock_response.content = json.dumps({
             "choices": [
                 {
                     "message": {
@@ -121,30 +186,198 @@ class TestCallLocalModel(unittest.TestCase):
                     }
                 }
             ]
-        }
+        }).encode()
         mock_post.return_value = mock_response
         
         result = call_local_model("Test prompt")
         self.assertEqual(result, "This is a test response")
         
-    @patch('requests.post')
-    def test_connection_error(self, mock_post):
-        """Test lỗi kết nối"""
+    @patch('ai_helper.time.sleep')
+    @patch('requests.Session.post')
+    def test_connection_error(self, mock_post, mock_sleep):
+        """Test lỗi kết nối được thử lại rồi mới trả về thông báo lỗi"""
         mock_post.side_effect = requests.exceptions.ConnectionError("Connection error")
         
         result = call_local_model("Test prompt")
         self.assertTrue(result.startswith("[Lỗi]"))
+        self.assertEqual(mock_post.call_count, config.retries + 1)
+        self.assertEqual(mock_sleep.call_count, config.retries)
+        
+    @patch('ai_helper.time.sleep')
+    @patch('requests.Session.post')
+    def test_unauthorized_is_not_retried(self, mock_post, mock_sleep):
+        """Test lỗi 401 (sai API key) chỉ gửi một request và không chờ"""
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            "401 Unauthorized", response=MagicMock(status_code=401)
+        )
+        mock_post.return_value = mock_response
+        
+        result = call_local_model("Test prompt")
+        self.assertTrue(result.startswith("[Lỗi] Lỗi HTTP 401"))
+        self.assertEqual(mock_post.call_count, 1)
+        mock_sleep.assert_not_called()
+        
+    @patch('ai_helper.time.sleep')
+    @patch('requests.Session.post')
+    def test_retry_then_success(self, mock_post, mock_sleep):
+        """Test call_local_model thử lại sau lỗi tạm thời, theo Retry-After của server"""
+        busy = MagicMock(status_code=429, headers={"Retry-After": "1"})
+        busy.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            "429 Too Many Requests", response=busy
+        )
+        ok = MagicMock()
+        ok.content = json.dumps({"choices": [{"message": {"content": "Recovered"}}]}).encode()
+        mock_post.side_effect = [busy, ok]
+        
+        self.assertEqual(call_local_model("Test prompt"), "Recovered")
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_called_once_with(1.0)
+        
+    @patch('ai_helper.time.sleep')
+    @patch('requests.Session.post')
+    def test_http_error(self, mock_post, mock_sleep):
+        """Test lỗi HTTP được phân loại kèm mã lỗi"""
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            "Service Unavailable", response=MagicMock(status_code=503)
+        )
+        mock_post.return_value = mock_response
+        
+        result = call_local_model("Test prompt")
+        self.assertTrue(result.startswith("[Lỗi] Lỗi HTTP 503"))
         
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_invalid_response(self, mock_post):
         """Test response không hợp lệ"""
         # Tạo mock response không có choices
         mock_response = MagicMock()
-        mock_response.json.return_value = {}
+        mock_response.content = b"{}"
         mock_post.return_value = mock_response
         
         result = call_local_model("Test prompt")
         self.assertTrue(result.startswith("[Lỗi]"))
+        
+    def _stream_response(self, *contents):
+        """Tạo mock response stream theo định dạng server-sent events"""
+        lines = [
+            b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode()
+            for content in contents
+        ]
+        lines.append(b"data: [DONE]")
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_lines.return_value = iter(lines)
+        return mock_response
+        
+    @patch('requests.Session.post')
+    def test_stream(self, mock_post):
+        """Test nhận kết quả dạng stream"""
+        mock_post.return_value = self._stream_response("Hello", ", ", "world")
+        
+        chunks = list(call_local_model_stream("Test prompt"))
+        self.assertEqual(chunks, ["Hello", ", ", "world"])
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+        
+    @patch('requests.Session.post')
+    def test_stream_max_chars(self, mock_post):
+        """Test dừng stream khi đạt giới hạn số ký tự"""
+        mock_post.return_value = self._stream_response("Hello", ", ", "world")
+        
+        chunks = list(call_local_model_stream("Test prompt", max_chars=6))
+        self.assertEqual("".join(chunks), "Hello,")
+        
+    @patch('requests.Session.post')
+    def test_callback_streaming(self, mock_post):
+        """Test call_local_model đẩy từng đoạn cho callback và trả về toàn bộ nội dung"""
+        mock_post.return_value = self._stream_response("Hello", ", ", "world")
+        
+        received = []
+        result = call_local_model("Test prompt", callback=received.append)
+        self.assertEqual(result, "Hello, world")
+        self.assertEqual(received, ["Hello", ", ", "world"])
+        
+    @patch('ai_helper._get_session')
+    def test_async_call(self, mock_get_session):
+        """Test gọi mô hình local bất đồng bộ qua aiohttp session dùng chung"""
+        mock_response = MagicMock()
+        mock_response.read = AsyncMock(return_value=json.dumps({
+            "choices": [{"message": {"content": "Async response"}}]
+        }).encode())
+        mock_session = MagicMock()
+        mock_session.post.return_value.__aenter__.return_value = mock_response
+        mock_get_session.return_value = mock_session
+        
+        result = asyncio.run(call_local_model_async("Test prompt"))
+        self.assertEqual(result, "Async response")
+        self.assertEqual(mock_session.post.call_args.args[0], config.local_endpoint)
+        
+    @patch('ai_helper.asyncio.sleep', new_callable=AsyncMock)
+    @patch('ai_helper._get_session')
+    def test_async_call_retries(self, mock_get_session, mock_sleep):
+        """Test lời gọi bất đồng bộ thử lại lỗi kết nối bằng asyncio.sleep"""
+        mock_response = MagicMock()
+        mock_response.read = AsyncMock(return_value=json.dumps({
+            "choices": [{"message": {"content": "Async response"}}]
+        }).encode())
+        connected = MagicMock()
+        connected.__aenter__.return_value = mock_response
+        mock_session = MagicMock()
+        mock_session.post.side_effect = [aiohttp.ClientConnectionError("Connection error"), connected]
+        mock_get_session.return_value = mock_session
+        
+        result = asyncio.run(call_local_model_async("Retry prompt"))
+        self.assertEqual(result, "Async response")
+        self.assertEqual(mock_session.post.call_count, 2)
+        mock_sleep.assert_awaited_once()
+        
+    def test_single_flight_leader_cancel_does_not_cancel_followers(self):
+        """Test hủy lời gọi dẫn đầu không làm hủy các lời gọi trùng đang chờ"""
+        calls = []
+        
+        @single_flight
+        async def slow(prompt):
+            calls.append(prompt)
+            await asyncio.sleep(0.05)
+            return prompt.upper()
+        
+        async def scenario():
+            leader = asyncio.create_task(slow("same"))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(slow("same"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+        
+        self.assertEqual(asyncio.run(scenario()), "SAME")
+        self.assertEqual(calls, ["same", "same"])
+        
+    @patch('requests.Session.post')
+    def test_concurrent_identical_calls(self, mock_post):
+        """Test các lời gọi giống hệt nhau chạy đồng thời chỉ gửi 1 request"""
+        def slow_response(*args, **kwargs):
+            time.sleep(0.2)
+            mock_response = MagicMock()
+            mock_response.content = json.dumps({
+                "choices": [{"message": {"content": "Shared response"}}]
+            }).encode()
+            return mock_response
+        mock_post.side_effect = slow_response
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(call_local_model("Same prompt")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(results, ["Shared response"] * 4)
+        self.assertEqual(mock_post.call_count, 1)
 
 
 class TestAIHelper(unittest.TestCase):
@@ -201,6 +434,61 @@ class TestAIHelper(unittest.TestCase):
         # Kiểm tra prompt có chứa ngôn ngữ đích
         args, kwargs = mock_call_local_model.call_args
         self.assertIn("JavaScript", args[0])
+        
+    @patch('ai_helper.call_local_model')
+    def test_analyze_all(self, mock_call_local_model):
+        """Test phân tích gộp trong một lần gọi"""
+        mock_call_local_model.return_value = (
+            'Kết quả:\n```json\n{"quality": "Tốt", "issues": ["Không có"], '
+            '"docstring": "Doc", "semantics": "Hàm rỗng"}\n```'
+        )
+        
+        result = self.ai_helper.analyze_all("def test(): pass")
+        self.assertEqual(mock_call_local_model.call_count, 1)
+        self.assertEqual(result["quality"], "Tốt")
+        self.assertIn("Không có", result["issues"])
+        self.assertEqual(result["docstring"], "Doc")
+        self.assertEqual(result["semantics"], "Hàm rỗng")
+        
+    @patch('ai_helper.call_local_model')
+    def test_analyze_all_fallback(self, mock_call_local_model):
+        """Test phân tích gộp quay về gọi từng phần khi kết quả không phải JSON"""
+        mock_call_local_model.return_value = "Không phải JSON"
+        
+        result = self.ai_helper.analyze_all("def test(): pass")
+        self.assertEqual(mock_call_local_model.call_count, 5)
+        self.assertEqual(set(result), {"quality", "issues", "docstring", "semantics"})
+        
+    @patch('ai_helper.call_local_model')
+    def test_cacheable_by_category(self, mock_call_local_model):
+        """Test chỉ request dạng INFORMATIONAL được cache"""
+        mock_call_local_model.return_value = "result"
+        
+        self.ai_helper.analyze_code_quality("def test(): pass")
+        self.assertTrue(mock_call_local_model.call_args.kwargs["cacheable"])
+        
+        self.ai_helper.suggest_refactor("def test(): pass")
+        self.assertFalse(mock_call_local_model.call_args.kwargs["cacheable"])
+        
+    def test_prompt_templates_render(self):
+        """Test template tách sẵn cho kết quả giống str.format_map"""
+        values = {"code": "x = {1}", "diff": "+a", "target_language": "Go", "max_length": 500}
+        for name, template in PROMPT_TEMPLATES.items():
+            expected = (template.system_prompt.format_map(values), template.prompt.format_map(values))
+            self.assertEqual(template.render(**values), expected, name)
+        
+    @patch('ai_helper.call_local_model')
+    def test_review_code_changes_reuses_diff(self, mock_call_local_model):
+        """Test review cùng một thay đổi nhiều lần chỉ tính diff một lần"""
+        mock_call_local_model.return_value = "Review"
+        old_code, new_code = "a = 1\n", "a = 2\n"
+        
+        with patch('difflib.unified_diff', wraps=difflib.unified_diff) as mock_diff:
+            review_code_changes(old_code, new_code)
+            review_code_changes(old_code, new_code)
+        
+        self.assertEqual(mock_diff.call_count, 1)
+        self.assertIn("+a = 2", mock_call_local_model.call_args.args[0])
 
 
 if __name__ == "__main__":
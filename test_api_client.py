@@ -1,5 +1,14 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
-from api_client import WindSurfAPIClient
+from unittest.mock import patch
+from watchdog.events import FileModifiedEvent
+from watchdog.observers.polling import PollingObserver
+import datetime
+from api_client import WindSurfAPIClient, FileWatcher, _iter_source_files, format_timestamp
 
 class TestAPIClient(unittest.TestCase):
     def test_event_callback(self):
@@ -14,6 +23,170 @@ class TestAPIClient(unittest.TestCase):
         time.sleep(2)
         client.running = False
         self.assertTrue(any(e['type'] == 'test' for e in events))
+    def test_file_changed_read_mode(self):
+        client = WindSurfAPIClient(use_mock=True)
+        received = []
+        client.on_file_changed(lambda path, content: received.append(('text', content)))
+        client.on_file_changed(lambda path, data: received.append(('bytes', data)), read_mode='bytes')
+
+        client._notify_file_changed("a.py", "x = 'é'\n".encode('utf-8'))
+        self.assertEqual(received, [('text', "x = 'é'\n"), ('bytes', "x = 'é'\n".encode('utf-8'))])
+
+    def test_single_callback_errors_are_isolated(self):
+        client = WindSurfAPIClient(use_mock=True)
+        client._notify_editor_event({'type': 'noop'})  # không có callback
+
+        def broken(*args):
+            raise RuntimeError("boom")
+        client.on_editor_event(broken)
+        client.on_file_saved(broken, read_mode='bytes')
+        with self.assertLogs('windsurf_api', level='ERROR') as logs:
+            client._notify_editor_event({'type': 'noop'})
+            client._notify_file_saved("a.py", "x = 1")
+        self.assertEqual(len(logs.records), 2)
+
+    def test_file_batch_changed(self):
+        client = WindSurfAPIClient(use_mock=True, batch_window=0.05)
+        batches = []
+        changed = []
+        client.on_file_batch_changed(batches.append)
+        client.on_file_changed(lambda path, content: changed.append(path))
+
+        client._notify_file_changed("a.py", b"a = 1")
+        client._notify_file_changed("b.py", "b = 2")
+        time.sleep(0.3)
+        client._notify_file_changed("c.py", b"c = 3")
+        client.disconnect()
+
+        self.assertEqual(batches, [[("a.py", b"a = 1"), ("b.py", b"b = 2")], [("c.py", b"c = 3")]])
+        self.assertEqual(changed, ["a.py", "b.py", "c.py"])
+
+    def test_format_timestamp(self):
+        moment = datetime.datetime(2024, 5, 1, 12, 30, 15, 250000)
+        timestamp_ns = int(moment.timestamp()) * 1_000_000_000 + 250_000_000
+        self.assertEqual(format_timestamp(timestamp_ns), moment.isoformat())
+
+
+class TestFileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.client = WindSurfAPIClient(use_mock=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _touch(self, name, content="x = 1\n"):
+        path = os.path.join(self.temp_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_is_watched_file(self):
+        watcher = FileWatcher(self.client, self.temp_dir)
+        self.assertTrue(watcher._is_watched_file(self._touch("main.py")))
+        self.assertTrue(watcher._is_watched_file(self._touch("STYLE.CSS")))
+        self.assertFalse(watcher._is_watched_file(self._touch("image.png")))
+        # File không tồn tại không được theo dõi dù khớp mẫu
+        self.assertFalse(watcher._is_watched_file(os.path.join(self.temp_dir, "missing.py")))
+
+    def test_is_watched_file_complex_patterns(self):
+        watcher = FileWatcher(self.client, self.temp_dir, ['test_*.py', 'docs/*.md', '*.tar.gz'])
+        self.assertTrue(watcher._is_watched_file(self._touch("test_api.py")))
+        self.assertFalse(watcher._is_watched_file(self._touch("api.py")))
+        self.assertTrue(watcher._is_watched_file(self._touch(os.path.join("docs", "guide.md"))))
+        self.assertFalse(watcher._is_watched_file(self._touch("guide.md")))
+        self.assertTrue(watcher._is_watched_file(self._touch("dist.tar.gz")))
+
+    def test_modified_events_are_debounced(self):
+        watcher = FileWatcher(self.client, self.temp_dir, debounce_delay=0.05)
+        changed = []
+        self.client.on_file_changed(lambda path, content: changed.append((path, content)))
+
+        path = self._touch("main.py", "v1")
+        watcher.on_modified(FileModifiedEvent(path))
+        self._touch("main.py", "v2")
+        watcher.on_modified(FileModifiedEvent(path))
+        watcher.on_modified(FileModifiedEvent(path))
+        time.sleep(0.3)
+
+        self.assertEqual(changed, [(path, "v2")])
+        self.assertEqual(watcher._pending, {})
+
+    def test_unchanged_content_is_not_notified(self):
+        watcher = FileWatcher(self.client, self.temp_dir)
+        changed = []
+        self.client.on_file_changed(lambda path, content: changed.append(content))
+
+        path = self._touch("main.py", "v1")
+        watcher._flush(path)
+        # Chỉ đổi mtime, nội dung giữ nguyên
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        watcher._flush(path)
+        self._touch("main.py", "v2")
+        os.utime(path, (time.time() + 20, time.time() + 20))
+        watcher._flush(path)
+
+        self.assertEqual(changed, ["v1", "v2"])
+        self.assertEqual(watcher.last_modified[path], os.stat(path).st_mtime_ns)
+        # mtime không đổi thì không đọc lại nội dung
+        with patch('api_client._read_fd') as read_fd:
+            watcher._flush(path)
+        read_fd.assert_not_called()
+
+    def test_tracked_files_are_bounded(self):
+        watcher = FileWatcher(self.client, self.temp_dir)
+        watcher.MAX_TRACKED_FILES = 3
+        paths = [self._touch(f"f{i}.py", f"v{i}") for i in range(4)]
+        for path in paths[:3]:
+            watcher._flush(path)
+        # Truy cập lại f0 để nó thành file dùng gần đây nhất
+        watcher._remember(watcher.last_modified, paths[0], watcher.last_modified[paths[0]])
+        watcher._flush(paths[3])
+
+        self.assertEqual(list(watcher.last_modified), [paths[2], paths[0], paths[3]])
+        self.assertEqual(len(watcher._content_fp), 3)
+        self.assertNotIn(paths[0], watcher._content_fp)
+
+    def test_iter_source_files(self):
+        for name in ["a.py", "b.txt", "c.png", os.path.join("pkg", "d.js"), os.path.join("pkg", "sub", "e.css")]:
+            self._touch(name)
+
+        found = sorted(os.path.relpath(p, self.temp_dir) for p in _iter_source_files(self.temp_dir, ('.py', '.js', '.css', '.txt')))
+        self.assertEqual(found, sorted(["a.py", "b.txt", os.path.join("pkg", "d.js"), os.path.join("pkg", "sub", "e.css")]))
+
+    def test_polling_fallback_when_native_observer_fails(self):
+        class BrokenObserver(PollingObserver):
+            def start(self):
+                raise OSError("inotify watch limit reached")
+
+        with patch('api_client.Observer', BrokenObserver):
+            self.client.mock_api.start_watching(self.temp_dir)
+        try:
+            observer = self.client.mock_api.observers[0]
+            self.assertIs(type(observer), PollingObserver)
+            self.assertTrue(observer.is_alive())
+        finally:
+            self.client.disconnect()
+
+    def test_stop_releases_waiters(self):
+        mock_api = self.client.mock_api
+        mock_api.start_watching(self.temp_dir)
+        self.assertFalse(mock_api.wait(0.01))
+
+        start = time.monotonic()
+        threading.Timer(0.05, self.client.disconnect).start()
+        self.assertTrue(mock_api.wait(5))
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_get_file_content(self):
+        small = os.path.join(self.temp_dir, "small.py")
+        with open(small, 'wb') as f:
+            f.write("a = 'é'\r\nb = 2\r\n".encode('utf-8'))
+        large = self._touch("large.py", "x = 1\n" * 20000)
+
+        self.assertEqual(self.client.get_file_content(small), "a = 'é'\nb = 2\n")
+        self.assertEqual(self.client.get_file_content(large), "x = 1\n" * 20000)
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import unittest
+from PyQt6.QtGui import QTextDocument
+from PyQt6.QtWidgets import QApplication
+
+from main import CodeHighlighter
+
+class TestCodeHighlighter(unittest.TestCase):
+    """Kiểm thử syntax highlighter của code editor"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Khởi tạo ứng dụng Qt trước khi chạy test"""
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+    
+    def highlight(self, line):
+        """Trả về danh sách (đoạn text, loại định dạng) sau khi highlight một dòng"""
+        document = QTextDocument()
+        document.setPlainText(line)
+        highlighter = CodeHighlighter(document)
+        highlighter.rehighlight()
+        
+        format_names = {fmt.foreground().color().name(): name for name, fmt in highlighter.formats.items()}
+        return [(line[r.start:r.start + r.length], format_names[r.format.foreground().color().name()])
+                for r in document.begin().layout().formats()]
+    
+    def test_tokens(self):
+        self.assertEqual(self.highlight("if x in (1, 2): return foo(None)"), [
+            ("if", "keyword"), ("in", "keyword"), ("1", "number"), ("2", "number"),
+            ("return", "keyword"), ("foo", "function"), ("None", "keyword")
+        ])
+    
+    def test_strings_and_comments_are_not_overwritten(self):
+        self.assertEqual(self.highlight("s = \"for # 1\"  # utf-8 'x' def"), [
+            ('"for # 1"', "string"), ("# utf-8 'x' def", "comment")
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
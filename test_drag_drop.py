@@ -2,14 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
 import unittest
 from unittest.mock import MagicMock, patch
-from PyQt6.QtCore import Qt, QMimeData, QPoint, QByteArray
-from PyQt6.QtGui import QDrag
-from PyQt6.QtWidgets import QApplication, QPushButton, QWidget
+from PyQt6.QtCore import Qt, QDateTime, QMimeData, QThread, QPoint, QPointF, QByteArray, QEvent
+from PyQt6.QtGui import QDrag, QMouseEvent
+from PyQt6.QtWidgets import QApplication, QFrame, QPushButton, QWidget
 
 # Import các lớp cần test
-from main import KanbanColumn, TaskCard, MainWindow
+from main import KanbanColumn, TaskCard, MainWindow, SnapshotList, TaskDialog
 
 class MockMimeData:
     """Lớp giả lập QMimeData để sử dụng trong test"""
@@ -189,5 +190,235 @@ class TestDragDrop(unittest.TestCase):
         # Kiểm tra xem sự kiện có được chấp nhận không
         self.assertTrue(event.accepted)
 
+    def test_task_index_follows_moved_card(self):
+        """Kiểm tra index task -> (thẻ, cột) được cập nhật khi task chuyển cột"""
+        self.assertEqual(self.main_window.task_index[self.test_task_id], (self.task_card, self.todo_column))
+        
+        with patch('main.run_in_thread'):
+            self.main_window.move_task(self.test_task_id, "done")
+        
+        card, column = self.main_window.task_index[self.test_task_id]
+        self.assertIs(column, self.done_column)
+        self.assertIsNot(card, self.task_card)
+        self.assertNotIn(self.test_task_id, self.todo_column._cards)
+        self.assertIs(self.done_column._cards[self.test_task_id], card)
+        self.assertFalse(self.todo_column.remove_task(self.test_task_id))
+
+    def test_bulk_add(self):
+        """Kiểm tra thêm nhiều task cùng lúc vào cột"""
+        count = self.done_column.get_task_count()
+        self.done_column.bulk_add([("BULK-1", "First", "High"), ("BULK-2", "Second", "Low")])
+        
+        self.assertEqual(self.done_column.get_task_count(), count + 2)
+        self.assertTrue(self.done_column.updatesEnabled())
+        self.assertIs(self.main_window.task_index["BULK-2"][1], self.done_column)
+
+    def test_background_init_emits_ready(self):
+        """Kiểm tra khởi tạo chạy ngầm không chặn constructor và phát ready khi xong"""
+        ready = []
+        self.main_window.ready.connect(lambda: ready.append(True))
+        deadline = time.monotonic() + 5
+        while not ready and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        
+        self.assertEqual(ready, [True])
+        self.assertIsNotNone(self.main_window.api_client)
+        self.assertIn("TASK-101", self.main_window.task_index)
+        # Task tạo trong lúc chờ không bị dữ liệu mẫu ghi đè
+        self.assertIn(self.test_task_id, self.main_window.tasks)
+
+    def test_simulated_events_are_applied_on_gui_thread(self):
+        """Kiểm tra sự kiện giả lập được dựng ở luồng nền và áp dụng trên luồng GUI"""
+        ready = []
+        self.main_window.ready.connect(lambda: ready.append(True))
+        applied = []
+        original = self.main_window._apply_simulated
+        def apply(events):
+            applied.append(QThread.currentThread() is self.app.thread())
+            original(events)
+        self.main_window._apply_simulated = apply
+        
+        deadline = time.monotonic() + 5
+        while not ready and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        self.main_window.simulate_editor_events()
+        while not applied and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        
+        self.assertEqual(applied, [True])
+        demo = [task for task_id, task in self.main_window.tasks.items() if task_id.startswith("WIND-DEMO-")]
+        self.assertEqual([task["status"] for task in demo], ["in_progress"])
+        self.assertIsInstance(demo[0]["created_at_ns"], int)
+
+    def test_data_loaded_populates_only_new_tasks(self):
+        """Kiểm tra dataLoaded chỉ thêm các task vừa tải, không nhân đôi task đã có"""
+        data = MainWindow._load_sample_data_blocking()
+        todo_count = self.todo_column.get_task_count()
+        self.main_window._pending_init = 1
+        self.main_window.dataLoaded.emit(data)
+        
+        new_todo = sum(1 for task in data["tasks"].values() if task["status"] == "todo")
+        self.assertEqual(self.todo_column.get_task_count(), todo_count + new_todo)
+        self.assertIs(self.main_window.task_index[self.test_task_id][0], self.task_card)
+        self.assertIn("TASK-104", self.main_window.tasks)
+
+    def test_data_loaded_keeps_tasks_created_while_loading(self):
+        """Kiểm tra task tạo trước khi tải xong không bị dữ liệu mẫu trùng ID ghi đè"""
+        task_id = self.main_window.next_task_id()
+        self.assertEqual(task_id, "TASK-100")
+        task_id = self.main_window.next_task_id()
+        self.main_window.tasks[task_id] = {"id": task_id, "title": "Mine", "status": "todo", "priority": "Low"}
+        card = self.todo_column.add_task(task_id, "Mine", "Low")
+        
+        self.main_window._pending_init = 1
+        self.main_window.dataLoaded.emit(MainWindow._load_sample_data_blocking())
+        
+        self.assertEqual(self.main_window.tasks[task_id]["title"], "Mine")
+        self.assertIs(self.main_window.task_index[task_id][0], card)
+        self.assertNotIn(task_id, self.done_column._cards)
+        self.assertIn("TASK-102", self.main_window.tasks)
+
+    def test_editor_events_accept_non_string_fields(self):
+        """Kiểm tra sự kiện editor có status/priority không phải chuỗi không làm lỗi callback"""
+        self.main_window.handle_editor_event(
+            {'type': 'task_created', 'task_id': 'EVT-1', 'title': 'Odd', 'status': None, 'priority': 2}
+        )
+        self.assertIsNone(self.main_window.tasks['EVT-1']['status'])
+        self.assertNotIn('EVT-1', self.main_window.task_index)
+        
+        self.main_window.handle_editor_event(
+            {'type': 'task_updated', 'task_id': self.test_task_id, 'changes': {'priority': 2}}
+        )
+        self.assertEqual(self.main_window.tasks[self.test_task_id]['priority'], 2)
+
+    def test_start_drag_distance_is_read_once(self):
+        """Kiểm tra startDragDistance chỉ được đọc từ Qt một lần cho mọi thẻ"""
+        def mouse_event(event_type):
+            return QMouseEvent(event_type, QPointF(5, 5), QPointF(5, 5), Qt.MouseButton.LeftButton,
+                               Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier)
+        
+        selected = []
+        self.task_card.taskSelected.connect(selected.append)
+        with patch.object(TaskCard, '_start_drag_distance', None), \
+                patch.object(self.main_window, 'on_task_selected'), \
+                patch('main.QApplication.startDragDistance', return_value=10) as distance:
+            for _ in range(2):
+                self.task_card.mousePressEvent(mouse_event(QEvent.Type.MouseButtonPress))
+                self.task_card.mouseReleaseEvent(mouse_event(QEvent.Type.MouseButtonRelease))
+        
+        distance.assert_called_once()
+        self.assertEqual(selected, [self.test_task_id, self.test_task_id])
+
+    def test_next_task_id_skips_existing_ids(self):
+        """Kiểm tra ID task mới lấy từ bộ đếm và không trùng task đã có"""
+        self.main_window.tasks["TASK-100"] = {"id": "TASK-100"}
+        self.todo_column.add_task("TASK-101", "Existing", "Low")
+        
+        self.assertEqual(self.main_window.next_task_id(), "TASK-102")
+        dialog = TaskDialog(self.main_window, next_id=self.main_window.next_task_id)
+        self.assertEqual(dialog.id_field.text(), "TASK-103")
+
+    def test_kanban_widgets_use_shared_stylesheet(self):
+        """Kiểm tra thẻ task không tự mang stylesheet mà dùng style chung của cửa sổ"""
+        card = self.in_progress_column.add_task("STYLE-1", "Styled", "Low")
+        self.assertEqual(card.styleSheet(), "")
+        self.assertEqual(card.objectName(), "taskCard")
+        indicator = card.findChild(QFrame, "taskIndicator")
+        self.assertEqual(indicator.property("status"), "in_progress")
+        self.assertIn("QFrame#taskIndicator", self.main_window.styleSheet())
+
+    def test_recent_activity_model_keeps_newest_first(self):
+        """Kiểm tra hoạt động gần đây: mục mới ở đầu, giữ tối đa max_rows mục"""
+        model = self.main_window.activity_model
+        for i in range(6):
+            self.main_window.add_recent_activity(f"Activity {i}")
+        
+        self.assertEqual(model.rowCount(), model.max_rows)
+        self.assertEqual(model.data(model.index(0)), "• Activity 5")
+        self.assertEqual(model.data(model.index(0), model.TimeRole), "just now")
+        self.assertEqual(model.data(model.index(model.max_rows - 1)), "• Activity 1")
+
+    def test_update_ui_only_redraws_on_new_day(self):
+        """Kiểm tra update_ui bỏ qua khi ngày hiển thị chưa đổi"""
+        with patch.object(self.main_window.date_label, 'setText') as set_text:
+            self.main_window.update_ui()
+            set_text.assert_not_called()
+            
+            self.main_window._shown_date = self.main_window._shown_date.replace(year=2000)
+            self.main_window._on_focus_changed(None, self.task_card)
+            set_text.assert_called_once()
+
+    def test_activity_graph_pixmap_is_cached_until_data_changes(self):
+        """Kiểm tra biểu đồ hoạt động chỉ vẽ lại pixmap khi dữ liệu hoặc kích thước đổi"""
+        graph = self.main_window.activity_graph
+        graph.grab()  # Để layout ổn định kích thước trước khi đếm
+        with patch.object(graph, '_render', wraps=graph._render) as render:
+            graph.grab()
+            self.assertEqual(render.call_count, 0)
+            graph.set_data([3, 1, 4, 1, 5, 9, 2])
+            graph.grab()
+            graph.grab()
+            self.assertEqual(render.call_count, 1)
+            graph.resize(graph.width() + 10, graph.height())
+            graph.grab()
+            self.assertEqual(render.call_count, 2)
+
+    def test_mouse_move_without_drag_does_not_start_drag(self):
+        """Kiểm tra di chuột không giữ nút hoặc chưa đủ xa thì không tạo drag"""
+        def move_event(pos, buttons):
+            return QMouseEvent(QEvent.Type.MouseMove, QPointF(pos), QPointF(pos),
+                               Qt.MouseButton.NoButton, buttons, Qt.KeyboardModifier.NoModifier)
+        
+        with patch('main.QDrag') as drag_class:
+            self.task_card.mouseMoveEvent(move_event(QPoint(50, 50), Qt.MouseButton.NoButton))
+            self.task_card.mouseMoveEvent(move_event(QPoint(1, 1), Qt.MouseButton.LeftButton))
+        drag_class.assert_not_called()
+
+    def test_drag_pixmap_is_cached_until_resize(self):
+        """Kiểm tra pixmap kéo thả được dùng lại và render lại sau khi đổi kích thước"""
+        card = TaskCard("CACHE-1", "Cached card")
+        card.resize(240, 80)
+        pixmap = card._get_drag_pixmap()
+        self.assertIs(card._get_drag_pixmap(), pixmap)
+        
+        card.resize(260, 80)
+        resized = card._get_drag_pixmap()
+        self.assertIsNot(resized, pixmap)
+        self.assertEqual(resized.size(), card.size())
+
+    def test_column_forwards_task_events_to_main_window(self):
+        """Kiểm tra cột chuyển sự kiện chọn/sửa task thẳng lên MainWindow"""
+        with patch.object(self.main_window, 'on_task_selected') as on_selected, \
+                patch.object(self.main_window, 'on_task_edit_requested') as on_edit:
+            self.task_card.taskSelected.emit(self.test_task_id)
+            self.task_card.taskEditRequested.emit(self.test_task_id)
+        
+        on_selected.assert_called_once_with(self.test_task_id)
+        on_edit.assert_called_once_with(self.test_task_id)
+
+    def test_precomputed_snapshot_time_and_native_due_date(self):
+        """Kiểm tra snapshot dùng giờ định dạng sẵn và due_date giữ dạng QDateTime"""
+        snapshot_list = SnapshotList()
+        snapshot_list.add_snapshot({"id": "snap-1", "formatted_time": "08:15:00"})
+        snapshot_list.add_snapshot({"id": "snap-2", "timestamp": "2025-05-01T12:00:00"})
+        model = snapshot_list.model
+        self.assertEqual(model.data(model.index(0)), "08:15:00 - Snapshot #snap-1")
+        self.assertEqual(model.data(model.index(1)), "12:00:00 - Snapshot #snap-2")
+        
+        selected = []
+        snapshot_list.snapshotSelected.connect(selected.append)
+        snapshot_list.list_view.setCurrentIndex(model.index(1))
+        self.assertEqual(selected, [{"id": "snap-2", "timestamp": "2025-05-01T12:00:00"}])
+        snapshot_list.clear_snapshots()
+        self.assertEqual(model.rowCount(), 0)
+        
+        due_date = QDateTime.currentDateTime().addDays(3)
+        dialog = TaskDialog(self.main_window, dict(self.main_window.tasks[self.test_task_id], due_date=due_date))
+        self.assertIsInstance(dialog.get_task_data()["due_date"], QDateTime)
+        self.assertEqual(dialog.get_task_data()["due_date"].toSecsSinceEpoch(), due_date.toSecsSinceEpoch())
+
 if __name__ == "__main__":
     unittest.main()
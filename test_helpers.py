@@ -13,6 +13,7 @@ import unittest
 import tempfile
 import json
 import shutil
+from unittest.mock import MagicMock, patch
 from typing import Dict, Any, List
 
 # Import các module cần test
@@ -351,6 +352,26 @@ class TestAIHelperCache(unittest.TestCase):
         # Khôi phục thời gian sống cache
         ai_helper.config.cache_ttl = original_ttl
 
+    def test_cache_max_entries(self):
+        """Kiểm tra cache bị giới hạn số mục (loại bỏ mục ít dùng nhất)"""
+        original_maxsize = ai_helper.response_cache.maxsize
+        ai_helper.response_cache.maxsize = 2
+
+        try:
+            ai_helper.cache_response("a", "1")
+            ai_helper.cache_response("b", "2")
+
+            # Đọc "a" để "b" trở thành mục ít dùng nhất
+            self.assertEqual(ai_helper.get_cached_response("a"), "1")
+            ai_helper.cache_response("c", "3")
+
+            self.assertEqual(len(ai_helper.response_cache), 2)
+            self.assertIsNone(ai_helper.get_cached_response("b"))
+            self.assertEqual(ai_helper.get_cached_response("a"), "1")
+            self.assertEqual(ai_helper.get_cached_response("c"), "3")
+        finally:
+            ai_helper.response_cache.maxsize = original_maxsize
+
 
 class TestAIHelperUtilities(unittest.TestCase):
     """Kiểm thử các tiện ích trong ai_helper.py"""
@@ -373,6 +394,18 @@ class TestAIHelperUtilities(unittest.TestCase):
         count = ai_helper.estimate_token_count(empty_text)
         self.assertEqual(count, 0)
 
+    def test_estimate_token_count_with_model(self):
+        """Kiểm tra estimate_token_count dùng tokenizer của model khi có"""
+        fake_encoding = MagicMock()
+        fake_encoding.encode.return_value = [1, 2, 3]
+        
+        with patch.dict(ai_helper._token_encodings, {"fake-openai-model": fake_encoding}):
+            self.assertEqual(ai_helper.estimate_token_count("Hello, world!", "fake-openai-model"), 3)
+        
+        # Model không có tokenizer: quay về ước tính theo số ký tự
+        with patch.dict(ai_helper._token_encodings, {"local-model": None}):
+            self.assertEqual(ai_helper.estimate_token_count("A" * 1000, "local-model"), 250)
+
 
 def run_tests():
     """Chạy tất cả các test"""
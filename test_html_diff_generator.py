@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Kiểm thử module html_diff_generator
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from html_diff_generator import generate_html_diff, html_escape, iter_html_diff, save_html_diff, _read_diff_file
+
+
+class TestHtmlEscape(unittest.TestCase):
+    def test_escape_special_characters(self):
+        self.assertEqual(html_escape('<a href="x">Tom & Jerry\'s</a>'),
+                         '&lt;a href=&quot;x&quot;&gt;Tom &amp; Jerry&#39;s&lt;/a&gt;')
+
+    def test_escape_is_not_applied_twice(self):
+        self.assertEqual(html_escape('&lt;'), '&amp;lt;')
+
+    def test_plain_text_unchanged(self):
+        text = 'Xin chào thế giới'
+        # Không có ký tự đặc biệt thì trả lại chính chuỗi đầu vào
+        self.assertIs(html_escape(text), text)
+
+
+
+class TestGenerateHtmlDiff(unittest.TestCase):
+    def test_line_classes(self):
+        html = generate_html_diff("@@ -1 +1 @@\n-a < b\n+a > b\n c")
+        body = html[html.index('<pre class="diff">'):]
+        self.assertEqual(body, '<pre class="diff">\n'
+                               '<span class="info">@@ -1 +1 @@</span>\n'
+                               '<span class="removed">-a &lt; b</span>\n'
+                               '<span class="added">+a &gt; b</span>\n'
+                               ' c\n'
+                               '</pre>')
+
+
+    def test_iter_html_diff_matches_generate(self):
+        diff_text = "@@ -1,3 +1,3 @@\n a\n-b & c\n+b && c\n\n d\n"
+        # Khối rất nhỏ để mỗi khối chỉ chứa vài dòng
+        with patch('html_diff_generator._STREAM_CHUNK_CHARS', 4):
+            chunks = list(iter_html_diff(diff_text))
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual(''.join(chunks), generate_html_diff(diff_text))
+
+    def test_parallel_render_matches_serial(self):
+        diff_text = "\n".join(["@@ -1 +1 @@", "-a < b", "+a > b", " c & d", ""] * 50)
+        expected = generate_html_diff(diff_text)
+        with patch('html_diff_generator._PARALLEL_THRESHOLD_CHARS', 0), \
+                patch('html_diff_generator.os.cpu_count', return_value=3):
+            self.assertEqual(generate_html_diff(diff_text), expected)
+
+    def test_save_html_diff(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = os.path.join(temp_dir, "diff.html")
+            self.assertTrue(save_html_diff("+thêm <b>\n-xóa", output_file))
+            with open(output_file, encoding='utf-8') as f:
+                html = f.read()
+        self.assertTrue(html.startswith('<!DOCTYPE html>'))
+        self.assertIn(generate_html_diff("+thêm <b>\n-xóa"), html)
+        self.assertTrue(html.endswith('</html>'))
+
+    def test_read_diff_file_normalizes_newlines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            diff_file = os.path.join(temp_dir, "change.diff")
+            with open(diff_file, 'wb') as f:
+                f.write("+thêm\r\n-xóa\r@@\n".encode('utf-8'))
+            self.assertEqual(_read_diff_file(diff_file), "+thêm\n-xóa\n@@\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
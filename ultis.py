@@ -23,6 +23,9 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("windsurf_utils")
 
+# Giữ tham chiếu tới (thread, worker) chạy ngầm để chúng không bị thu gom khi đang chạy
+_background_threads = set()
+
 
 # ----- Xử lý snapshot và diff -----
 
@@ -777,6 +780,12 @@ def run_in_thread(parent, fn: Callable, progress_text: str = "Đang xử lý..."
     worker.signals.finished.connect(worker.deleteLater)
     thread.finished.connect(thread.deleteLater)
     
+    # Không có dialog chặn thì phải tự giữ thread/worker sống tới khi chạy xong
+    if progress_dialog is None:
+        entry = (thread, worker)
+        _background_threads.add(entry)
+        thread.finished.connect(lambda: _background_threads.discard(entry))
+    
     # Bắt đầu thread
     thread.start()
     